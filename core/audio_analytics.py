@@ -0,0 +1,217 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from core.metrics import counter, gauge, histogram
+
+FRAME_SIZE = 512  # 32 ms ở 16 kHz; một lần rFFT theo lô cho mỗi giây âm thanh
+BAND_COUNT = 16
+BAND_MIN_HZ = 100
+BAND_MAX_HZ = 7600
+SUMMARY_HISTORY = 300  # Số bản tóm tắt mỗi giây được giữ lại (5 phút)
+
+ACTIVE_MARGIN_DB = 9.0  # Frame có âm thanh: cao hơn nền nhiễu bấy nhiêu dB
+# Nền nhiễu theo phân vị thấp của mỗi giây, thay đổi có giới hạn: một giây ồn hay một cú tắt mic
+# không kéo nền nhiễu đi quá xa; frame toàn số 0 (mic tắt, đệm) không được tính là nhiễu phòng
+NOISE_PERCENTILE = 10
+NOISE_MAX_DROP_DB = 6.0  # dB mỗi giây
+NOISE_MAX_RISE_DB = 1.0  # dB mỗi giây
+DIGITAL_SILENCE_DB = -90.0
+PITCH_MIN_HZ = 80
+PITCH_MAX_HZ = 400
+# Giọng nói thường (hữu thanh) có tự tương quan mạnh ở chu kỳ cao độ; thì thầm thì không
+VOICED_MIN_PERIODICITY = 0.5
+# Thì thầm: có năng lượng nhưng không tuần hoàn, trọng tâm phổ cao
+WHISPER_MAX_PERIODICITY = 0.3
+WHISPER_MIN_CENTROID_HZ = 1500.0
+WHISPER_MAX_MARGIN_DB = 25.0  # Thì thầm không to hơn nền nhiễu quá mức này
+WHISPER_RATIO = 0.4  # Tỉ lệ frame thì thầm trong một giây để tính giây đó là "đang thì thầm"
+WHISPER_SECONDS = 3
+# Giọng thứ hai: hình dạng phổ (dB, đã bỏ mức to nhỏ) lệch khỏi hồ sơ giọng của thí sinh
+REFERENCE_SECONDS = 5  # Số giây có giọng nói cần để lập hồ sơ giọng
+PROFILE_ADAPT = 0.05
+SPEAKER_CHANGE_DB = 6.0
+SPEAKER_MIN_VOICED_RATIO = 0.3
+SECOND_VOICE_SECONDS = 2
+EVENT_COOLDOWN = 30.0
+
+class AudioAnalytics:
+    """
+    Cheap signal analytics on raw int16 audio, next to AudioMonitor.
+
+    process(samples) buffers audio and analyzes each full second in one
+    batch: per-frame RMS level and, from a single batched rFFT, spectral
+    centroid, flatness, 16 log-spaced band energies and periodicity (the
+    autocorrelation peak in the pitch range), all vectorized. Every second
+    produces a compact summary dict (kept in `summaries` and passed to
+    on_summary). Frames count as active above a noise floor that follows the
+    low percentile of each second at a bounded rate, ignoring digital
+    silence.
+
+    Events go to on_event(kind, details):
+    - "whisper": WHISPER_SECONDS in a row dominated by aperiodic,
+      high-centroid, low-level frames;
+    - "second_voice": for SECOND_VOICE_SECONDS in a row the spectral shape
+      of voiced frames differs by more than SPEAKER_CHANGE_DB from the
+      profile built from the first REFERENCE_SECONDS of speech. This is a
+      heuristic speaker-change cue, not speaker identification.
+    Each kind is rate-limited to one event per EVENT_COOLDOWN seconds.
+    """
+
+    def __init__(self, rate, on_summary=None, on_event=None, frame_size=FRAME_SIZE):
+        self.rate = rate
+        self.frame_size = frame_size
+        self.on_summary = on_summary
+        self.on_event = on_event
+        self.summaries = deque(maxlen=SUMMARY_HISTORY)
+        self._pending = []
+        self._pending_samples = 0
+        self._window = np.hanning(frame_size).astype(np.float32)
+        # rFFT có đệm 0 gấp đôi: tự tương quan tính từ phổ công suất không bị vòng (circular)
+        self._fft_size = 2 * frame_size
+        freqs = np.fft.rfftfreq(self._fft_size, 1.0 / rate)
+        self._freqs = freqs.astype(np.float32)
+        edges = np.geomspace(BAND_MIN_HZ, BAND_MAX_HZ, BAND_COUNT + 1)
+        band_of_bin = np.searchsorted(edges, freqs) - 1
+        # Ma trận (bin -> dải) để tính năng lượng các dải cho cả lô bằng một phép nhân
+        self._bands = np.zeros((len(freqs), BAND_COUNT), dtype=np.float32)
+        valid = (band_of_bin >= 0) & (band_of_bin < BAND_COUNT)
+        self._bands[np.nonzero(valid)[0], band_of_bin[valid]] = 1.0
+        self._min_lag = int(rate / PITCH_MAX_HZ)
+        self._max_lag = min(int(rate / PITCH_MIN_HZ), frame_size - 1)
+        # Tự tương quan của chính cửa sổ Hann, để bù độ suy giảm theo độ trễ
+        window_acf = np.correlate(self._window, self._window, mode="full")[frame_size - 1:]
+        self._window_acf = (window_acf / window_acf[0])[self._min_lag:self._max_lag + 1].astype(np.float32)
+        self.noise_db = None
+        self.profile = None
+        self._profile_seconds = 0
+        self._whisper_run = 0
+        self._speaker_run = 0
+        self._last_event = {}
+        self.seconds_analyzed = 0
+        self.event_counts = {}
+
+    def process(self, samples, timestamp=None):
+        """Feeds int16 samples; returns the per-second summaries completed by them."""
+        self._pending.append(np.asarray(samples, dtype=np.int16))
+        self._pending_samples += len(samples)
+        if self._pending_samples < self.rate:
+            return []
+        buffered = np.concatenate(self._pending)
+        seconds = len(buffered) // self.rate
+        rest = buffered[seconds * self.rate:]
+        self._pending, self._pending_samples = [rest], len(rest)
+        now = time.time() if timestamp is None else timestamp
+        summaries = []
+        for i in range(seconds):
+            second = buffered[i * self.rate:(i + 1) * self.rate]
+            summaries.append(self._analyze_second(second, now - (seconds - 1 - i)))
+        return summaries
+
+    def features(self, samples):
+        """Per-frame features of int16 samples (level_db, centroid, flatness, periodicity, bands_db arrays)."""
+        count = len(samples) // self.frame_size
+        frames = samples[:count * self.frame_size].reshape(count, self.frame_size).astype(np.float32) / 32768.0
+        level_db = 10.0 * np.log10(np.maximum(np.mean(frames * frames, axis=1), 1e-12))
+        power = np.abs(np.fft.rfft(frames * self._window, n=self._fft_size, axis=1)) ** 2
+        acf = np.fft.irfft(power, n=self._fft_size, axis=1)
+        lags = acf[:, self._min_lag:self._max_lag + 1] / self._window_acf
+        periodicity = np.clip(lags.max(axis=1) / np.maximum(acf[:, 0], 1e-12), 0.0, 1.0)
+        power += 1e-12
+        centroid = (power @ self._freqs) / power.sum(axis=1)
+        flatness = np.exp(np.mean(np.log(power), axis=1)) / np.mean(power, axis=1)
+        bands_db = 10.0 * np.log10(power @ self._bands + 1e-12)
+        return {"level_db": level_db, "centroid": centroid, "flatness": flatness, "periodicity": periodicity,
+                "bands_db": bands_db}
+
+    def _analyze_second(self, samples, timestamp):
+        started = time.perf_counter()
+        f = self.features(samples)
+        level_db = f["level_db"]
+        audible = level_db > DIGITAL_SILENCE_DB
+        if audible.any():
+            quiet_db = float(np.percentile(level_db[audible], NOISE_PERCENTILE))
+            if self.noise_db is None:
+                self.noise_db = quiet_db
+            else:
+                self.noise_db += min(max(quiet_db - self.noise_db, -NOISE_MAX_DROP_DB), NOISE_MAX_RISE_DB)
+        # Chưa từng có frame nào có tín hiệu: coi nền nhiễu là mức im lặng số
+        noise_db = DIGITAL_SILENCE_DB if self.noise_db is None else self.noise_db
+        active = audible & (level_db > noise_db + ACTIVE_MARGIN_DB)
+
+        voiced = active & (f["periodicity"] >= VOICED_MIN_PERIODICITY)
+        whisper = (active & (f["periodicity"] <= WHISPER_MAX_PERIODICITY)
+                   & (f["centroid"] >= WHISPER_MIN_CENTROID_HZ)
+                   & (level_db < noise_db + WHISPER_MAX_MARGIN_DB))
+        frame_count = len(level_db)
+        voiced_ratio = float(voiced.sum()) / frame_count
+        whisper_ratio = float(whisper.sum()) / frame_count
+
+        speaker_distance = None
+        if voiced.sum() >= 3:
+            # Hình dạng phổ: trừ mức trung bình để không phụ thuộc độ to
+            shape = f["bands_db"][voiced].mean(axis=0)
+            shape = shape - shape.mean()
+            if self.profile is not None and self._profile_seconds >= REFERENCE_SECONDS:
+                speaker_distance = float(np.sqrt(np.mean((shape - self.profile) ** 2)))
+            if speaker_distance is None or speaker_distance < SPEAKER_CHANGE_DB:
+                # Chỉ cập nhật hồ sơ bằng những giây giống giọng thí sinh
+                if self.profile is None:
+                    self.profile = shape
+                else:
+                    alpha = max(PROFILE_ADAPT, 1.0 / (self._profile_seconds + 1))
+                    self.profile = (1 - alpha) * self.profile + alpha * shape
+                self._profile_seconds += 1
+
+        summary = {
+            "time": timestamp,
+            "level_db": float(level_db.mean()),
+            "peak_db": float(level_db.max()),
+            "noise_db": self.noise_db,
+            "voiced_ratio": voiced_ratio,
+            "whisper_ratio": whisper_ratio,
+            "centroid_hz": float(f["centroid"][active].mean()) if active.any() else 0.0,
+            "flatness": float(f["flatness"].mean()),
+            "periodicity": float(f["periodicity"][active].mean()) if active.any() else 0.0,
+            "speaker_distance_db": speaker_distance,
+        }
+        self.summaries.append(summary)
+        self.seconds_analyzed += 1
+        self._detect_events(summary)
+        gauge("audio_level_db").set(summary["level_db"])
+        if self.noise_db is not None:
+            gauge("audio_noise_db").set(self.noise_db)
+        if speaker_distance is not None:
+            gauge("audio_speaker_distance_db").set(speaker_distance)
+        histogram("audio_analytics_seconds").observe(time.perf_counter() - started)
+        if self.on_summary:
+            self.on_summary(summary)
+        return summary
+
+    def _detect_events(self, summary):
+        whispering = summary["whisper_ratio"] >= WHISPER_RATIO and summary["voiced_ratio"] < WHISPER_RATIO
+        self._whisper_run = self._whisper_run + 1 if whispering else 0
+        if self._whisper_run >= WHISPER_SECONDS:
+            self._emit("whisper", summary, {"seconds": self._whisper_run, "whisper_ratio": summary["whisper_ratio"]})
+
+        distance = summary["speaker_distance_db"]
+        different = (distance is not None and distance >= SPEAKER_CHANGE_DB
+                     and summary["voiced_ratio"] >= SPEAKER_MIN_VOICED_RATIO)
+        self._speaker_run = self._speaker_run + 1 if different else 0
+        if self._speaker_run >= SECOND_VOICE_SECONDS:
+            self._emit("second_voice", summary, {"seconds": self._speaker_run, "distance_db": distance})
+
+    def _emit(self, kind, summary, details):
+        now = summary["time"]
+        if now - self._last_event.get(kind, float("-inf")) < EVENT_COOLDOWN:
+            return
+        self._last_event[kind] = now
+        self.event_counts[kind] = self.event_counts.get(kind, 0) + 1
+        counter("audio_analytics_events_total", kind=kind).inc()
+        if self.on_event:
+            self.on_event(kind, details)
+
+    def flagged_since(self, since):
+        """True if any event was emitted at or after `since` (epoch seconds)."""
+        return any(at >= since for at in self._last_event.values())
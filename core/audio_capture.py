@@ -0,0 +1,85 @@
+import threading
+
+import numpy as np
+
+class AudioRingBuffer:
+    """
+    Preallocated int16 single-producer/single-consumer ring buffer between
+    the PyAudio callback and the reader.
+
+    write() runs on the PortAudio callback thread and takes no lock: it
+    announces the range it is about to overwrite (_reserve_pos), copies into
+    the preallocated array and only then publishes _write_pos, so the
+    reader never sees samples that are still being copied. The reader owns
+    _read_pos and waits on an Event instead of a shared Condition. When the
+    reader falls more than `capacity` samples behind, the writer simply
+    overwrites the oldest unread samples; the reader notices on its next
+    read, skips them and counts them in overrun_samples, so a gap is always
+    visible instead of silently lost. Position updates rely on int attribute
+    stores being atomic under the GIL.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._buffer = np.zeros(capacity, dtype=np.int16)
+        self._write_pos = 0  # Tổng số mẫu đã ghi xong (tăng đơn điệu), chỉ writer cập nhật
+        self._reserve_pos = 0  # Vị trí writer sắp ghi tới; mẫu trước reserve_pos - capacity có thể đã bị ghi đè
+        self._read_pos = 0  # Chỉ reader cập nhật
+        self._data_ready = threading.Event()
+        self.closed = False
+        self.overrun_samples = 0
+
+    def write(self, samples):
+        n = len(samples)
+        start_pos = self._write_pos
+        if n > self.capacity:
+            # Phần đầu không vừa buffer coi như bị ghi đè ngay
+            start_pos += n - self.capacity
+            samples = samples[-self.capacity:]
+            n = self.capacity
+        end_pos = start_pos + n
+        self._reserve_pos = end_pos
+        start = start_pos % self.capacity
+        first = min(n, self.capacity - start)
+        self._buffer[start:start + first] = samples[:first]
+        self._buffer[:n - first] = samples[first:]
+        self._write_pos = end_pos
+        self._data_ready.set()
+
+    def read(self, max_samples, timeout=None):
+        """Returns up to max_samples unread samples (a copy); empty on timeout or close."""
+        # Xóa cờ trước khi kiểm tra để không bỏ lỡ lần write() xảy ra giữa hai bước
+        self._data_ready.clear()
+        if self._write_pos == self._read_pos and not self.closed:
+            self._data_ready.wait(timeout)
+        write_pos, read_pos = self._write_pos, self._read_pos
+        if write_pos - read_pos > self.capacity:
+            # Người đọc bị chậm quá một vòng: bỏ phần chưa đọc đã bị ghi đè
+            self.overrun_samples += write_pos - self.capacity - read_pos
+            read_pos = write_pos - self.capacity
+        n = min(max_samples, write_pos - read_pos)
+        if n <= 0:
+            return np.zeros(0, dtype=np.int16)
+        start = read_pos % self.capacity
+        first = min(n, self.capacity - start)
+        out = np.empty(n, dtype=np.int16)
+        out[:first] = self._buffer[start:start + first]
+        out[first:] = self._buffer[:n - first]
+        # Writer có thể đã ghi đè phần đầu trong lúc đang chép: bỏ phần không còn hợp lệ
+        torn = min(n, self._reserve_pos - self.capacity - read_pos)
+        if torn > 0:
+            self.overrun_samples += torn
+            out = out[torn:]
+        self._read_pos = read_pos + n
+        return out
+
+    def available(self):
+        return min(self._write_pos - self._read_pos, self.capacity)
+
+    @property
+    def written_samples(self):
+        return self._write_pos
+
+    def close(self):
+        self.closed = True
+        self._data_ready.set()
@@ -1,92 +1,285 @@
+import numpy as np
+import os
 import pyaudio
-import speech_recognition as sr
 import threading
 import time
 
+from core.audio_analytics import AudioAnalytics
+from core.audio_capture import AudioRingBuffer
+from core.metrics import counter, gauge, histogram
+from core.keyword_matcher import create_keyword_matcher
+from core.pipeline import LatestValueQueue, DROP_OLDEST
+from core.speech_backends import create_recognizer, RecognizerError
+from core.vad import UtteranceSegmenter
+
 # ================= CONFIG =================
 CHUNK = 1024  # Kích thước mỗi khối âm thanh
 FORMAT = pyaudio.paInt16  # Định dạng âm thanh
 CHANNELS = 1  # Số kênh âm thanh
 RATE = 16000  # Tốc độ lấy mẫu (Hz)
-
-FORBIDDEN_KEYWORDS = [
-    "đáp án", "quay cóp", "gian lận", "tài liệu", "trợ giúp",
-    "câu hỏi", "bài làm", "kết quả"
-] # Từ khóa cấm
+RING_SECONDS = 30  # Dung lượng ring buffer giữa callback PyAudio và luồng VAD
+RECOGNITION_WORKERS = 2
+UTTERANCE_QUEUE_SIZE = 8  # Câu nói chờ nhận dạng; khi đầy bỏ câu cũ nhất (DROP_OLDEST)
+STREAM_QUEUE_SIZE = 64  # Đoạn âm thanh chờ backend streaming (một worker, giữ thứ tự)
+# "auto" (ưu tiên nhận dạng offline), "vosk", "google" hoặc "mock"
+RECOGNIZER_BACKEND = os.environ.get("ALT_RECOGNIZER", "auto")
+RECOGNIZER_CONFIG = {
+    "common": {"language": "vi-VN"},
+}
+# "always": nhận dạng mọi câu nói; "flagged": backend batch (tốn mạng/tiền) chỉ nhận dạng
+# các câu nói trong vòng RECOGNITION_GATE_SECONDS sau khi phân tích âm thanh báo bất thường
+RECOGNITION_GATE = os.environ.get("ALT_AUDIO_RECOGNITION_GATE", "always")
+RECOGNITION_GATE_SECONDS = 15.0
 
 class AudioMonitor:
-    def __init__(self):
+    """
+    Microphone monitor: PyAudio callback -> ring buffer -> VAD -> recognizer.
+
+    Capture runs in the PortAudio callback and only copies into a
+    preallocated ring buffer, so recognizer latency never stalls the input
+    stream. A segmenter thread turns the buffer into utterances. With a
+    batch backend (Google) complete utterances go to RECOGNITION_WORKERS
+    threads through a bounded queue; a streaming backend (Vosk, mock) gets
+    the audio of each utterance as it arrives on a single worker and
+    keywords are matched incrementally on its partial hypotheses before
+    the utterance ends. When recognition cannot keep up the oldest waiting item is
+    dropped and counted. stats() reports input overflows, ring overruns
+    and drops.
+
+    AudioAnalytics runs on the same samples in the segmenter thread and
+    reports whispering / second-voice events through audio_event_callback;
+    without a usable recognizer only the analytics run.
+    """
+
+    def __init__(self, backend=None, keywords=None, workers=RECOGNITION_WORKERS, queue_size=None,
+                 drop_policy=DROP_OLDEST):
         self.p = pyaudio.PyAudio()
         self.stream = None
-        self.recognizer = sr.Recognizer()
+        self.backend = backend
+        self.keywords = keywords
+        self.workers = workers
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self.ring = None
+        self.utterances = None
         self.audio_thread = None
+        self.worker_threads = []
         self.running = False
         self.speech_detected_callback = None
         self.keyword_detected_callback = None
+        self.audio_event_callback = None
+        self.analytics = None
+        self.gated_count = 0
+        self.input_overflow_count = 0
+        self.recognized_count = 0
+        self.partial_count = 0
+        self._reported_overrun = 0
+        self._count_lock = threading.Lock()
 
-    def start_monitoring(self, speech_callback=None, keyword_callback=None):
+    def start_monitoring(self, speech_callback=None, keyword_callback=None, backend=None, audio_event_callback=None):
         if self.running:
             print("Audio monitoring already running.")
             return
         
         self.speech_detected_callback = speech_callback
         self.keyword_detected_callback = keyword_callback
+        self.audio_event_callback = audio_event_callback
+        if backend is not None:
+            self.backend = backend
+        if self.backend is None:
+            self.backend = create_recognizer(RECOGNIZER_BACKEND, **RECOGNIZER_CONFIG)
+        if self.backend is not None and not self.backend.available:
+            self.backend = None
+        if self.backend is None:
+            print("✗ Không có backend nhận dạng giọng nói, chỉ chạy phân tích âm thanh.")
+        if self.keywords is None:
+            self.keywords = create_keyword_matcher()
+        self.analytics = AudioAnalytics(RATE, on_event=self._on_audio_event)
+        streaming = self.backend is not None and self.backend.streaming
+        workers = 0 if self.backend is None else 1 if streaming else self.workers
+        queue_size = self.queue_size or (STREAM_QUEUE_SIZE if streaming else UTTERANCE_QUEUE_SIZE)
+        self.ring = AudioRingBuffer(RING_SECONDS * RATE)
+        self.utterances = LatestValueQueue(queue_size, self.drop_policy, on_drop=self._on_utterance_dropped)
 
         try:
             self.stream = self.p.open(format=FORMAT,
                                       channels=CHANNELS,
                                       rate=RATE,
                                       input=True,
-                                      frames_per_buffer=CHUNK)
+                                      frames_per_buffer=CHUNK,
+                                      stream_callback=self._on_audio)
             self.running = True
-            self.audio_thread = threading.Thread(target=self._audio_loop, daemon=True)
+            self.audio_thread = threading.Thread(target=self._audio_loop, name="audio-vad", daemon=True)
             self.audio_thread.start()
-            print("✓ Bắt đầu giám sát âm thanh.")
+            self.worker_threads = [threading.Thread(target=self._recognition_loop, name=f"audio-recognizer-{i}",
+                                                    daemon=True) for i in range(workers)]
+            for thread in self.worker_threads:
+                thread.start()
+            self.stream.start_stream()
+            print(f"✓ Bắt đầu giám sát âm thanh (nhận dạng: {self.backend.name if self.backend else 'tắt'}).")
         except Exception as e:
             print(f"✗ Lỗi khi khởi động giám sát âm thanh: {e}")
             self.running = False
+            self.ring.close()
+            self.utterances.close()
 
     def stop_monitoring(self):
         if self.running:
             self.running = False
-            if self.audio_thread and self.audio_thread.is_alive():
-                self.audio_thread.join(timeout=2)  # Chờ thread kết thúc
             if self.stream:
                 self.stream.stop_stream()
                 self.stream.close()
-            print("✓ Đã dừng giám sát âm thanh.")
+            self.ring.close()
+            if self.audio_thread and self.audio_thread.is_alive():
+                self.audio_thread.join(timeout=2)  # Chờ thread kết thúc
+            self.utterances.on_drop = None  # Câu nói còn chờ khi dừng không phải là quá tải
+            self.utterances.close()
+            for thread in self.worker_threads:
+                if thread.is_alive():
+                    thread.join(timeout=2)
+            stats = self.stats()
+            print(f"✓ Đã dừng giám sát âm thanh. (tràn input: {stats['input_overflows']}, "
+                  f"mất mẫu ring: {stats['ring_overrun_samples']}, bỏ câu nói: {stats['utterances_dropped']})")
+
+    def _on_audio(self, in_data, frame_count, time_info, status):
+        # Chạy trên luồng callback của PortAudio: chỉ chép vào ring buffer, không làm gì chậm ở đây
+        if status & pyaudio.paInputOverflow:
+            self.input_overflow_count += 1
+        self.ring.write(np.frombuffer(in_data, dtype=np.int16))
+        return None, pyaudio.paContinue
+
+    def _on_utterance_dropped(self, item):
+        kind, samples = item
+        counter("audio_utterances_dropped_total").inc()
+        seconds = len(samples) / RATE if samples is not None else 0.0
+        print(f"⚠ Nhận dạng giọng nói không theo kịp, bỏ một đoạn âm thanh ({kind}, {seconds:.1f}s).")
 
     def _audio_loop(self):
+        # Chỉ gửi những câu nói hoàn chỉnh (VAD + pre-roll/hangover) đi nhận dạng, không gửi từng khối 64 ms
+        segmenter = UtteranceSegmenter(RATE)
         while self.running:
             try:
-                data = self.stream.read(CHUNK, exception_on_overflow=False)
-                audio_data = sr.AudioData(data, RATE, 2) # 2 bytes per sample (paInt16)
-
-                try:
-                    text = self.recognizer.recognize_google(audio_data, language="vi-VN")
-                    if text:
-                        print(f"🎤 Phát hiện tiếng nói: \"{text}\"")
-                        if self.speech_detected_callback:
-                            self.speech_detected_callback(text)
-
-                        for keyword in FORBIDDEN_KEYWORDS:
-                            if keyword in text.lower():
-                                print(f"🚨 Phát hiện từ khóa cấm: \"{keyword}\" trong \"{text}\"")
-                                if self.keyword_detected_callback:
-                                    self.keyword_detected_callback(keyword, text)
-                                break
-
-                except sr.UnknownValueError:
-                    pass # Không phát hiện tiếng nói
-                except sr.RequestError as e:
-                    # Lỗi API của Google Speech Recognition (ví dụ: không có mạng)
-                    print(f"✗ Lỗi Speech Recognition: {e}")
-                    time.sleep(1) # Chờ trước khi thử lại
-
+                samples = self.ring.read(RATE, timeout=0.5)
+                if not len(samples):
+                    continue
+                self.analytics.process(samples)
+                for kind, segment in segmenter.segment(samples):
+                    if kind == "end" and segment is not None:
+                        counter("audio_utterances_total").inc()
+                        histogram("audio_utterance_seconds").observe(len(segment) / RATE)
+                    if self.backend is None:
+                        continue
+                    # Backend streaming nhận âm thanh ngay khi có; backend batch chỉ nhận câu hoàn chỉnh
+                    if self.backend.streaming:
+                        self.utterances.put((kind, segment))
+                    elif kind == "end" and segment is not None and self._should_recognize():
+                        self.utterances.put((kind, segment))
+                gauge("audio_voiced_ratio").set(segmenter.voiced_count / max(segmenter.frame_count, 1))
+                self._report_capture_loss()
             except Exception as e:
                 print(f"✗ Lỗi trong vòng lặp ghi âm: {e}")
                 self.running = False # Dừng giám sát nếu có lỗi nghiêm trọng
 
+    def _should_recognize(self):
+        if RECOGNITION_GATE != "flagged":
+            return True
+        if self.analytics.flagged_since(time.time() - RECOGNITION_GATE_SECONDS):
+            return True
+        with self._count_lock:
+            self.gated_count += 1
+        counter("audio_utterances_gated_total").inc()
+        return False
+
+    def _on_audio_event(self, kind, details):
+        print(f"🔊 Phân tích âm thanh: phát hiện {kind} {details}")
+        if self.audio_event_callback:
+            self.audio_event_callback(kind, details)
+
+    def _report_capture_loss(self):
+        gauge("audio_input_overflows").set(self.input_overflow_count)
+        overrun = self.ring.overrun_samples
+        if overrun > self._reported_overrun:
+            counter("audio_ring_overrun_samples_total").inc(overrun - self._reported_overrun)
+            print(f"⚠ Ring buffer âm thanh bị ghi đè: mất {(overrun - self._reported_overrun) / RATE:.2f}s âm thanh.")
+            self._reported_overrun = overrun
+
+    def _recognition_loop(self):
+        stream = None
+        matches = None
+        while True:
+            item = self.utterances.get()
+            if item is None:
+                return
+            kind, samples = item
+            try:
+                if kind == "start":
+                    stream, matches = self.backend.open_stream(RATE), self.keywords.stream()
+                    self._accept(stream, samples, matches)
+                elif kind == "audio" and stream is not None:
+                    self._accept(stream, samples, matches)
+                elif kind == "end":
+                    with histogram("audio_recognition_seconds").time():
+                        if self.backend.streaming:
+                            # Câu quá ngắn bị VAD bỏ (samples None): chỉ hủy stream
+                            text = stream.finish() if stream is not None and samples is not None else None
+                        else:
+                            text, matches = self.backend.recognize(samples, RATE), self.keywords.stream()
+                    stream = None
+                    if text is not None:
+                        self._handle_text(text, matches)
+            except RecognizerError as e:
+                stream = None
+                counter("audio_recognition_total", result="error").inc()
+                print(f"✗ Lỗi Speech Recognition: {e}")
+                time.sleep(1) # Chờ trước khi thử lại
+            except Exception as e:
+                stream = None
+                counter("audio_recognition_total", result="error").inc()
+                print(f"✗ Lỗi nhận dạng giọng nói ({self.backend.name}): {e}")
+
+    def _accept(self, stream, samples, matches):
+        with histogram("audio_stream_accept_seconds").time():
+            partial = stream.accept(samples)
+        if partial:
+            with self._count_lock:
+                self.partial_count += 1
+            counter("audio_partials_total").inc()
+            self._check_keywords(partial, matches)
+
+    def stats(self):
+        return {
+            "captured_seconds": self.ring.written_samples / RATE if self.ring is not None else 0.0,
+            "input_overflows": self.input_overflow_count,
+            "ring_overrun_samples": self.ring.overrun_samples if self.ring is not None else 0,
+            "ring_backlog_samples": self.ring.available() if self.ring is not None else 0,
+            "utterances_queued": self.utterances.put_count if self.utterances is not None else 0,
+            "utterances_dropped": self.utterances.dropped_count if self.utterances is not None else 0,
+            "utterances_waiting": len(self.utterances) if self.utterances is not None else 0,
+            "recognized": self.recognized_count,
+            "partials": self.partial_count,
+            "gated": self.gated_count,
+            "analytics_events": dict(self.analytics.event_counts) if self.analytics is not None else {},
+        }
+
+    def _handle_text(self, text, matches):
+        if not text:
+            counter("audio_recognition_total", result="no_speech").inc() # Không phát hiện tiếng nói
+            return
+        counter("audio_recognition_total", result="text").inc()
+        with self._count_lock:
+            self.recognized_count += 1
+        print(f"🎤 Phát hiện tiếng nói: \"{text}\"")
+        if self.speech_detected_callback:
+            self.speech_detected_callback(text)
+        self._check_keywords(text, matches)
+
+    def _check_keywords(self, text, matches):
+        # `matches`: KeywordStream của câu hiện tại, chỉ trả về các lần xuất hiện chưa báo (kể cả từ giả thuyết tạm thời)
+        for match in matches.update(text):
+            print(f"🚨 Phát hiện từ khóa cấm: \"{match.keyword}\" trong \"{text}\" (vị trí {match.start})")
+            if self.keyword_detected_callback:
+                self.keyword_detected_callback(match.keyword, text)
+
     def __del__(self):
         self.stop_monitoring()
         self.p.terminate()
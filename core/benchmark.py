@@ -0,0 +1,204 @@
+"""
+Headless vision benchmark.
+
+Replays a recorded session (video file, image directory or camera) through
+FaceTracker, the object detector backends and verify_face without Firebase,
+and prints per-stage FPS, p50/p99 latency, peak RSS and detection counts as
+JSON:
+
+    python -m core.benchmark test/images --repeat 30 --reference data/registered_faces/123.jpg
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from core.frame_context import FrameContext, BufferPool
+from core.frame_sources import open_source
+
+STAGES = ("face", "mediapipe", "opencv_dnn", "verify")
+VERIFY_INTERVAL = 10  # Xác thực mỗi N frame, giống monitoring_loop
+
+class StageTimer:
+    def __init__(self):
+        self.latencies = []
+
+    def time(self, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def report(self):
+        if not self.latencies:
+            return {"runs": 0}
+        latencies = np.asarray(self.latencies)
+        total = float(latencies.sum())
+        return {
+            "runs": len(latencies),
+            "fps": len(latencies) / total if total > 0 else None,
+            "mean_ms": float(latencies.mean() * 1000),
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "max_ms": float(latencies.max() * 1000),
+        }
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if unknown."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss tính bằng KB trên Linux nhưng bằng byte trên macOS
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    except ImportError:
+        return None
+
+def stub_firebase():
+    """Routes telemetry to an InMemorySink so nothing reaches Firestore."""
+    from core.firebase_utils import set_sink
+    from core.telemetry import InMemorySink
+    sink = InMemorySink()
+    set_sink(sink)
+    return sink
+
+def run_benchmark(source, stages=STAGES, reference_path=None, max_frames=None,
+                  verify_interval=VERIFY_INTERVAL, detector_config=None):
+    stub_firebase()
+    # Stage không chạy được báo {"skipped": lý do}; {"runs": 0} chỉ dành cho stage có chạy nhưng không gặp frame nào phù hợp
+    skipped = {}
+    if "verify" in stages and not reference_path:
+        skipped["verify"] = "no reference image (--reference)"
+    stages = [s for s in stages if s not in skipped]
+    timers = {name: StageTimer() for name in ("read", *stages)}
+    detection_counts = {name: Counter() for name in stages if name in ("mediapipe", "opencv_dnn")}
+    face_counts = Counter()
+    verify_results = Counter()
+    load_times = {}
+
+    face_tracker = None
+    if "face" in stages or "verify" in stages:
+        from core.face_tracking import FaceTracker
+        started = time.perf_counter()
+        face_tracker = FaceTracker()
+        load_times["face"] = time.perf_counter() - started
+
+    detectors = {}
+    for name in list(detection_counts):
+        from core.detector_backends import create_detector
+        started = time.perf_counter()
+        detector = create_detector(name, **(detector_config or {}))
+        load_times[name] = time.perf_counter() - started
+        if detector is not None and detector.available:
+            detectors[name] = detector
+        else:
+            print(f"✗ Bỏ qua stage '{name}': không tải được detector")
+            skipped[name] = "detector failed to load"
+            del timers[name], detection_counts[name]
+
+    if "verify" in stages:
+        from core.face_auth import verify_face, get_reference_embedding
+        started = time.perf_counter()
+        reference = get_reference_embedding(reference_path)
+        load_times["verify"] = time.perf_counter() - started
+        if reference is None:
+            print("✗ Bỏ qua stage 'verify': không trích xuất được embedding từ ảnh tham chiếu")
+            skipped["verify"] = "no embedding from reference image"
+            del timers["verify"]
+
+    pool = BufferPool()
+    frame_id = 0
+    started_at = time.perf_counter()
+    while max_frames is None or frame_id < max_frames:
+        ret, frame = timers["read"].time(source.read)
+        if not ret:
+            break
+        frame_id += 1
+        context = FrameContext(frame, frame_id, time.time(), pool)
+
+        if face_tracker is not None:
+            timer = timers.get("face") or StageTimer()
+            timer.time(face_tracker.process_frame, frame, context, draw=False)
+            face_counts[face_tracker.last_face_count] += 1
+
+        for name, detector in detectors.items():
+            for detection in timers[name].time(detector.detect, frame, context):
+                detection_counts[name][detection["label"]] += 1
+
+        if "verify" in timers and frame_id % verify_interval == 0 and face_tracker.last_face_count == 1:
+            crop = face_tracker.aligned_face_crop(frame)
+            if crop is not None:
+                verified = timers["verify"].time(verify_face, crop, reference_path, aligned=True)
+                verify_results[str(verified)] += 1
+
+        context.release()
+    elapsed = time.perf_counter() - started_at
+
+    for detector in detectors.values():
+        detector.close()
+
+    return {
+        "frames": frame_id,
+        "elapsed_s": elapsed,
+        "end_to_end_fps": frame_id / elapsed if elapsed > 0 else None,
+        "stages": {**{name: timer.report() for name, timer in timers.items()},
+                   **{name: {"skipped": reason} for name, reason in skipped.items()}},
+        "load_s": load_times,
+        "peak_rss_mb": peak_rss_mb(),
+        "faces_per_frame": {str(k): v for k, v in sorted(face_counts.items())},
+        "detections": {name: dict(counts) for name, counts in detection_counts.items()},
+        "verification": dict(verify_results),
+        "platform": {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()},
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark các stage thị giác trên một phiên đã ghi")
+    parser.add_argument("source", help="Camera index, tệp video hoặc thư mục ảnh (ví dụ test/images)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Danh sách stage, mặc định {','.join(STAGES)}")
+    parser.add_argument("--reference", help="Ảnh khuôn mặt đã đăng ký cho stage verify")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần lặp mỗi ảnh khi nguồn là thư mục ảnh")
+    parser.add_argument("--output", help="Ghi kết quả JSON vào tệp thay vì stdout")
+    args = parser.parse_args(argv)
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        parser.error(f"Stage không hợp lệ: {', '.join(sorted(unknown))}")
+
+    source = open_source(args.source, repeat=args.repeat)
+    if not source.isOpened():
+        print(f"✗ Không thể mở nguồn frame: {args.source}", file=sys.stderr)
+        return 1
+    if args.reference and not os.path.exists(args.reference):
+        print(f"✗ Không tìm thấy ảnh tham chiếu: {args.reference}", file=sys.stderr)
+        return 1
+    try:
+        # Log của các module đi ra stderr để stdout chỉ chứa JSON
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_benchmark(source, stages, args.reference, args.max_frames)
+    finally:
+        source.release()
+    report["source"] = args.source
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ Đã ghi kết quả benchmark vào {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
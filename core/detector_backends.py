@@ -0,0 +1,182 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+DETECTOR_BACKENDS = {}
+
+# COCO mAP công bố của từng mô hình, dùng làm "sàn độ chính xác" khi tự chọn backend
+MIN_ACCURACY = 25.0
+
+def register_backend(name):
+    def decorator(cls):
+        cls.name = name
+        DETECTOR_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+class DetectorBackend:
+    """
+    Common interface of object detector backends.
+
+    detect(frame, context=None) returns a list of dicts with 'label',
+    'score' and 'bbox' (x, y, w, h), the same format as ObjectDetector.detect.
+    `available` is False when the model or runtime could not be loaded.
+    """
+
+    name = None
+    accuracy = 0.0
+
+    def __init__(self, input_size=None, num_threads=0, **options):
+        self.input_size = input_size
+        self.num_threads = num_threads
+        self.options = options
+        self.available = False
+
+    def detect(self, frame, context=None):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+@register_backend("mediapipe")
+class MediaPipeBackend(DetectorBackend):
+    """EfficientDet-Lite0 through MediaPipe Tasks (input size fixed by the model)."""
+
+    accuracy = 25.7
+
+    def __init__(self, model_path='config/efficientdet_lite0.tflite', max_results=5, score_threshold=0.5, **kwargs):
+        super().__init__(**kwargs)
+        from core.object_detection import ObjectDetector
+        self.detector = ObjectDetector(model_path, max_results=max_results, score_threshold=score_threshold)
+        self.available = self.detector.detector is not None
+
+    def detect(self, frame, context=None):
+        return self.detector.detect(frame, context)
+
+    def close(self):
+        if self.detector.detector:
+            self.detector.detector.close()
+
+DNN_BACKENDS = {
+    "default": cv2.dnn.DNN_BACKEND_DEFAULT,
+    "opencv": cv2.dnn.DNN_BACKEND_OPENCV,
+    "openvino": cv2.dnn.DNN_BACKEND_INFERENCE_ENGINE,
+    "cuda": cv2.dnn.DNN_BACKEND_CUDA,
+}
+
+DNN_TARGETS = {
+    "cpu": cv2.dnn.DNN_TARGET_CPU,
+    "opencl": cv2.dnn.DNN_TARGET_OPENCL,
+    "opencl_fp16": cv2.dnn.DNN_TARGET_OPENCL_FP16,
+    "cuda": cv2.dnn.DNN_TARGET_CUDA,
+    "cuda_fp16": cv2.dnn.DNN_TARGET_CUDA_FP16,
+}
+
+@register_backend("opencv_dnn")
+class OpenCVDnnBackend(DetectorBackend):
+    """yolov7-tiny through OpenCV DNN (core/yolo_detect)."""
+
+    accuracy = 33.0
+
+    def __init__(self, weights_path="config/yolov7-tiny.weights", cfg_path="config/yolov7-tiny.cfg",
+                 names_path="config/coco.names", dnn_backend="default", dnn_target="cpu",
+                 keep_classes=None, **kwargs):
+        super().__init__(**kwargs)
+        from core import yolo_detect
+        self._yolo = yolo_detect
+        self.input_size = self.input_size or yolo_detect.INPUT_SIZE
+        if not os.path.exists(weights_path):
+            print(f"✗ YOLO load error: không tìm thấy {weights_path}")
+            self.net, self.classes, self.output_layers = None, [], []
+            return
+        self.net, self.classes, self.output_layers = yolo_detect.init_yolo(weights_path, cfg_path, names_path)
+        if self.net is None:
+            return
+        try:
+            self.net.setPreferableBackend(DNN_BACKENDS[dnn_backend])
+            self.net.setPreferableTarget(DNN_TARGETS[dnn_target])
+        except Exception as e:
+            print(f"✗ Không thể đặt DNN backend/target {dnn_backend}/{dnn_target}: {e}")
+        if self.num_threads:
+            cv2.setNumThreads(self.num_threads)
+        self.keep_class_ids = yolo_detect.class_ids_for(self.classes, keep_classes) if keep_classes else None
+        self.available = True
+
+    def detect(self, frame, context=None):
+        if not self.available:
+            return []
+        indices, boxes, confidences, class_ids = self._yolo.detect_objects(
+            frame, self.net, self.output_layers, self.classes, context,
+            keep_class_ids=self.keep_class_ids, input_size=self.input_size)
+        return [{'label': self.classes[class_ids[i]], 'score': confidences[i], 'bbox': tuple(boxes[i])}
+                for i in np.array(indices).flatten()]
+
+def create_detector(name, **config):
+    """
+    Instantiates a registered backend. `config` holds a "common" dict
+    (input_size, num_threads) plus optional per-backend dicts keyed by name.
+    """
+    if name not in DETECTOR_BACKENDS:
+        raise ValueError(f"Unknown detector backend: {name} (có: {', '.join(DETECTOR_BACKENDS)})")
+    backend_cls = DETECTOR_BACKENDS[name]
+    options = {**config.get("common", {}), **config.get(name, {})}
+    try:
+        return backend_cls(**options)
+    except Exception as e:
+        print(f"✗ Không thể khởi tạo backend '{name}': {e}")
+        return None
+
+def benchmark_backend(backend, frames, warmup=2, runs=10):
+    """Mean detect() latency in seconds over `runs` calls cycling through `frames`."""
+    for i in range(warmup):
+        backend.detect(frames[i % len(frames)])
+    started = time.perf_counter()
+    for i in range(runs):
+        backend.detect(frames[i % len(frames)])
+    return (time.perf_counter() - started) / runs
+
+def select_detector(frames, config=None, names=None, min_accuracy=MIN_ACCURACY, warmup=2, runs=10):
+    """
+    Benchmarks every available backend on `frames` (ideally real camera
+    frames from this machine) and returns (backend, report).
+
+    The fastest backend whose declared accuracy is at least min_accuracy
+    wins; if none qualifies the most accurate available one is used. Other
+    backends are closed. Returns (None, report) when nothing could load.
+    """
+    config = config or {}
+    report = []
+    candidates = []
+    for name in names or list(DETECTOR_BACKENDS):
+        backend = create_detector(name, **config)
+        if backend is None or not backend.available:
+            report.append({"name": name, "available": False})
+            continue
+        try:
+            latency = benchmark_backend(backend, frames, warmup, runs)
+        except Exception as e:
+            print(f"✗ Benchmark backend '{name}' lỗi: {e}")
+            report.append({"name": name, "available": False})
+            backend.close()
+            continue
+        print(f"  ⏱ {name}: {latency * 1000:.1f} ms/frame")
+        report.append({"name": name, "available": True, "latency": latency,
+                       "fps": 1.0 / latency if latency > 0 else None, "accuracy": backend.accuracy})
+        candidates.append((latency, backend))
+
+    qualified = [c for c in candidates if c[1].accuracy >= min_accuracy]
+    if qualified:
+        chosen = min(qualified, key=lambda c: c[0])[1]
+    elif candidates:
+        chosen = max(candidates, key=lambda c: c[1].accuracy)[1]
+    else:
+        chosen = None
+
+    for _, backend in candidates:
+        if backend is not chosen:
+            backend.close()
+    if chosen:
+        print(f"✓ Chọn detector backend: {chosen.name}")
+    return chosen, report
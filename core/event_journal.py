@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from core.firestore_writer import is_redundant, RETRY_BACKOFF, MAX_RETRY_BACKOFF
+from core.metrics import counter, histogram
+
+JOURNAL_PATH = "data/journal/events.db"
+COMMIT_INTERVAL = 0.05  # Gom các sự kiện trong khoảng này vào một transaction (group commit)
+SHIP_INTERVAL = 2.0  # Giây giữa hai lần gửi journal lên Firestore
+SHIP_BATCH_SIZE = 500
+JOURNAL_SEQ_FIELD = "journalSeq"  # journalSeq.<journal_id> = seq cuối cùng đã áp dụng cho tài liệu
+# Lỗi không thể tự hết khi thử lại (ví dụ tài liệu không tồn tại): bỏ batch thay vì chặn cả journal
+PERMANENT_ERRORS = ("NotFound", "InvalidArgument")
+
+class EventJournal:
+    """
+    Append-only local journal (SQLite in WAL mode) in front of Firestore.
+
+    append() only queues the event; a writer thread inserts everything
+    queued within COMMIT_INTERVAL in a single transaction, so the hot path
+    never touches the disk and at most that window is at risk on a crash.
+    Every event gets a monotonically increasing sequence number.
+
+    A replayer thread ships committed events in sequence order: each batch
+    is merged per document and sent with commit_fn(updates) (the same shape
+    as FirestoreWriter), together with journalSeq.<journal_id> set to the
+    last sequence number applied to that document. Shipped events are then
+    deleted locally. Server-timestamp fields are replayed as the time the
+    event was appended (make_timestamp(created)), not the upload time, so
+    events shipped after an outage keep their real time. On startup the replayer reads that field back for every
+    document with pending events and skips what was already applied, so a
+    crash between the upload and the local bookkeeping never applies an
+    event twice. Failed uploads are retried with exponential backoff; the
+    events stay on disk until they succeed.
+    """
+
+    def __init__(self, commit_fn, read_fn=None, path=JOURNAL_PATH, is_transform=None, make_timestamp=None,
+                 commit_interval=COMMIT_INTERVAL, ship_interval=SHIP_INTERVAL, batch_size=SHIP_BATCH_SIZE):
+        self.commit_fn = commit_fn
+        self.read_fn = read_fn
+        self.path = path
+        self.is_transform = is_transform or (lambda value: False)
+        self.make_timestamp = make_timestamp or (lambda created: created)
+        self.commit_interval = commit_interval
+        self.ship_interval = ship_interval
+        self.batch_size = batch_size
+        self._queue = []
+        self._last = {}
+        self._cond = threading.Condition()
+        self._ship_event = threading.Event()
+        self._stopped = threading.Event()
+        self.running = False
+        self._writer_thread = None
+        self._replay_thread = None
+        self.journal_id = None
+        self.backoff = 0.0
+        self.appended_count = 0
+        self.dropped_count = 0
+        self.committed_count = 0
+        self.shipped_count = 0
+        self.failure_count = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # WAL + NORMAL: transaction đã commit vẫn còn sau khi ứng dụng crash, chỉ mất khi mất điện
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        with conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS events (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                exam TEXT NOT NULL, student TEXT NOT NULL,
+                fields TEXT NOT NULL, created REAL NOT NULL)""")
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            row = conn.execute("SELECT value FROM meta WHERE key = 'journal_id'").fetchone()
+            if row is None:
+                self.journal_id = uuid.uuid4().hex[:12]
+                conn.execute("INSERT INTO meta VALUES ('journal_id', ?)", (self.journal_id,))
+            else:
+                self.journal_id = row[0]
+        pending = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        conn.close()
+        if pending:
+            print(f"⚠ Journal còn {pending} sự kiện chưa gửi từ phiên trước, sẽ gửi lại.")
+        return pending
+
+    def start(self):
+        if self.running:
+            return
+        self.open()
+        self.running = True
+        self._writer_thread = threading.Thread(target=self._writer_loop, name="journal-writer", daemon=True)
+        self._replay_thread = threading.Thread(target=self._replay_loop, name="journal-replay", daemon=True)
+        self._writer_thread.start()
+        self._replay_thread.start()
+
+    def stop(self, timeout=5):
+        """Commits everything queued, tries one last upload and stops both threads."""
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._writer_thread.join(timeout=timeout)
+        self._stopped.set()
+        self._ship_event.set()
+        if self._replay_thread and self._replay_thread.is_alive():
+            self._replay_thread.join(timeout=timeout)
+
+    def append(self, key, fields):
+        """Queues an event for (examId, studentId); never blocks on disk or network."""
+        with self._cond:
+            if is_redundant(fields, self._last.get(key, {}), self.is_transform):
+                self.dropped_count += 1
+                counter("journal_events_dropped_total").inc()
+                return
+            self._last.setdefault(key, {}).update(
+                {name: value for name, value in fields.items() if not self.is_transform(value)})
+            self._queue.append((key, fields, time.time()))
+            self.appended_count += 1
+            self._cond.notify()
+
+    # Giao diện chung với FirestoreWriter.update
+    submit = append
+
+    # --- Ghi xuống đĩa (group commit) ---
+
+    def _writer_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._queue or not self.running)
+                    running = self.running
+                if running:
+                    # Chờ thêm một chút để gom các sự kiện đến gần nhau vào cùng transaction
+                    time.sleep(self.commit_interval)
+                with self._cond:
+                    batch, self._queue = self._queue, []
+                if batch:
+                    try:
+                        self._commit(conn, batch)
+                    except sqlite3.Error as e:
+                        print(f"✗ Lỗi ghi journal: {e}")
+                        if running:
+                            # Giữ lại thứ tự: batch lỗi được ghi lại trước các sự kiện mới hơn
+                            with self._cond:
+                                self._queue[:0] = batch
+                            time.sleep(1)
+                            continue
+                if not running:
+                    return
+        finally:
+            conn.close()
+
+    def _commit(self, conn, batch):
+        rows = [(exam, student, json.dumps(fields, default=self._encode), created)
+                for (exam, student), fields, created in batch]
+        with histogram("journal_commit_seconds").time():
+            with conn:
+                conn.executemany("INSERT INTO events (exam, student, fields, created) VALUES (?, ?, ?, ?)", rows)
+        self.committed_count += len(rows)
+        counter("journal_events_committed_total").inc(len(rows))
+
+    def _encode(self, value):
+        if self.is_transform(value):
+            return {"__transform__": "server_timestamp"}
+        if hasattr(value, "item"):
+            return value.item()
+        raise TypeError(f"Không thể ghi {type(value)} vào journal")
+
+    def _decode(self, obj, created):
+        if obj.get("__transform__") == "server_timestamp":
+            # Thời điểm sự kiện được ghi vào journal, không phải lúc gửi lên
+            return self.make_timestamp(created)
+        return obj
+
+    # --- Gửi lên Firestore ---
+
+    def _replay_loop(self):
+        conn = self._connect()
+        try:
+            self._reconcile(conn)
+            while True:
+                if self.backoff:
+                    self._stopped.wait(self.backoff)
+                else:
+                    self._ship_event.wait(self.ship_interval)
+                self._ship_event.clear()
+                # Writer đã dừng hẳn trước khi _stopped được đặt, nên lần gửi này thấy mọi sự kiện cuối
+                stopping = self._stopped.is_set()
+                while self._ship_batch(conn):
+                    pass
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _reconcile(self, conn):
+        """Deletes events already applied in Firestore (journalSeq ahead of the local log)."""
+        if self.read_fn is None:
+            return
+        for exam, student in conn.execute("SELECT DISTINCT exam, student FROM events").fetchall():
+            try:
+                data = self.read_fn((exam, student)) or {}
+            except Exception as e:
+                print(f"✗ Không thể đối chiếu journal với Firestore: {e}")
+                return
+            applied = (data.get(JOURNAL_SEQ_FIELD) or {}).get(self.journal_id)
+            if applied:
+                with conn:
+                    deleted = conn.execute("DELETE FROM events WHERE exam = ? AND student = ? AND seq <= ?",
+                                           (exam, student, int(applied))).rowcount
+                if deleted:
+                    print(f"✓ Bỏ qua {deleted} sự kiện journal đã có trên Firestore.")
+
+    def _ship_batch(self, conn):
+        rows = conn.execute("SELECT seq, exam, student, fields, created FROM events ORDER BY seq LIMIT ?",
+                            (self.batch_size,)).fetchall()
+        if not rows:
+            return False
+        updates = {}
+        for seq, exam, student, fields, created in rows:
+            merged = updates.setdefault((exam, student), {})
+            merged.update(json.loads(fields, object_hook=lambda obj: self._decode(obj, created)))
+            merged[f"{JOURNAL_SEQ_FIELD}.{self.journal_id}"] = seq
+        try:
+            self.commit_fn(updates)
+        except Exception as e:
+            self.failure_count += 1
+            counter("journal_ship_failures_total").inc()
+            if type(e).__name__ in PERMANENT_ERRORS:
+                print(f"✗ Bỏ {len(rows)} sự kiện journal không thể gửi: {e}")
+                with conn:
+                    conn.execute("DELETE FROM events WHERE seq <= ?", (rows[-1][0],))
+                return True
+            self.backoff = min(max(self.backoff * 2, RETRY_BACKOFF), MAX_RETRY_BACKOFF)
+            print(f"[Firebase Error] {e} ({len(rows)} sự kiện vẫn nằm trong journal, thử lại sau {self.backoff:.0f}s)")
+            return False
+        self.backoff = 0.0
+        with conn:
+            conn.execute("DELETE FROM events WHERE seq <= ?", (rows[-1][0],))
+        self.shipped_count += len(rows)
+        counter("journal_events_shipped_total").inc(len(rows))
+        return len(rows) == self.batch_size
+
+    def pending_count(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        finally:
+            conn.close()
+
+    def stats(self):
+        return {
+            "journal_id": self.journal_id,
+            "appended": self.appended_count,
+            "dropped_identical": self.dropped_count,
+            "committed": self.committed_count,
+            "shipped": self.shipped_count,
+            "failures": self.failure_count,
+        }
@@ -0,0 +1,147 @@
+import os
+import re
+import threading
+import time
+
+import cv2
+import numpy as np
+
+EVIDENCE_DIR = "data/evidence"
+PRE_SECONDS = 5.0
+POST_SECONDS = 5.0
+RECORD_FPS = 10.0  # Tốc độ lưu vào bộ đệm, thấp hơn FPS camera để tiết kiệm bộ nhớ
+MAX_WIDTH = 320
+# Dư thêm vài giây trong vòng đệm để thread mã hóa kịp đọc trước khi frame bị ghi đè
+ENCODE_MARGIN = 3.0
+
+class EvidenceRecorder:
+    """
+    Keeps the last few seconds of video in a preallocated ring of downscaled
+    frames and writes a short clip around each event.
+
+    add() only resizes the frame into the next slot, so the capture path
+    never encodes anything and memory stays constant for the whole exam.
+    trigger() can be called from any thread; once POST_SECONDS have passed
+    a background thread encodes the frames from [event - pre, event + post]
+    to an MJPG .avi under output_dir. Frames overwritten before the encoder
+    reached them are skipped rather than blocking the capture path.
+    """
+
+    def __init__(self, output_dir=EVIDENCE_DIR, pre_seconds=PRE_SECONDS, post_seconds=POST_SECONDS,
+                 record_fps=RECORD_FPS, max_width=MAX_WIDTH, on_saved=None):
+        self.output_dir = output_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.record_fps = record_fps
+        self.max_width = max_width
+        self.on_saved = on_saved
+        self.capacity = int((pre_seconds + post_seconds + ENCODE_MARGIN) * record_fps)
+        self._frames = None  # Cấp phát một lần khi biết kích thước frame đầu tiên
+        self._timestamps = np.zeros(self.capacity, dtype=np.float64)
+        self._seqs = np.full(self.capacity, -1, dtype=np.int64)
+        self._next_seq = 0
+        self._last_stored = 0.0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition()
+        self._events = []
+        self.running = False
+        self.thread = None
+        self.saved_count = 0
+        self.skipped_frames = 0
+
+    @property
+    def memory_bytes(self):
+        return 0 if self._frames is None else self._frames.nbytes
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._encoder_loop, name="evidence-encoder", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the encoder; events still inside their post window are written with what is buffered."""
+        with self._cond:
+            self.running = False
+            self._cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def add(self, frame, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        if timestamp - self._last_stored < 1.0 / self.record_fps:
+            return
+        self._last_stored = timestamp
+        if self._frames is None:
+            h, w = frame.shape[:2]
+            scale = min(1.0, self.max_width / w)
+            self._size = (int(w * scale), int(h * scale))
+            self._frames = np.zeros((self.capacity, self._size[1], self._size[0], 3), dtype=np.uint8)
+        slot = self._next_seq % self.capacity
+        with self._lock:
+            cv2.resize(frame, self._size, dst=self._frames[slot], interpolation=cv2.INTER_AREA)
+            self._timestamps[slot] = timestamp
+            self._seqs[slot] = self._next_seq
+        self._next_seq += 1
+
+    def trigger(self, event, timestamp=None):
+        """Schedules a clip around `event` (e.g. "phone", "keyword")."""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._cond:
+            self._events.append((timestamp, event))
+            self._cond.notify()
+
+    def _encoder_loop(self):
+        while True:
+            with self._cond:
+                while self.running and not self._due_events():
+                    self._cond.wait(timeout=0.5)
+                events = self._due_events() if self.running else list(self._events)
+                for item in events:
+                    self._events.remove(item)
+            for timestamp, event in events:
+                try:
+                    self._write_clip(timestamp, event)
+                except Exception as e:
+                    print(f"✗ Lỗi khi ghi clip bằng chứng '{event}': {e}")
+            if not self.running:
+                return
+
+    def _due_events(self):
+        now = time.time()
+        return [item for item in self._events if now - item[0] >= self.post_seconds]
+
+    def _write_clip(self, timestamp, event):
+        start, end = timestamp - self.pre_seconds, timestamp + self.post_seconds
+        with self._lock:
+            if self._frames is None:
+                return
+            mask = (self._seqs >= 0) & (self._timestamps >= start) & (self._timestamps <= end)
+            candidates = np.sort(self._seqs[mask])
+        if not len(candidates):
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = time.strftime("%Y%m%d_%H%M%S", time.localtime(timestamp)) + f"_{int(timestamp * 1000) % 1000:03d}"
+        path = os.path.join(self.output_dir, f"{name}_{re.sub(r'[^A-Za-z0-9_-]', '_', event)}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), self.record_fps, self._size)
+        frame = np.empty_like(self._frames[0])
+        written = 0
+        try:
+            for seq in candidates:
+                slot = seq % self.capacity
+                with self._lock:
+                    # Slot đã bị ghi đè bởi frame mới hơn thì bỏ qua
+                    if self._seqs[slot] != seq:
+                        self.skipped_frames += 1
+                        continue
+                    frame[...] = self._frames[slot]
+                writer.write(frame)
+                written += 1
+        finally:
+            writer.release()
+        self.saved_count += 1
+        print(f"🎞 Đã lưu clip bằng chứng ({written} frame): {path}")
+        if self.on_saved:
+            self.on_saved(event, path)
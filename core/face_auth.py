@@ -1,14 +1,150 @@
-from deepface import DeepFace
+import hashlib
+import os
+import threading
 
-def verify_face(frame, reference_path):
+import numpy as np
+
+MODEL_NAME = "ArcFace"
+EMBEDDING_CACHE_DIR = "data/embedding_cache"
+# Ngưỡng cosine mặc định của DeepFace cho ArcFace; chỉ có ý nghĩa khi ảnh tham chiếu và ảnh trực tiếp
+# được cắt cùng một cách (xem get_reference_embedding(aligned=True))
+COSINE_THRESHOLD = 0.68
+
+_embedding_cache = {}
+_embedding_lock = threading.Lock()
+_models = {}
+
+def _deepface():
+    # DeepFace kéo theo TensorFlow (mất vài giây), chỉ import khi thật sự cần
+    from deepface import DeepFace
+    return DeepFace
+
+def _file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+def _represent(img, model_name, detector_backend="opencv"):
+    representations = _deepface().represent(
+        img_path=img,
+        model_name=model_name,
+        enforce_detection=False,
+        detector_backend=detector_backend
+    )
+    if not representations:
+        return None
+    return np.asarray(representations[0]["embedding"], dtype=np.float32)
+
+def cosine_distance(a, b):
+    return 1.0 - float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+def _aligned_reference_crop(reference_path):
+    """Face mesh crop of the registered photo, framed exactly like the live crops."""
+    import cv2
+    from core.face_tracking import FaceTracker
+    image = cv2.imread(reference_path)
+    if image is None:
+        return None
+    tracker = FaceTracker(max_num_faces=1)
+    tracker.process_frame(image, draw=False)
+    return tracker.aligned_face_crop(image)
+
+def get_reference_embedding(reference_path, model_name=MODEL_NAME, aligned=True):
+    """
+    Returns the embedding of a registered face, computing it at most once.
+
+    With aligned=True (what every live path compares against) the photo is
+    cropped with FaceTracker.aligned_face_crop and embedded with
+    detector_backend="skip", the same framing as the live crops; otherwise
+    DeepFace's own detection is used. Embeddings are kept in memory and
+    persisted under EMBEDDING_CACHE_DIR, keyed by the SHA-256 of the image
+    content, the model name and the cropping mode, so a re-registered photo
+    invalidates its entry automatically.
+    """
+    key = f"{_file_hash(reference_path)}_{model_name}{'_aligned' if aligned else ''}"
+    with _embedding_lock:
+        if key in _embedding_cache:
+            return _embedding_cache[key]
+
+        cache_path = os.path.join(EMBEDDING_CACHE_DIR, f"{key}.npy")
+        if os.path.exists(cache_path):
+            try:
+                embedding = np.load(cache_path)
+                _embedding_cache[key] = embedding
+                return embedding
+            except Exception as e:
+                print(f"✗ Cache embedding hỏng, tính lại: {e}")
+
+        crop = _aligned_reference_crop(reference_path) if aligned else None
+        if crop is not None:
+            embedding = _represent(crop, model_name, "skip")
+        else:
+            if aligned:
+                print(f"⚠ Face mesh không tìm thấy khuôn mặt trong {reference_path}, dùng bộ dò của DeepFace.")
+            embedding = _represent(reference_path, model_name)
+        if embedding is None:
+            return None
+        try:
+            os.makedirs(EMBEDDING_CACHE_DIR, exist_ok=True)
+            np.save(cache_path, embedding)
+        except Exception as e:
+            print(f"✗ Không thể lưu cache embedding: {e}")
+        _embedding_cache[key] = embedding
+        return embedding
+
+def verify_face(frame, reference_path, model_name=MODEL_NAME, threshold=COSINE_THRESHOLD, aligned=False):
+    """
+    Compares `frame` with the registered face. With aligned=True the frame is
+    an already cropped and aligned face (see FaceTracker.aligned_face_crop)
+    and DeepFace's own face detection is skipped.
+    """
     try:
-        result = DeepFace.verify(
-            img1_path=frame,
-            img2_path=reference_path,
-            model_name="ArcFace",
-            enforce_detection=False
-        )
-        return result.get("verified", False)
+        reference = get_reference_embedding(reference_path, model_name, aligned)
+        if reference is None:
+            print(f"DeepFace error: không trích xuất được embedding từ {reference_path}")
+            return None
+        live = _represent(frame, model_name, "skip" if aligned else "opencv")
+        if live is None:
+            return False
+        return cosine_distance(live, reference) <= threshold
     except Exception as e:
         print(f"DeepFace error: {e}")
         return None
+
+def embed_faces(crops, model_name=MODEL_NAME):
+    """
+    Embeds a batch of aligned BGR face crops with a single model forward
+    pass, using the same preprocessing as DeepFace.represent with
+    detector_backend="skip" so the embeddings match the reference ones.
+    Falls back to one DeepFace.represent call per crop on DeepFace versions
+    without batched forward().
+    """
+    if not crops:
+        return []
+    model = _models.get(model_name)
+    if model is None:
+        model = _models[model_name] = _deepface().build_model(model_name)
+    input_shape = getattr(model, "input_shape", None)
+    try:
+        from deepface.modules import preprocessing
+    except ImportError:
+        preprocessing = None
+    if preprocessing is None or input_shape is None or not hasattr(model, "forward"):
+        return [_represent(crop, model_name, "skip") for crop in crops]
+
+    # Như represent(): ảnh giữ nguyên thứ tự kênh BGR, resize giữ tỉ lệ + đệm 0, /255, chuẩn hóa "base"
+    batch = np.concatenate([
+        preprocessing.normalize_input(
+            img=preprocessing.resize_image(img=crop, target_size=(input_shape[1], input_shape[0])),
+            normalization="base")
+        for crop in crops])
+    embeddings = np.asarray(model.forward(batch), dtype=np.float32)
+    return list(embeddings.reshape(len(crops), -1))
+
+def preload_model(model_name=MODEL_NAME):
+    """Loads the model and runs one dummy embedding so the first real call is fast."""
+    if model_name not in _models:
+        _models[model_name] = _deepface().build_model(model_name)
+    _represent(np.zeros((112, 112, 3), dtype=np.uint8), model_name, "skip")
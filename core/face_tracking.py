@@ -1,106 +1,190 @@
-import mediapipe as mp
 import cv2
 import numpy as np
 
+# Mũi, hai khóe mắt ngoài, hai khóe miệng, cằm (dùng cho solvePnP)
+POSE_LANDMARKS = (1, 33, 61, 199, 263, 291)
+# Đỉnh trán, cằm, hai bên má: đủ để xác định khung bao khuôn mặt
+FACE_EXTENT_LANDMARKS = (10, 152, 234, 454)
+MIN_FACE_SIZE = 64
+# Khóe mắt ngoài trái/phải, dùng để xoay thẳng ảnh khuôn mặt trước khi đưa vào ArcFace
+EYE_CORNER_LANDMARKS = (33, 263)
+CROP_MARGIN = 0.2
+
 class FaceTracker:
-    def __init__(self):
+    def __init__(self, max_num_faces=2):
+        import mediapipe as mp
         self.mp_face_mesh = mp.solutions.face_mesh
-        self.face_mesh = self.mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+        # Theo dõi tối đa 2 khuôn mặt để biết khi nào có thêm người trong khung hình
+        self.face_mesh = self._create_face_mesh(max_num_faces)
         self.mp_drawing = mp.solutions.drawing_utils
         self.mp_drawing_styles = mp.solutions.drawing_styles
-
-    def process_frame(self, frame):
-        results = self.face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        self.last_face_landmarks = None
+        self.last_face_bbox = None
+        self.last_face_count = 0
+        self._cam_matrices = {}
+        self._dist_matrix = np.zeros((4, 1), dtype=np.float64)
+        self._rot_vec = None
+        self._trans_vec = None
+
+    def _create_face_mesh(self, max_num_faces):
+        return self.mp_face_mesh.FaceMesh(max_num_faces=max_num_faces, refine_landmarks=True, min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+    def draw_landmarks(self, image, face_landmarks):
+        # Vẽ lưới khuôn mặt
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_TESSELATION,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles
+            .get_default_face_mesh_tesselation_style())
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_CONTOURS,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles
+            .get_default_face_mesh_contours_style())
+        self.mp_drawing.draw_landmarks(
+            image=image,
+            landmark_list=face_landmarks,
+            connections=self.mp_face_mesh.FACEMESH_IRISES,
+            landmark_drawing_spec=None,
+            connection_drawing_spec=self.mp_drawing_styles
+            .get_default_face_mesh_iris_connections_style())
+
+    def _face_bbox(self, landmarks, img_w, img_h):
+        """Pixel box (x, y, w, h) around the face, clipped to the frame."""
+        pts = np.array([[landmarks[i].x, landmarks[i].y] for i in FACE_EXTENT_LANDMARKS]) * (img_w, img_h)
+        x0 = int(max(0, pts[:, 0].min()))
+        y0 = int(max(0, pts[:, 1].min()))
+        x1 = int(min(img_w, pts[:, 0].max()))
+        y1 = int(min(img_h, pts[:, 1].max()))
+        if x1 - x0 < MIN_FACE_SIZE or y1 - y0 < MIN_FACE_SIZE:
+            return None
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def _camera_matrix(self, img_w, img_h):
+        key = (img_w, img_h)
+        cam_matrix = self._cam_matrices.get(key)
+        if cam_matrix is None:
+            focal_length = 1 * img_w
+            cam_matrix = np.array([[focal_length, 0, img_w / 2],
+                                   [0, focal_length, img_h / 2],
+                                   [0, 0, 1]], dtype=np.float64)
+            self._cam_matrices[key] = cam_matrix
+        return cam_matrix
+
+    def process_frame(self, frame, context=None, draw=True):
+        # Dùng ảnh RGB dùng chung của FrameContext nếu có, tránh chuyển màu lặp lại
+        rgb_frame = context.rgb if context is not None else cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        img_h, img_w = frame.shape[:2]
+        # Luôn chạy trên toàn frame: FaceMesh ở chế độ video tự theo dõi vùng khuôn mặt giữa các frame,
+        # cắt ảnh với kích thước thay đổi liên tục làm hỏng việc theo dõi đó và landmark bị rung
+        results = self.face_mesh.process(rgb_frame)
         gaze_direction = "UNKNOWN"
         head_pose = "UNKNOWN"
-
-        if results.multi_face_landmarks:
-            for face_landmarks in results.multi_face_landmarks:
-                # Vẽ lưới khuôn mặt
-                self.mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_TESSELATION,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles
-                    .get_default_face_mesh_tesselation_style())
-                self.mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_CONTOURS,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles
-                    .get_default_face_mesh_contours_style())
-                self.mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_IRISES,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing_styles
-                    .get_default_face_mesh_iris_connections_style())
-
-                # Ước tính hướng nhìn và tư thế đầu
-                img_h, img_w, img_c = frame.shape
-                face_3d = []
-                face_2d = []
-
-                for idx, lm in enumerate(face_landmarks.landmark):
-                    if idx == 33 or idx == 263 or idx == 1 or idx == 61 or idx == 291 or idx == 199:
-                        if idx == 1:
-                            nose_2d = (lm.x * img_w, lm.y * img_h)
-                            nose_3d = (lm.x * img_w, lm.y * img_h, lm.z * 3000) 
-
-                        x, y = int(lm.x * img_w), int(lm.y * img_h)
-
-                        face_2d.append([x, y])
-                        face_3d.append([x, y, lm.z])       
-                
-                face_2d = np.array(face_2d, dtype=np.float64)
-                face_3d = np.array(face_3d, dtype=np.float64)
-
-                focal_length = 1 * img_w
-
-                cam_matrix = np.array([ [focal_length, 0, img_w / 2],
-                                        [0, focal_length, img_h / 2],
-                                        [0, 0, 1]])
-
-                dist_matrix = np.zeros((4, 1), dtype=np.float64)
-
-                success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, dist_matrix)
-
-                rmat, jac = cv2.Rodrigues(rot_vec)
-
-                angles, mtxR, mtxQ, Qx, Qy, Qz = cv2.RQDecomp3x3(rmat)
-
-                x = angles[0] * 360
-                y = angles[1] * 360
-                z = angles[2] * 360
-
-                if y < -10:
-                    head_pose = "Looking Left"
-                elif y > 10:
-                    head_pose = "Looking Right"
-                elif x < -10:
-                    head_pose = "Looking Down"
-                elif x > 10:
-                    head_pose = "Looking Up"
-                else:
-                    head_pose = "Forward"
-
-                # Để đơn giản, phần phát hiện ánh mắt sẽ chỉ kiểm tra một ngưỡng nhỏ cho tư thế đầu
-                # Để có độ chính xác cao hơn, cần phân tích kỹ hơn các điểm landmark của mắt
-                if abs(y) < 5 and abs(x) < 5: # Nếu đầu thẳng
-                    gaze_direction = "Forward"
-                elif y < -5:
-                    gaze_direction = "Left"
-                elif y > 5:
-                    gaze_direction = "Right"
-                elif x < -5:
-                    gaze_direction = "Down"
-                elif x > 5:
-                    gaze_direction = "Up"
+        self.last_face_landmarks = None
+        self.last_face_bbox = None
+        self.last_face_count = len(results.multi_face_landmarks or ())
+
+        if not results.multi_face_landmarks:
+            # Mất dấu khuôn mặt: lần sau giải PnP từ đầu
+            self._rot_vec = self._trans_vec = None
+            return frame, gaze_direction, head_pose
+
+        # Tư thế đầu chỉ tính cho khuôn mặt chính (đầu tiên)
+        for face_landmarks in results.multi_face_landmarks[:1]:
+            self.last_face_landmarks = face_landmarks
+            if draw:
+                self.draw_landmarks(frame, face_landmarks)
+
+            # Ước tính hướng nhìn và tư thế đầu: chỉ lấy trực tiếp 6 điểm cần dùng
+            landmarks = face_landmarks.landmark
+            pts = np.array([[landmarks[i].x, landmarks[i].y, landmarks[i].z] for i in POSE_LANDMARKS])
+            face_2d = np.empty((len(POSE_LANDMARKS), 2), dtype=np.float64)
+            face_2d[:, 0] = (pts[:, 0] * img_w).astype(np.int64)
+            face_2d[:, 1] = (pts[:, 1] * img_h).astype(np.int64)
+            face_3d = np.column_stack((face_2d, pts[:, 2]))
+
+            cam_matrix = self._camera_matrix(img_w, img_h)
+
+            if self._rot_vec is not None:
+                success, rot_vec, trans_vec = cv2.solvePnP(
+                    face_3d, face_2d, cam_matrix, self._dist_matrix,
+                    rvec=self._rot_vec.copy(), tvec=self._trans_vec.copy(), useExtrinsicGuess=True)
+            else:
+                success, rot_vec, trans_vec = cv2.solvePnP(face_3d, face_2d, cam_matrix, self._dist_matrix)
+            if success:
+                self._rot_vec, self._trans_vec = rot_vec, trans_vec
+            else:
+                self._rot_vec = self._trans_vec = None
+
+            rmat, jac = cv2.Rodrigues(rot_vec)
+
+            angles, mtxR, mtxQ, Qx, Qy, Qz = cv2.RQDecomp3x3(rmat)
+
+            x = angles[0] * 360
+            y = angles[1] * 360
+            z = angles[2] * 360
+
+            if y < -10:
+                head_pose = "Looking Left"
+            elif y > 10:
+                head_pose = "Looking Right"
+            elif x < -10:
+                head_pose = "Looking Down"
+            elif x > 10:
+                head_pose = "Looking Up"
+            else:
+                head_pose = "Forward"
+
+            # Để đơn giản, phần phát hiện ánh mắt sẽ chỉ kiểm tra một ngưỡng nhỏ cho tư thế đầu
+            # Để có độ chính xác cao hơn, cần phân tích kỹ hơn các điểm landmark của mắt
+            if abs(y) < 5 and abs(x) < 5: # Nếu đầu thẳng
+                gaze_direction = "Forward"
+            elif y < -5:
+                gaze_direction = "Left"
+            elif y > 5:
+                gaze_direction = "Right"
+            elif x < -5:
+                gaze_direction = "Down"
+            elif x > 5:
+                gaze_direction = "Up"
+
+            self.last_face_bbox = self._face_bbox(landmarks, img_w, img_h)
 
         return frame, gaze_direction, head_pose
 
+    def aligned_face_crop(self, frame, face_landmarks=None, margin=CROP_MARGIN):
+        """
+        Square BGR crop of the face with the eyes rotated to horizontal,
+        built from the face mesh landmarks of the last processed frame by
+        default. Returns None when no face is available.
+        """
+        if face_landmarks is None:
+            face_landmarks = self.last_face_landmarks
+        if face_landmarks is None:
+            return None
+        img_h, img_w = frame.shape[:2]
+        landmarks = face_landmarks.landmark
+        ids = EYE_CORNER_LANDMARKS + FACE_EXTENT_LANDMARKS
+        pts = np.array([[landmarks[i].x, landmarks[i].y] for i in ids]) * (img_w, img_h)
+
+        (lx, ly), (rex, rey) = pts[0], pts[1]
+        angle = np.degrees(np.arctan2(rey - ly, rex - lx))
+        extent = pts[2:]
+        center = extent.mean(axis=0)
+        size = int(max(np.ptp(extent[:, 0]), np.ptp(extent[:, 1])) * (1 + 2 * margin))
+        if size < MIN_FACE_SIZE:
+            return None
+
+        rotation = cv2.getRotationMatrix2D((float(center[0]), float(center[1])), float(angle), 1.0)
+        # Dời tâm khuôn mặt về giữa ảnh cắt
+        rotation[:, 2] += (size / 2 - center[0], size / 2 - center[1])
+        return cv2.warpAffine(frame, rotation, (size, size), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_REPLICATE)
+
     def __del__(self):
-        self.face_mesh.close()
+        if getattr(self, "face_mesh", None) is not None:
+            self.face_mesh.close()
@@ -1,15 +1,135 @@
-import firebase_admin
-from firebase_admin import credentials, firestore
+import os
+import threading
+from datetime import datetime, timezone
 
-cred = credentials.Certificate("config/key.json")
-firebase_admin.initialize_app(cred)
-db = firestore.client()
+from core.event_journal import EventJournal, JOURNAL_PATH
+from core.firestore_writer import FirestoreWriter, FLUSH_INTERVAL
+from core.metrics import histogram
+from core.telemetry import TelemetrySink, InMemorySink, FileSink
+
+FIREBASE_KEY_PATH = "config/key.json"
+# Chu kỳ (giây) gửi các cập nhật đã gộp lên Firestore
+WRITE_FLUSH_INTERVAL = float(os.environ.get("ALT_FIRESTORE_FLUSH_INTERVAL", FLUSH_INTERVAL))
+# Ghi mọi sự kiện vào journal cục bộ trước rồi mới gửi lên Firestore (không mất sự kiện khi mất mạng/crash)
+JOURNAL_ENABLED = os.environ.get("ALT_JOURNAL", "1") == "1"
+# Nơi nhận dữ liệu giám sát: "firestore", "memory" hoặc "file:<đường dẫn>" (chạy thử không cần Firebase)
+TELEMETRY_SINK = os.environ.get("ALT_TELEMETRY_SINK", "firestore")
+
+# Firebase được khởi tạo khi cần lần đầu, không phải lúc import module
+_db = None
+_db_lock = threading.Lock()
+
+def get_db():
+    global _db
+    with _db_lock:
+        if _db is None:
+            import firebase_admin
+            from firebase_admin import credentials, firestore
+            if not firebase_admin._apps:
+                cred = credentials.Certificate(FIREBASE_KEY_PATH)
+                firebase_admin.initialize_app(cred)
+            _db = firestore.client()
+        return _db
+
+class FirestoreSink(TelemetrySink):
+    """TelemetrySink backed by exams/{examId}/users/{studentId} documents in Firestore."""
+
+    name = "firestore"
+
+    def server_timestamp(self):
+        from firebase_admin import firestore
+        return firestore.SERVER_TIMESTAMP
+
+    def timestamp(self, epoch):
+        return datetime.fromtimestamp(epoch, timezone.utc)
+
+    def _doc(self, key):
+        examId, studentId = key
+        return get_db().collection("exams").document(examId).collection("users").document(studentId)
+
+    def commit(self, updates):
+        batch = get_db().batch()
+        for key, fields in updates.items():
+            batch.update(self._doc(key), fields)
+        with histogram("firestore_call_seconds", op="batch_commit").time():
+            batch.commit()
+
+    def read(self, key):
+        with histogram("firestore_call_seconds", op="get").time():
+            doc = self._doc(key).get()
+        return doc.to_dict() if doc.exists else None
+
+    def watch(self, key, callback):
+        return self._doc(key).on_snapshot(callback)
+
+def create_sink(spec):
+    """"firestore", "memory" or "file:<path>"."""
+    if spec == "firestore":
+        return FirestoreSink()
+    if spec == "memory":
+        return InMemorySink()
+    if spec.startswith("file:"):
+        return FileSink(spec[len("file:"):])
+    raise ValueError(f"Unknown telemetry sink: {spec}")
+
+_sink = None
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_sink():
+    global _sink
+    with _writer_lock:
+        if _sink is None:
+            _sink = create_sink(TELEMETRY_SINK)
+        return _sink
+
+def set_sink(sink):
+    """Replaces the sink (e.g. InMemorySink for benchmarks). Must be called before the first write."""
+    global _sink
+    with _writer_lock:
+        if _writer is not None:
+            raise RuntimeError("Không thể đổi sink khi writer đang chạy")
+        _sink = sink
+
+def server_timestamp():
+    return get_sink().server_timestamp()
+
+def create_writer(sink, journal=JOURNAL_ENABLED, journal_path=JOURNAL_PATH, flush_interval=WRITE_FLUSH_INTERVAL):
+    """Background writer for `sink`: an EventJournal, or an in-memory FirestoreWriter with journal=False."""
+    if journal:
+        return EventJournal(sink.commit, sink.read, journal_path, is_transform=sink.is_transform,
+                            make_timestamp=sink.timestamp, ship_interval=flush_interval)
+    return FirestoreWriter(sink.commit, flush_interval, is_transform=sink.is_transform)
+
+def get_writer():
+    """Shared background writer for the configured sink, started on first use."""
+    global _writer
+    sink = get_sink()
+    with _writer_lock:
+        if _writer is None:
+            _writer = create_writer(sink)
+            _writer.start()
+        return _writer
 
 def update_user_field(examId, studentId, fields: dict):
-    try:
-        db.collection("exams").document(examId).collection("users").document(studentId).update(fields)
-    except Exception as e:
-        print(f"[Firebase Error] {e}")
+    """Queues a field update; it is recorded and sent to the sink in the background."""
+    get_writer().submit((examId, studentId), fields)
+
+def flush_writes(timeout=5):
+    """Sends everything still pending and stops the background writer."""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop(timeout)
+        print(f"✓ Firestore writer: {writer.stats()}")
+        if isinstance(writer, EventJournal) and writer.pending_count():
+            print(f"⚠ {writer.pending_count()} sự kiện chưa gửi được, sẽ gửi lại ở lần chạy sau.")
+
+def watch_user_doc(examId, studentId, callback):
+    """Registers a snapshot listener on the student's document; returns the Watch (call unsubscribe())."""
+    return get_sink().watch((examId, studentId), callback)
 
-def get_user_doc(examId, studentId):
-    return db.collection("exams").document(examId).collection("users").document(studentId).get()
+def get_user_fields(examId, studentId):
+    """Current fields of the student's document, or None if it does not exist."""
+    return get_sink().read((examId, studentId))
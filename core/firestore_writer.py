@@ -0,0 +1,141 @@
+import threading
+
+from core.metrics import counter
+
+FLUSH_INTERVAL = 2.0  # Giây giữa hai lần gửi batch lên Firestore
+MAX_BATCH_WRITES = 500  # Giới hạn số thao tác trong một batch của Firestore
+RETRY_BACKOFF = 1.0
+MAX_RETRY_BACKOFF = 60.0
+
+_MISSING = object()
+
+def is_redundant(fields, known, is_transform):
+    """True if every non-transform field in `fields` already has that value in `known`."""
+    return not any(not is_transform(value) and known.get(name, _MISSING) != value
+                   for name, value in fields.items())
+
+class FirestoreWriter:
+    """
+    Asynchronous, coalescing writer for per-student document updates.
+
+    update() only merges the fields into a pending dict for the document and
+    returns immediately, so callers on the camera or audio thread never wait
+    for the network. Every flush_interval seconds a background thread sends
+    all pending documents with commit_fn(updates), where updates maps a
+    document key to its merged fields (batched, at most max_batch per call).
+
+    An update whose fields all equal what was last sent for that document is
+    dropped; fields for which is_transform(value) is true (server timestamps)
+    do not count as a change on their own. A failed commit puts its fields
+    back underneath newer pending values and is retried with exponential
+    backoff, so nothing is lost while the network is down.
+    """
+
+    def __init__(self, commit_fn, flush_interval=FLUSH_INTERVAL, max_batch=MAX_BATCH_WRITES, is_transform=None):
+        self.commit_fn = commit_fn
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.is_transform = is_transform or (lambda value: False)
+        self._pending = {}
+        self._sent = {}
+        self._cond = threading.Condition()
+        self._flush_requested = False
+        self.running = False
+        self.thread = None
+        self.backoff = 0.0
+        self.update_count = 0
+        self.dropped_count = 0
+        self.write_count = 0
+        self.batch_count = 0
+        self.failure_count = 0
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="firestore-writer", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=5):
+        """Stops the thread after a final flush of everything still pending."""
+        with self._cond:
+            if not self.running:
+                return
+            self.running = False
+            self._cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def update(self, key, fields):
+        with self._cond:
+            self.update_count += 1
+            pending = self._pending.get(key, {})
+            if is_redundant(fields, {**self._sent.get(key, {}), **pending}, self.is_transform):
+                self.dropped_count += 1
+                counter("firestore_updates_dropped_total").inc()
+                return
+            self._pending[key] = {**pending, **fields}
+
+    # Giao diện chung với EventJournal.append
+    submit = update
+
+    def flush(self):
+        """Asks the background thread to send pending updates now."""
+        with self._cond:
+            self._flush_requested = True
+            self._cond.notify()
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: not self.running or self._flush_requested,
+                                    timeout=max(self.flush_interval, self.backoff))
+                self._flush_requested = False
+                running = self.running
+                pending, self._pending = self._pending, {}
+            if pending:
+                self._send(pending)
+            if not running:
+                return
+
+    def _send(self, pending):
+        items = list(pending.items())
+        for i in range(0, len(items), self.max_batch):
+            chunk = dict(items[i:i + self.max_batch])
+            try:
+                self.commit_fn(chunk)
+            except Exception as e:
+                self.failure_count += 1
+                counter("firestore_batch_failures_total").inc()
+                self.backoff = min(max(self.backoff * 2, RETRY_BACKOFF), MAX_RETRY_BACKOFF)
+                print(f"[Firebase Error] {e} (thử lại sau {self.backoff:.0f}s)")
+                self._requeue(dict(items[i:]))
+                return
+            self.backoff = 0.0
+            self.batch_count += 1
+            self.write_count += len(chunk)
+            counter("firestore_writes_total").inc(len(chunk))
+            with self._cond:
+                for key, fields in chunk.items():
+                    self._sent.setdefault(key, {}).update(
+                        {name: value for name, value in fields.items() if not self.is_transform(value)})
+
+    def _requeue(self, failed):
+        with self._cond:
+            for key, fields in failed.items():
+                self._pending[key] = {**fields, **self._pending.get(key, {})}
+
+    def stats(self):
+        with self._cond:
+            return {
+                "updates": self.update_count,
+                "dropped_identical": self.dropped_count,
+                "writes": self.write_count,
+                "batches": self.batch_count,
+                "failures": self.failure_count,
+                "pending_docs": len(self._pending),
+            }
@@ -0,0 +1,141 @@
+import threading
+
+import cv2
+import numpy as np
+
+class BufferPool:
+    """
+    Recycles image buffers between frames.
+
+    Buffers are keyed by (shape, dtype). A FrameContext borrows buffers while
+    it is alive and gives them back in release(), so steady-state capture
+    stops allocating a fresh RGB/gray/resized array for every frame.
+    """
+
+    def __init__(self, max_per_key=4):
+        self.max_per_key = max_per_key
+        self._free = {}
+        self._lock = threading.Lock()
+        self.allocated_count = 0
+        self.reused_count = 0
+
+    def acquire(self, shape, dtype=np.uint8):
+        key = (tuple(shape), np.dtype(dtype).str)
+        with self._lock:
+            free = self._free.get(key)
+            if free:
+                self.reused_count += 1
+                return free.pop()
+            self.allocated_count += 1
+        return np.empty(shape, dtype=dtype)
+
+    def give_back(self, buffer):
+        key = (buffer.shape, buffer.dtype.str)
+        with self._lock:
+            free = self._free.setdefault(key, [])
+            if len(free) < self.max_per_key:
+                free.append(buffer)
+
+class FrameContext:
+    """
+    One captured frame plus lazily computed, memoized derived views.
+
+    Every consumer (face mesh, object detector, YOLO, verification) asks the
+    context for the view it needs, so each conversion runs at most once per
+    frame no matter how many stages use it. Views are read-only by
+    convention; use canvas() for a copy that can be drawn on.
+    """
+
+    def __init__(self, frame, frame_id=0, timestamp=None, pool=None, consumers=1):
+        self.bgr = frame
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.pool = pool
+        self._views = {}
+        self._borrowed = []
+        self._lock = threading.RLock()
+        self._refcount = consumers
+
+    @property
+    def shape(self):
+        return self.bgr.shape
+
+    def _buffer(self, shape, dtype=np.uint8):
+        if self.pool is None:
+            return np.empty(shape, dtype=dtype)
+        buffer = self.pool.acquire(shape, dtype)
+        self._borrowed.append(buffer)
+        return buffer
+
+    def _memo(self, key, compute):
+        with self._lock:
+            view = self._views.get(key)
+            if view is None:
+                view = compute()
+                self._views[key] = view
+            return view
+
+    @property
+    def rgb(self):
+        def compute():
+            return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB, dst=self._buffer(self.bgr.shape))
+        return self._memo("rgb", compute)
+
+    @property
+    def gray(self):
+        def compute():
+            return cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY, dst=self._buffer(self.bgr.shape[:2]))
+        return self._memo("gray", compute)
+
+    def resized(self, width, height, rgb=False, interpolation=cv2.INTER_AREA):
+        """Returns the frame resized to (width, height), optionally from the RGB view."""
+        def compute():
+            source = self.rgb if rgb else self.bgr
+            dst = self._buffer((height, width, source.shape[2]))
+            return cv2.resize(source, (width, height), dst=dst, interpolation=interpolation)
+        return self._memo(("resized", width, height, rgb, interpolation), compute)
+
+    def downscaled(self, max_width, rgb=False):
+        """Returns a copy no wider than max_width with the aspect ratio preserved."""
+        h, w = self.bgr.shape[:2]
+        if w <= max_width:
+            return self.rgb if rgb else self.bgr
+        return self.resized(max_width, int(round(h * max_width / w)), rgb=rgb)
+
+    @property
+    def mp_image(self):
+        def compute():
+            import mediapipe as mp
+            return mp.Image(image_format=mp.ImageFormat.SRGB, data=self.rgb)
+        return self._memo("mp_image", compute)
+
+    def blob(self, width, height, scale=1 / 255, swap_rb=True):
+        """
+        Same layout and scaling as cv2.dnn.blobFromImage(frame, scale, (width, height),
+        0, swap_rb, crop=False), written into a pooled NCHW float32 buffer.
+        """
+        def compute():
+            # blobFromImage dùng nội suy tuyến tính
+            resized = self.resized(width, height, rgb=swap_rb, interpolation=cv2.INTER_LINEAR)
+            blob = self._buffer((1, 3, height, width), np.float32)
+            np.multiply(resized.transpose(2, 0, 1), scale, out=blob[0], casting="unsafe")
+            return blob
+        return self._memo(("blob", width, height, scale, swap_rb), compute)
+
+    def canvas(self):
+        """
+        A private copy of the BGR frame for drawing overlays. It is not pooled
+        because it usually outlives the context (e.g. while being displayed).
+        """
+        return self.bgr.copy()
+
+    def release(self):
+        """Called once by each consumer; buffers return to the pool after the last one."""
+        with self._lock:
+            self._refcount -= 1
+            if self._refcount > 0 or self.pool is None:
+                return
+            borrowed, self._borrowed = self._borrowed, []
+            self._views.clear()
+        for buffer in borrowed:
+            self.pool.give_back(buffer)
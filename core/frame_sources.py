@@ -0,0 +1,127 @@
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+class FrameSource:
+    """
+    cv2.VideoCapture-compatible frame source: isOpened(), read() -> (ret, frame)
+    and release(), so it can replace the camera in monitoring_loop.
+
+    With realtime=True frames are paced at `fps` like a live camera;
+    otherwise they are returned as fast as they are read (benchmarks).
+    """
+
+    def __init__(self, fps=30.0, realtime=False):
+        self.fps = fps
+        self.realtime = realtime
+        self._next_time = None
+
+    def isOpened(self):
+        raise NotImplementedError
+
+    def _read(self):
+        raise NotImplementedError
+
+    def read(self):
+        if self.realtime and self.fps:
+            now = time.perf_counter()
+            if self._next_time is not None and now < self._next_time:
+                time.sleep(self._next_time - now)
+            self._next_time = max(now, self._next_time or now) + 1.0 / self.fps
+        return self._read()
+
+    def release(self):
+        pass
+
+class WebcamSource(FrameSource):
+    def __init__(self, index=0):
+        super().__init__(realtime=False)
+        self.cap = cv2.VideoCapture(index)
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _read(self):
+        return self.cap.read()
+
+    def release(self):
+        self.cap.release()
+
+class VideoFileSource(FrameSource):
+    """Recorded session from a video file; loop=True restarts at the end."""
+
+    def __init__(self, path, loop=False, realtime=False):
+        self.path = path
+        self.loop = loop
+        self.cap = cv2.VideoCapture(path)
+        super().__init__(fps=self.cap.get(cv2.CAP_PROP_FPS) or 30.0, realtime=realtime)
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def _read(self):
+        ret, frame = self.cap.read()
+        if not ret and self.loop:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.cap.read()
+        return ret, frame
+
+    def release(self):
+        self.cap.release()
+
+class ImageDirSource(FrameSource):
+    """
+    Images of a directory (e.g. test/images/) in name order, each returned
+    `repeat` times so a handful of stills can stand in for a longer session.
+    """
+
+    def __init__(self, path, repeat=1, loop=False, fps=30.0, realtime=False):
+        super().__init__(fps=fps, realtime=realtime)
+        self.paths = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self.repeat = max(1, repeat)
+        self.loop = loop
+        self._index = 0
+        self._cached = (None, None)
+
+    def isOpened(self):
+        return bool(self.paths)
+
+    def _read(self):
+        while self.paths:
+            total = len(self.paths) * self.repeat
+            if self._index >= total:
+                if not self.loop:
+                    return False, None
+                self._index = 0
+            slot = self._index // self.repeat
+            path = self.paths[slot]
+            if self._cached[0] != path:
+                self._cached = (path, cv2.imread(path))
+            frame = self._cached[1]
+            if frame is None:
+                # Bỏ ảnh hỏng; ảnh kế tiếp dời vào đúng vị trí này nên giữ nguyên _index
+                print(f"✗ Không đọc được ảnh: {path}")
+                del self.paths[slot]
+                continue
+            self._index += 1
+            return True, frame.copy()
+        return False, None
+
+def open_source(spec, loop=False, realtime=False, repeat=1):
+    """
+    Opens a frame source from a string: a camera index ("0"), a directory of
+    images or a video file.
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return WebcamSource(int(spec))
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, repeat=repeat, loop=loop, realtime=realtime)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, loop=loop, realtime=realtime)
+    raise ValueError(f"Nguồn frame không hợp lệ: {spec}")
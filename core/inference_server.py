@@ -0,0 +1,397 @@
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MAX_BATCH_SIZE = 8
+MAX_WAIT = 0.02  # Thời gian tối đa (giây) chờ gom thêm yêu cầu vào một batch
+REQUEST_TIMEOUT = 10
+REGISTERED_FACES_DIR = "data/registered_faces"
+JPEG_QUALITY = 90
+# Giới hạn kích thước một tin nhắn: vượt quá thì đóng kết nối thay vì cấp phát theo độ dài client gửi
+MAX_HEADER_BYTES = 64 * 1024
+MAX_IMAGE_BYTES = 8 * 1024 * 1024
+# Yêu cầu đặc biệt: hỏi server đang phục vụ những task nào
+TASKS_REQUEST = "tasks"
+
+class DynamicBatcher:
+    """
+    Collects requests from many sessions and runs them through `batch_fn`
+    together.
+
+    A batch is dispatched as soon as it holds max_batch_size requests or the
+    oldest request has waited max_wait seconds, whichever comes first.
+    batch_fn receives a list of payloads and must return a list of results
+    in the same order.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.batch_count = 0
+        self.item_count = 0
+        self.session_counts = {}
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name=f"batcher-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        with self._cond:
+            self.running = False
+            pending = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        for _, _, future, _ in pending:
+            future.set_exception(RuntimeError("Inference server stopped"))
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def submit(self, session_id, payload):
+        future = Future()
+        with self._cond:
+            if not self.running:
+                future.set_exception(RuntimeError("Inference server is not running"))
+                return future
+            self._items.append((session_id, payload, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def _next_batch(self):
+        with self._cond:
+            while self.running and not self._items:
+                self._cond.wait()
+            if not self.running:
+                return None
+            deadline = self._items[0][3] + self.max_wait
+            while self.running and len(self._items) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            count = min(self.max_batch_size, len(self._items))
+            return [self._items.popleft() for _ in range(count)]
+
+    def _loop(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                results = list(self.batch_fn([payload for _, payload, _, _ in batch]))
+                if len(results) != len(batch):
+                    # Không biết kết quả nào ứng với yêu cầu nào: báo lỗi cho cả batch thay vì bỏ sót future
+                    raise ValueError(f"batch_fn trả về {len(results)} kết quả cho {len(batch)} yêu cầu")
+                for (_, _, future, _), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                print(f"✗ Lỗi khi xử lý batch '{self.name}': {e}")
+                for _, _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.batch_count += 1
+            self.item_count += len(batch)
+            for session_id, _, _, _ in batch:
+                self.session_counts[session_id] = self.session_counts.get(session_id, 0) + 1
+
+    def stats(self):
+        return {
+            "batches": self.batch_count,
+            "items": self.item_count,
+            "avg_batch_size": self.item_count / self.batch_count if self.batch_count else 0.0,
+            "queued": len(self._items),
+            "sessions": len(self.session_counts),
+        }
+
+def make_verify_batch_fn(registered_faces_dir=REGISTERED_FACES_DIR):
+    """Batch function for {"crop": aligned BGR face, "reference": "<studentId>.jpg"} payloads."""
+    def verify_batch(payloads):
+        from core.face_auth import embed_faces, get_reference_embedding, cosine_distance, COSINE_THRESHOLD
+        embeddings = embed_faces([p["crop"] for p in payloads])
+        results = []
+        for payload, embedding in zip(payloads, embeddings):
+            # Chỉ dùng tên tệp, không cho client trỏ ra ngoài thư mục ảnh đã đăng ký
+            reference_path = os.path.join(registered_faces_dir, os.path.basename(payload["reference"]))
+            if embedding is None or not os.path.exists(reference_path):
+                results.append(None)
+                continue
+            reference = get_reference_embedding(reference_path)
+            results.append(None if reference is None else cosine_distance(embedding, reference) <= COSINE_THRESHOLD)
+        return results
+    return verify_batch
+
+def make_detect_batch_fn(detector):
+    """
+    Batch function for {"frame": BGR image} payloads. MediaPipe/OpenCV
+    detectors take one image per call, so frames are run back to back on the
+    shared detector; clients still save the model load and CPU.
+    """
+    def detect_batch(payloads):
+        return [detector.detect(p["frame"]) for p in payloads]
+    return detect_batch
+
+class InferenceServer:
+    """Routes requests from many sessions to one DynamicBatcher per task."""
+
+    def __init__(self, tasks, max_batch_size=MAX_BATCH_SIZE, max_wait=MAX_WAIT):
+        self.batchers = {name: DynamicBatcher(name, fn, max_batch_size, max_wait) for name, fn in tasks.items()}
+        self._tcp_server = None
+
+    def start(self):
+        for batcher in self.batchers.values():
+            batcher.start()
+
+    def stop(self):
+        if self._tcp_server:
+            self._tcp_server.shutdown()
+            self._tcp_server.server_close()
+            self._tcp_server = None
+        for batcher in self.batchers.values():
+            batcher.stop()
+
+    def submit(self, task, session_id, payload):
+        if task not in self.batchers:
+            raise ValueError(f"Unknown inference task: {task}")
+        return self.batchers[task].submit(session_id, payload)
+
+    def tasks(self):
+        return sorted(self.batchers)
+
+    def stats(self):
+        return {name: batcher.stats() for name, batcher in self.batchers.items()}
+
+    def serve_tcp(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        """Serves clients over TCP in a background thread. Returns the bound (host, port)."""
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        header, image = recv_message(self.request)
+                    except (ConnectionError, OSError, ValueError):
+                        # Tin nhắn quá lớn hoặc hỏng: không đọc tiếp được luồng byte, đóng kết nối
+                        return
+                    try:
+                        if header["task"] == TASKS_REQUEST:
+                            reply = {"ok": True, "result": server.tasks()}
+                        else:
+                            payload = dict(header.get("payload", {}))
+                            if image is not None:
+                                payload[header["image_field"]] = image
+                            future = server.submit(header["task"], header.get("session", ""), payload)
+                            reply = {"ok": True, "result": future.result(timeout=REQUEST_TIMEOUT)}
+                    except KeyError as e:
+                        reply = {"ok": False, "error": f"Thiếu trường {e} trong yêu cầu"}
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                    send_message(self.request, reply)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._tcp_server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._tcp_server.daemon_threads = True
+        threading.Thread(target=self._tcp_server.serve_forever, daemon=True).start()
+        return self._tcp_server.server_address
+
+# --- Giao thức: [độ dài header][độ dài ảnh] + header JSON + ảnh JPEG (nếu có) ---
+
+def send_message(sock, header, image=None):
+    data = b""
+    if image is not None:
+        ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])
+        if not ok:
+            raise ValueError("Không thể mã hóa ảnh JPEG")
+        data = encoded.tobytes()
+    header_bytes = json.dumps(header, default=_json_default).encode("utf-8")
+    sock.sendall(struct.pack("!II", len(header_bytes), len(data)) + header_bytes + data)
+
+def recv_message(sock):
+    """Reads one message. Raises ValueError if it exceeds MAX_HEADER_BYTES / MAX_IMAGE_BYTES."""
+    header_len, data_len = struct.unpack("!II", _recv_exact(sock, 8))
+    if header_len > MAX_HEADER_BYTES or data_len > MAX_IMAGE_BYTES:
+        raise ValueError(f"Tin nhắn quá lớn (header {header_len} B, ảnh {data_len} B)")
+    header = json.loads(_recv_exact(sock, header_len).decode("utf-8"))
+    if not isinstance(header, dict):
+        raise ValueError("Header phải là một object JSON")
+    image = None
+    if data_len:
+        image = cv2.imdecode(np.frombuffer(_recv_exact(sock, data_len), np.uint8), cv2.IMREAD_COLOR)
+    return header, image
+
+def _recv_exact(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("Kết nối bị đóng")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"Không thể chuyển {type(value)} sang JSON")
+
+class LocalInferenceClient:
+    """
+    In-process client. Same interface as RemoteInferenceClient: verify()
+    matches verify_face's signature and detect() matches a DetectorBackend,
+    so either can be plugged into FaceVerificationWorker / DetectionScheduler.
+    """
+
+    name = "inference_server"
+
+    def __init__(self, server, session_id):
+        self.server = server
+        self.session_id = session_id
+
+    def tasks(self):
+        return self.server.tasks()
+
+    def supports(self, task):
+        return task in self.server.batchers
+
+    @property
+    def available(self):
+        # Theo giao diện DetectorBackend: chỉ khả dụng như detector khi server có task "detect"
+        return self.supports("detect")
+
+    def verify(self, frame, reference_path, aligned=True, **kwargs):
+        future = self.server.submit("verify", self.session_id, {"crop": frame, "reference": os.path.basename(reference_path)})
+        return future.result(timeout=REQUEST_TIMEOUT)
+
+    def detect(self, frame, context=None):
+        return self.server.submit("detect", self.session_id, {"frame": frame}).result(timeout=REQUEST_TIMEOUT)
+
+    def close(self):
+        pass
+
+class RemoteInferenceClient:
+    """
+    Client for a server started with InferenceServer.serve_tcp (one
+    persistent connection).
+
+    The server only serves the tasks whose models it could load, so callers
+    should check supports() (or `available`, for detection) and fall back to
+    a local model for anything missing.
+    """
+
+    name = "inference_server"
+
+    def __init__(self, session_id, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=REQUEST_TIMEOUT):
+        self.session_id = session_id
+        self.address = (host, port)
+        self.timeout = timeout
+        self.sock = None
+        self._lock = threading.Lock()
+        self._tasks = None
+
+    def tasks(self):
+        """Tasks the server serves; empty if it cannot be reached (asked again next time)."""
+        if self._tasks is None:
+            try:
+                self._tasks = list(self._request(TASKS_REQUEST, {}))
+            except Exception as e:
+                print(f"✗ Không lấy được danh sách task của inference server: {e}")
+                return []
+        return self._tasks
+
+    def supports(self, task):
+        return task in self.tasks()
+
+    @property
+    def available(self):
+        # Theo giao diện DetectorBackend: chỉ khả dụng như detector khi server có task "detect"
+        return self.supports("detect")
+
+    def _request(self, task, payload, image=None, image_field=None):
+        header = {"task": task, "session": self.session_id, "payload": payload}
+        if image_field is not None:
+            header["image_field"] = image_field
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self.sock is None:
+                        self.sock = socket.create_connection(self.address, timeout=self.timeout)
+                    send_message(self.sock, header, image)
+                    reply, _ = recv_message(self.sock)
+                    break
+                except (ConnectionError, OSError, ValueError):
+                    self.close()
+                    if attempt:
+                        raise
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "inference error"))
+        return reply["result"]
+
+    def verify(self, frame, reference_path, aligned=True, **kwargs):
+        try:
+            return self._request("verify", {"reference": os.path.basename(reference_path)}, frame, "crop")
+        except Exception as e:
+            print(f"✗ Lỗi inference server (verify): {e}")
+            return None
+
+    def detect(self, frame, context=None):
+        try:
+            detections = self._request("detect", {}, frame, "frame")
+        except Exception as e:
+            print(f"✗ Lỗi inference server (detect): {e}")
+            return []
+        for detection in detections:
+            detection['bbox'] = tuple(detection['bbox'])
+        return detections
+
+    def close(self):
+        if self.sock:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+def run_server(host=DEFAULT_HOST, port=DEFAULT_PORT, detector_name="mediapipe"):
+    from core.detector_backends import create_detector
+    detector = create_detector(detector_name)
+    tasks = {"verify": make_verify_batch_fn()}
+    if detector is not None and detector.available:
+        tasks["detect"] = make_detect_batch_fn(detector)
+    server = InferenceServer(tasks)
+    server.start()
+    address = server.serve_tcp(host, port)
+    print(f"✓ Inference server đang chạy trên {address[0]}:{address[1]} (tasks: {', '.join(tasks)})")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"📊 {server.stats()}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    # python -m core.inference_server [host] [port]
+    run_server(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_HOST,
+               int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_PORT)
@@ -0,0 +1,213 @@
+import os
+import time
+import unicodedata
+from collections import deque
+
+from core.metrics import histogram
+
+KEYWORDS_DIR = "config/keywords"
+DEFAULT_KEYWORDS_FILE = "default.txt"  # Luôn được nạp; config/keywords/<examId>.txt bổ sung cho từng kỳ thi
+# Bỏ dấu tiếng Việt khi so khớp ("dap an" khớp "đáp án"); tắt mặc định vì dễ khớp nhầm ("bài làm" / "bãi lầm")
+FOLD_DIACRITICS = os.environ.get("ALT_KEYWORD_FOLD_DIACRITICS") == "1"
+
+# Dùng khi không có tệp cấu hình nào
+DEFAULT_KEYWORDS = [
+    "đáp án", "quay cóp", "gian lận", "tài liệu", "trợ giúp",
+    "câu hỏi", "bài làm", "kết quả"
+]
+
+def _normalize_cluster(cluster, fold_diacritics):
+    """Normalized characters for one base character plus its combining marks."""
+    text = unicodedata.normalize("NFC", cluster).lower()
+    if fold_diacritics:
+        text = "".join(c for c in unicodedata.normalize("NFD", text) if not unicodedata.combining(c))
+        text = text.replace("đ", "d")
+    return text
+
+def normalize(text, fold_diacritics=False):
+    """
+    Returns (normalized, spans): NFC, lower case, optional diacritic
+    folding, and every run of whitespace/punctuation collapsed to one space,
+    with a single leading space so phrases only match on word boundaries.
+    spans[i] is the (start, end) range in `text` that produced normalized[i].
+    """
+    chars = [" "]
+    spans = [(0, 0)]
+    i = 0
+    while i < len(text):
+        # Gom ký tự gốc với các dấu kết hợp đi sau (văn bản NFD hoặc gõ dấu rời)
+        end = i + 1
+        while end < len(text) and unicodedata.combining(text[end]):
+            end += 1
+        for c in _normalize_cluster(text[i:end], fold_diacritics):
+            if c.isalnum():
+                chars.append(c)
+                spans.append((i, end))
+            elif chars[-1] != " ":
+                chars.append(" ")
+                spans.append((i, end))
+        i = end
+    return "".join(chars), spans
+
+class KeywordMatch:
+    def __init__(self, keyword, start, end):
+        self.keyword = keyword
+        self.start = start
+        self.end = end
+
+    def __repr__(self):
+        return f"KeywordMatch({self.keyword!r}, {self.start}, {self.end})"
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over normalized phrases.
+
+    find_all(text) reports every occurrence of every phrase in one pass over
+    the text, with offsets into the original string; the cost does not grow
+    with the number of phrases. Phrases are padded with spaces so they only
+    match whole words. stream() returns an incremental matcher for
+    streaming partial transcripts.
+    """
+
+    def __init__(self, phrases, fold_diacritics=FOLD_DIACRITICS):
+        self.fold_diacritics = fold_diacritics
+        self.phrases = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        seen = set()
+        for phrase in phrases:
+            normalized = normalize(phrase, fold_diacritics)[0].strip()
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                self._add(f" {normalized} ", len(self.phrases))
+                self.phrases.append(phrase.strip())
+        self._build()
+
+    def _add(self, pattern, index):
+        state = 0
+        for c in pattern:
+            if c not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][c] = len(self._goto) - 1
+            state = self._goto[state][c]
+        self._output[state].append((index, len(pattern)))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for c, child in self._goto[state].items():
+                queue.append(child)
+                if state:
+                    self._fail[child] = self.step(self._fail[state], c)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def step(self, state, c):
+        while state and c not in self._goto[state]:
+            state = self._fail[state]
+        return self._goto[state].get(c, 0)
+
+    def _match(self, index, length, end, spans):
+        # Bỏ khoảng trắng đệm ở hai đầu khi đổi về vị trí trong văn bản gốc
+        return KeywordMatch(self.phrases[index], spans[end - length + 1][0], spans[end - 2][1])
+
+    def find_all(self, text):
+        started = time.perf_counter()
+        normalized, spans = normalize(text, self.fold_diacritics)
+        normalized += " "
+        spans.append((len(text), len(text)))
+        matches = []
+        state = 0
+        for position, c in enumerate(normalized):
+            state = self.step(state, c)
+            for index, length in self._output[state]:
+                matches.append(self._match(index, length, position + 1, spans))
+        histogram("keyword_match_seconds").observe(time.perf_counter() - started)
+        return matches
+
+    def stream(self):
+        return KeywordStream(self)
+
+class KeywordStream:
+    """
+    Incremental matching over successive partial transcripts of one utterance.
+
+    Partial hypotheses usually extend the previous one but may revise its
+    tail, so the automaton state after every normalized character is kept
+    and update(text) only steps the automaton over what changed after the
+    longest common prefix. A phrase at the very end of a partial is
+    reported as soon as it is complete. Each occurrence of a phrase is
+    reported once, even when a revision shifts its offset; update() returns
+    only new matches.
+    """
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        # _states[k] là trạng thái automaton sau k ký tự đầu của _normalized
+        self._normalized = ""
+        self._states = [0]
+        self._hits = []  # (vị trí kết thúc, phrase index, độ dài) theo thứ tự vị trí
+        self._reported = {}
+
+    def update(self, text):
+        started = time.perf_counter()
+        matcher = self.matcher
+        normalized, spans = normalize(text, matcher.fold_diacritics)
+        common = 0
+        limit = min(len(normalized), len(self._normalized))
+        while common < limit and normalized[common] == self._normalized[common]:
+            common += 1
+        del self._states[common + 1:]
+        while self._hits and self._hits[-1][0] > common:
+            self._hits.pop()
+        for position in range(common, len(normalized)):
+            state = matcher.step(self._states[-1], normalized[position])
+            self._states.append(state)
+            for index, length in matcher._output[state]:
+                self._hits.append((position + 1, index, length))
+        self._normalized = normalized
+
+        # Coi cuối văn bản là ranh giới từ để không phải chờ từ tiếp theo
+        end = len(normalized) + 1
+        hits = self._hits + [(end, index, length)
+                             for index, length in matcher._output[matcher.step(self._states[-1], " ")]]
+        spans = spans + [(len(text), len(text))]
+        counts = {}
+        new = []
+        for position, index, length in hits:
+            counts[index] = counts.get(index, 0) + 1
+            if counts[index] > self._reported.get(index, 0):
+                self._reported[index] = counts[index]
+                new.append(matcher._match(index, length, position, spans))
+        histogram("keyword_match_seconds", mode="stream").observe(time.perf_counter() - started)
+        return new
+
+def _read_phrases(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+def load_keywords(exam_id=None, directory=KEYWORDS_DIR):
+    """Phrases from config/keywords/default.txt plus config/keywords/<exam_id>.txt."""
+    phrases = []
+    loaded = False
+    for name in (DEFAULT_KEYWORDS_FILE, f"{exam_id}.txt" if exam_id else None):
+        path = os.path.join(directory, name) if name else None
+        if path and os.path.exists(path):
+            try:
+                phrases += _read_phrases(path)
+                loaded = True
+            except Exception as e:
+                print(f"✗ Lỗi khi tải danh sách từ khóa {path}: {e}")
+    if not loaded:
+        print(f"✗ Không tìm thấy danh sách từ khóa trong {directory}, dùng danh sách mặc định.")
+        return list(DEFAULT_KEYWORDS)
+    return phrases
+
+def create_keyword_matcher(exam_id=None, directory=KEYWORDS_DIR, fold_diacritics=FOLD_DIACRITICS):
+    matcher = KeywordMatcher(load_keywords(exam_id, directory), fold_diacritics)
+    print(f"✓ Đã tải {len(matcher.phrases)} từ khóa cấm"
+          f"{f' cho kỳ thi {exam_id}' if exam_id else ''}.")
+    return matcher
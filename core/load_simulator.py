@@ -0,0 +1,199 @@
+"""
+Multi-student load simulator for the telemetry write path.
+
+Drives many simulated exam sessions through SessionReporter (the same
+event-to-update code monitoring_loop uses), each with its own background
+writer like a real student machine, into a local stand-in sink, and prints
+write rates, batching efficiency and backend latency as JSON:
+
+    python -m core.load_simulator --students 1000 --duration 60 --latency-ms 80
+"""
+import argparse
+import contextlib
+import heapq
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from core.firebase_utils import create_writer, create_sink
+from core.metrics import REGISTRY
+from core.session_events import SessionReporter
+from core.telemetry import InMemorySink
+
+# Giới hạn Firestore: ghi liên tục tối đa ~1 lần/giây cho mỗi tài liệu, 10.000 lần ghi/giây cho mỗi database
+FIRESTORE_DOC_WRITES_PER_SECOND = 1.0
+FIRESTORE_DB_WRITES_PER_SECOND = 10000.0
+
+# Tần suất sự kiện (mỗi giây, mỗi thí sinh) trước khi nhân với --speed
+VERIFY_ATTEMPT_RATE = 3.0  # Mỗi 10 frame ở 30 FPS cho tới khi xác thực xong
+VERIFY_SUCCESS_PROBABILITY = 0.3
+SPEECH_RATE = 1 / 30
+KEYWORD_PROBABILITY = 0.1
+PHONE_RATE = 1 / 120
+AUDIO_EVENT_RATE = 1 / 300  # Thì thầm / giọng thứ hai từ AudioAnalytics
+
+class SimulatedSession:
+    def __init__(self, index, sink, journal, journal_dir, flush_interval, submit_latencies):
+        self.key = ("load-test", f"student-{index:05d}")
+        path = os.path.join(journal_dir, f"{index}.db") if journal else None
+        self.writer = create_writer(sink, journal=journal, journal_path=path, flush_interval=flush_interval)
+        self.submit_latencies = submit_latencies
+        self.submitted = 0
+        self.reporter = SessionReporter(*self.key, update_fn=self._submit, timestamp_fn=sink.server_timestamp)
+
+    def _submit(self, examId, studentId, fields):
+        started = time.perf_counter()
+        self.writer.submit((examId, studentId), fields)
+        self.submit_latencies.append(time.perf_counter() - started)
+        self.submitted += 1
+
+    def handle(self, kind):
+        """Applies one simulated event; returns the next event kinds to schedule."""
+        if kind == "verify":
+            verified = random.random() < VERIFY_SUCCESS_PROBABILITY
+            self.reporter.verification_result(verified)
+            if not verified:
+                return ["verify"]
+            return ["speech", "phone", "audio_event"]
+        if kind == "speech":
+            text = "xin chào"
+            self.reporter.speech_detected(text)
+            if random.random() < KEYWORD_PROBABILITY:
+                self.reporter.keyword_detected("đáp án", f"{text} đáp án")
+                self.reporter.evidence_saved("keyword", f"data/evidence/{self.key[1]}/{time.time():.0f}_keyword.avi")
+            return ["speech"]
+        if kind == "phone":
+            self.reporter.phone_detected()
+            self.reporter.evidence_saved("phone", f"data/evidence/{self.key[1]}/{time.time():.0f}_phone.avi")
+            return ["phone"]
+        if kind == "audio_event":
+            audio_kind = random.choice(["whisper", "second_voice"])
+            self.reporter.audio_event(audio_kind)
+            self.reporter.evidence_saved(audio_kind, f"data/evidence/{self.key[1]}/{time.time():.0f}_{audio_kind}.avi")
+            return ["audio_event"]
+        return []
+
+RATES = {"verify": VERIFY_ATTEMPT_RATE, "speech": SPEECH_RATE, "phone": PHONE_RATE, "audio_event": AUDIO_EVENT_RATE}
+
+def simulate(students, duration, sink, journal=False, flush_interval=2.0, speed=1.0, seed=0):
+    random.seed(seed)
+    journal_dir = tempfile.mkdtemp(prefix="alt-journal-") if journal else None
+    submit_latencies = []
+    sessions = [SimulatedSession(i, sink, journal, journal_dir, flush_interval, submit_latencies)
+                for i in range(students)]
+    for session in sessions:
+        session.writer.start()
+
+    def next_time(now, kind):
+        return now + random.expovariate(RATES[kind] * speed)
+
+    started = time.perf_counter()
+    # Các phiên bắt đầu xác thực rải rác trong giây đầu tiên
+    events = [(started + random.random(), i, "verify") for i in range(students)]
+    heapq.heapify(events)
+    event_count = 0
+    end = started + duration
+    while events:
+        at, index, kind = heapq.heappop(events)
+        if at >= end:
+            break
+        delay = at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        for follow_up in sessions[index].handle(kind):
+            heapq.heappush(events, (next_time(at, follow_up), index, follow_up))
+        event_count += 1
+    elapsed = time.perf_counter() - started
+
+    stop_started = time.perf_counter()
+    for session in sessions:
+        session.writer.stop()
+    drain_time = time.perf_counter() - stop_started
+    if journal_dir:
+        shutil.rmtree(journal_dir, ignore_errors=True)
+    return report(sessions, sink, elapsed, drain_time, event_count, submit_latencies)
+
+def report(sessions, sink, elapsed, drain_time, event_count, submit_latencies):
+    updates = sum(session.submitted for session in sessions)
+    writer_stats = [session.writer.stats() for session in sessions]
+    dropped = sum(stats["dropped_identical"] for stats in writer_stats)
+    doc_writes = dict(getattr(sink, "doc_writes", {}))
+    total_doc_writes = sum(doc_writes.values())
+    commit_count = getattr(sink, "commit_count", 0)
+    commit_histogram = REGISTRY.histogram("telemetry_commit_seconds", sink=sink.name).snapshot()
+    latencies = np.asarray(submit_latencies) if submit_latencies else np.zeros(1)
+    max_doc_rate = max(doc_writes.values(), default=0) / elapsed if elapsed else 0.0
+    db_rate = total_doc_writes / elapsed if elapsed else 0.0
+    return {
+        "students": len(sessions),
+        "elapsed_s": elapsed,
+        "drain_s": drain_time,
+        "events": event_count,
+        "updates_submitted": updates,
+        "updates_dropped_identical": dropped,
+        "backend": {
+            "sink": sink.name,
+            "commits": commit_count,
+            "doc_writes": total_doc_writes,
+            "doc_writes_per_second": db_rate,
+            "failures": getattr(sink, "failure_count", 0),
+            "commit_latency_ms": {k: (v * 1000 if isinstance(v, float) else v)
+                                  for k, v in commit_histogram.items() if k in ("mean", "p50", "p99", "max")},
+        },
+        "batching": {
+            "updates_per_doc_write": updates / total_doc_writes if total_doc_writes else None,
+            "docs_per_commit": total_doc_writes / commit_count if commit_count else None,
+        },
+        "submit_latency_us": {
+            "p50": float(np.percentile(latencies, 50) * 1e6),
+            "p99": float(np.percentile(latencies, 99) * 1e6),
+        },
+        "firestore_limits": {
+            "max_doc_writes_per_second": max_doc_rate,
+            "doc_limit_ok": max_doc_rate <= FIRESTORE_DOC_WRITES_PER_SECOND,
+            "db_limit_ok": db_rate <= FIRESTORE_DB_WRITES_PER_SECOND,
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mô phỏng tải ghi của nhiều thí sinh đồng thời")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30.0, help="Thời gian mô phỏng (giây)")
+    parser.add_argument("--sink", default="memory", help='"memory" hoặc "file:<đường dẫn>"')
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Độ trễ giả lập của backend (chỉ với memory)")
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Tỉ lệ commit thất bại giả lập")
+    parser.add_argument("--journal", action="store_true", help="Mỗi phiên dùng EventJournal (SQLite) thay vì FirestoreWriter")
+    parser.add_argument("--flush-interval", type=float, default=2.0)
+    parser.add_argument("--speed", type=float, default=1.0, help="Nhân tần suất sự kiện")
+    parser.add_argument("--output", help="Ghi kết quả JSON vào tệp thay vì stdout")
+    args = parser.parse_args(argv)
+
+    if args.sink == "memory":
+        sink = InMemorySink(args.latency_ms / 1000, args.jitter_ms / 1000, args.failure_rate)
+    elif args.sink.startswith("file:"):
+        sink = create_sink(args.sink)
+    else:
+        parser.error("Chỉ hỗ trợ sink memory hoặc file:<đường dẫn> khi mô phỏng tải")
+
+    with contextlib.redirect_stdout(sys.stderr):
+        result = simulate(args.students, args.duration, sink, args.journal, args.flush_interval, args.speed)
+    sink.close()
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+        print(f"✓ Đã ghi kết quả mô phỏng vào {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,57 @@
-import cv2
+import numpy as np
 import time
 import threading
 import os
-import firebase_admin
 import tkinter as tk
 from tkinter import messagebox
-from firebase_admin import credentials, firestore
 
-from core.face_auth import verify_face
-from core.object_detection import ObjectDetector  # UPDATED: Import ObjectDetector instead of YOLO
-from core.firebase_utils import update_user_field, get_user_doc
-from core.proxy_server import start_proxy, stop_proxy
+from core.verification_worker import FaceVerificationWorker
+from core.pipeline import Pipeline, StopPipeline
+from core.frame_context import FrameContext, BufferPool
+from core.frame_sources import open_source
+from core.detector_backends import create_detector, select_detector
+from core.inference_server import RemoteInferenceClient
+from core.process_workers import InferenceProcess, ProcessFaceTracker, ProcessVerifier, ProcessDetector
+from core.object_tracking import DetectionScheduler, is_phone
+from core.firebase_utils import flush_writes, TELEMETRY_SINK
+from core.session_events import SessionReporter
 from core.network_utils import (
     set_system_proxy, reset_system_proxy,
     get_active_network_interfaces, set_system_dns, reset_system_dns,
     start_dns_server, stop_dns_server, flush_dns_cache
 )
 from core.face_tracking import FaceTracker
-from core.audio_monitoring import AudioMonitor
+from core.overlay import OverlayRenderer
+from core.evidence import EvidenceRecorder, EVIDENCE_DIR
+from core.remote_control import RemoteControl
+from core.audio_monitoring import AudioMonitor, RECOGNIZER_BACKEND, RECOGNIZER_CONFIG
+from core.keyword_matcher import create_keyword_matcher
+from core.warmup import ModelWarmup
+from core.metrics import MetricsServer, MetricsReporter, histogram
 
 REGISTERED_FACES_DIR = "data/registered_faces"
+DETECTION_INTERVAL = 10
+# Chế độ không giao diện (kiosk): bỏ qua toàn bộ vẽ và hiển thị
+HEADLESS = os.environ.get("ALT_HEADLESS") == "1"
+DISPLAY_MAX_FPS = 15
+# Camera index, tệp video hoặc thư mục ảnh (phát lại một phiên đã ghi thay cho camera)
+FRAME_SOURCE = os.environ.get("ALT_FRAME_SOURCE", "0")
+# Để trống để tự benchmark và chọn backend nhanh nhất trên máy này ("mediapipe", "opencv_dnn")
+DETECTOR_BACKEND = os.environ.get("ALT_DETECTOR_BACKEND", "")
+# "host:port" của inference server dùng chung cho cả phòng thi; để trống để suy luận tại máy
+INFERENCE_SERVER = os.environ.get("ALT_INFERENCE_SERVER", "")
+# Chạy face mesh, ArcFace và detector trong các tiến trình worker riêng (tự khởi động lại khi crash)
+PROCESS_WORKERS = os.environ.get("ALT_PROCESS_WORKERS") == "1"
+VERIFY_SLOT_BYTES = 1024 * 1024 * 3
+# Lưu clip ngắn trước/sau mỗi sự kiện (điện thoại, từ khóa cấm) làm bằng chứng
+EVIDENCE_ENABLED = os.environ.get("ALT_EVIDENCE", "1") == "1"
+# Cổng HTTP cục bộ cho /metrics (0 = tắt) và chu kỳ in bản tóm tắt metrics (giây, 0 = tắt)
+METRICS_PORT = int(os.environ.get("ALT_METRICS_PORT", "0"))
+METRICS_DUMP_INTERVAL = float(os.environ.get("ALT_METRICS_DUMP_INTERVAL", "60"))
+DETECTOR_CONFIG = {
+    "common": {"num_threads": 0},
+    "opencv_dnn": {"input_size": 416, "dnn_backend": "default", "dnn_target": "cpu"},
+}
 # REMOVED: YOLO constants are no longer needed
 
 examId = None
@@ -52,6 +84,8 @@ def apply_network_restrictions():
         print("⚠ Không tìm thấy card mạng hoạt động để thiết lập DNS.")
 
     if not proxy_active:
+        # proxy.py chỉ được import khi thật sự bật proxy
+        from core.proxy_server import start_proxy
         threading.Thread(target=start_proxy, daemon=True).start()
         proxy_active = True
         time.sleep(1)
@@ -65,6 +99,7 @@ def remove_network_restrictions():
     print("⚙️ Gỡ bỏ các hạn chế mạng...")
 
     if proxy_active:
+        from core.proxy_server import stop_proxy
         reset_system_proxy()
         stop_proxy()
         proxy_active = False
@@ -83,155 +118,314 @@ def remove_network_restrictions():
     
     flush_dns_cache()
 
-def monitoring_loop():
+def monitoring_loop(headless=HEADLESS, warmup=None, started_at=None):
     global examId, studentId, authenticated, registered_face_path
 
-    # UPDATED: Initialize MediaPipe ObjectDetector
-    object_detector = ObjectDetector()
-    face_tracker = FaceTracker()
-    audio_monitor = AudioMonitor()
-    cap = cv2.VideoCapture(0)
+    audio_monitor = AudioMonitor(keywords=create_keyword_matcher(examId))
+    try:
+        cap = open_source(FRAME_SOURCE, loop=True, realtime=True)
+    except ValueError as e:
+        print(f"✗ {e}")
+        return
 
     if not cap.isOpened():
         print("✗ Không thể mở camera! Đảm bảo không có ứng dụng nào khác đang sử dụng camera.")
         return
 
-    phone_detection_count, frame_count = 0, 0
-    last_check_time, check_interval = time.time(), 5
+    # Mô hình nặng có thể chạy trong tiến trình riêng, frame được truyền qua shared memory
+    process_workers = []
+    if PROCESS_WORKERS:
+        face_worker = InferenceProcess("face")
+        process_workers.append(face_worker)
+        face_tracker = ProcessFaceTracker(face_worker)
+    else:
+        # Dùng lại FaceTracker đã được khởi tạo sẵn trong lúc hiển thị cửa sổ đăng nhập
+        face_tracker = (warmup.take_face_tracker() if warmup else None) or FaceTracker()
+
+    inference_client = None
+    if INFERENCE_SERVER:
+        host, _, port = INFERENCE_SERVER.rpartition(":")
+        inference_client = RemoteInferenceClient(f"{examId}/{studentId}", host, int(port))
+        served = inference_client.tasks()
+        if served:
+            print(f"✓ Dùng inference server tại {INFERENCE_SERVER} (tasks: {', '.join(served)})")
+        else:
+            print(f"⚠ Inference server {INFERENCE_SERVER} không phản hồi, dùng mô hình cục bộ")
+    # Task nào server không phục vụ (không tải được mô hình) thì chạy cục bộ
+    if inference_client is not None and inference_client.supports("verify"):
+        verification_worker = FaceVerificationWorker(registered_face_path, verify_fn=inference_client.verify)
+    elif PROCESS_WORKERS:
+        verify_worker = InferenceProcess("verify", slot_size=VERIFY_SLOT_BYTES)
+        process_workers.append(verify_worker)
+        verification_worker = FaceVerificationWorker(registered_face_path, verify_fn=ProcessVerifier(verify_worker))
+    else:
+        verification_worker = FaceVerificationWorker(registered_face_path)
+
+    warmed_detector = warmup.take_detector() if warmup else None
+    if inference_client is not None and inference_client.available:
+        object_detector = inference_client
+    elif PROCESS_WORKERS:
+        detect_worker = InferenceProcess("detect", {"backend": DETECTOR_BACKEND or "mediapipe", "config": DETECTOR_CONFIG})
+        process_workers.append(detect_worker)
+        object_detector = ProcessDetector(detect_worker)
+    elif warmed_detector is not None:
+        object_detector = warmed_detector
+    elif DETECTOR_BACKEND:
+        object_detector = create_detector(DETECTOR_BACKEND, **DETECTOR_CONFIG)
+    else:
+        # Warm-up không chọn được detector: benchmark ngắn trên frame camera thật
+        ret, sample = cap.read()
+        object_detector, _ = select_detector([sample] if ret else [np.zeros((480, 640, 3), np.uint8)],
+                                             DETECTOR_CONFIG)
+    for worker in process_workers:
+        worker.start()
+    detector_available = object_detector is not None and object_detector.available
+    # Detector đầy đủ chỉ chạy mỗi DETECTION_INTERVAL frame, giữa các lần chạy tracker IoU nội suy hộp
+    detection_scheduler = DetectionScheduler(object_detector.detect if detector_available else None,
+                                             interval=DETECTION_INTERVAL)
+
+    frame_count = 0
+    reporter = SessionReporter(examId, studentId)
+    face_status = ("Face: NO REFERENCE", (128, 128, 128))
+    detections = []
+    gaze_direction, head_pose, face_landmarks = "UNKNOWN", "UNKNOWN", None
+    face_count = 0
+    latest_frame = None
+    overlay = None if headless else OverlayRenderer(face_tracker, max_fps=DISPLAY_MAX_FPS)
+    render_histogram = histogram("frame_stage_seconds", stage="render")
+    metrics_server = MetricsServer(port=METRICS_PORT) if METRICS_PORT else None
+    metrics_reporter = MetricsReporter(interval=METRICS_DUMP_INTERVAL) if METRICS_DUMP_INTERVAL > 0 else None
+    # Lệnh từ xa (monitoringEnabled...) được Firestore đẩy về qua snapshot listener
+    remote_control = RemoteControl(examId, studentId)
+
+    evidence = EvidenceRecorder(os.path.join(EVIDENCE_DIR, str(examId), str(studentId)),
+                                on_saved=reporter.evidence_saved) if EVIDENCE_ENABLED else None
 
     def handle_speech_detected(text):
         print(f"Callback: Speech detected: {text}")
-        update_user_field(examId, studentId, {
-            "speechDetected": True,
-            "lastSpeechTime": firestore.SERVER_TIMESTAMP,
-            "lastSpeechText": text
-        })
+        reporter.speech_detected(text)
 
     def handle_keyword_detected(keyword, text):
         print(f"Callback: Forbidden keyword detected: {keyword} in {text}")
-        update_user_field(examId, studentId, {
-            "forbiddenKeywordDetected": True,
-            "lastKeywordTime": firestore.SERVER_TIMESTAMP,
-            "lastKeyword": keyword,
-            "fullSpeechWithKeyword": text
-        })
-
-    print("🔍 Bắt đầu giám sát... (ESC để thoát)")
+        if evidence is not None:
+            evidence.trigger("keyword")
+        reporter.keyword_detected(keyword, text)
+
+    def handle_audio_event(kind, details):
+        print(f"Callback: Audio event detected: {kind} {details}")
+        if evidence is not None:
+            evidence.trigger(kind)
+        reporter.audio_event(kind)
+
+    has_reference = registered_face_path and os.path.exists(registered_face_path)
+    if has_reference:
+        verification_worker.start()
+        face_status = ("Face: VERIFYING...", (255, 255, 0))
+
+    # --- Pipeline: capture -> (face tracking | object detection) -> main thread (overlay) ---
+    # Mỗi stage chạy trên thread riêng, nối với nhau bằng hàng đợi chỉ giữ giá trị mới nhất,
+    # nên stage chậm nhất không còn quyết định FPS của các stage khác.
+    pipeline = Pipeline()
+    # Frame bị bỏ khỏi hàng đợi vẫn phải trả buffer về pool
+    release_context = lambda context: context.release()
+    face_queue = pipeline.add_queue(on_drop=release_context)
+    detect_queue = pipeline.add_queue(on_drop=release_context)
+    face_results = pipeline.add_queue()
+    render_queue = None if headless else pipeline.add_queue()
+    detection_results = pipeline.add_queue(maxsize=4)
+    buffer_pool = BufferPool()
+    capture_state = {"frame_id": 0}
+
+    def capture_stage():
+        ret, frame = cap.read()
+        if not ret:
+            raise StopPipeline("Không thể đọc frame từ camera!")
+        capture_state["frame_id"] += 1
+        frame_id = capture_state["frame_id"]
+
+        # Một FrameContext dùng chung cho mọi stage: RGB, mp.Image... chỉ tính một lần
+        # Worker detect có thể bỏ cuộc giữa phiên (không tải được mô hình): ngừng gửi frame cho nó
+        detect = authenticated and detector_available and object_detector.available
+        context = FrameContext(frame, frame_id, time.time(), buffer_pool, consumers=2 if detect else 1)
+        if detect:
+            detect_queue.put(context)
+        face_queue.put(context)
+        if evidence is not None and authenticated:
+            evidence.add(frame, context.timestamp)
+        if render_queue is not None:
+            render_queue.put(frame)
+        return None
+
+    def face_stage(context):
+        # Không vẽ trong stage suy luận; OverlayRenderer vẽ lại từ landmarks nếu cần hiển thị
+        try:
+            _, gaze, pose = face_tracker.process_frame(context.bgr, context, draw=False)
+            face_count = face_tracker.last_face_count
+
+            # Chỉ xác thực khi có đúng một khuôn mặt: gửi ảnh khuôn mặt đã cắt và căn thẳng
+            # sang worker, DeepFace không cần chạy lại bộ dò khuôn mặt trên toàn frame
+            if not authenticated and has_reference and context.frame_id % 10 == 0 and face_count == 1:
+                crop = face_tracker.aligned_face_crop(context.bgr)
+                if crop is not None:
+                    verification_worker.submit(crop, aligned=True)
+
+            return (context.frame_id, gaze, pose, face_tracker.last_face_landmarks, face_count)
+        finally:
+            context.release()
+
+    def detection_stage(context):
+        try:
+            detections, new_episodes, _ = detection_scheduler.process(context.frame_id, context.bgr, context)
+            return (context.frame_id, detections, new_episodes)
+        finally:
+            context.release()
+
+    pipeline.add_stage("capture", capture_stage)
+    pipeline.add_stage("face", face_stage, input_queue=face_queue, output_queues=[face_results])
+    if detector_available:
+        pipeline.add_stage("detection", detection_stage, input_queue=detect_queue,
+                           output_queues=[detection_results])
+
+    if headless:
+        print("🔍 Bắt đầu giám sát (headless)... (Ctrl+C để thoát)")
+    else:
+        print("🔍 Bắt đầu giám sát... (ESC để thoát)")
 
     try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("✗ Không thể đọc frame từ camera!")
-                break
-
-            frame_count += 1
-
-            frame, gaze_direction, head_pose = face_tracker.process_frame(frame)
-
-            # Face authentication logic (remains the same)
-            if not authenticated and registered_face_path and os.path.exists(registered_face_path) and frame_count % 10 == 0:
-                verified = verify_face(frame, registered_face_path)
+        if metrics_server is not None:
+            try:
+                metrics_server.start()
+            except OSError as e:
+                print(f"✗ Không thể mở cổng metrics {METRICS_PORT}: {e}")
+                metrics_server = None
+        if metrics_reporter is not None:
+            metrics_reporter.start()
+        if evidence is not None:
+            evidence.start()
+        remote_control.start()
+        pipeline.start()
+        while pipeline.running:
+            face_result = face_results.get(timeout=0.05)
+            if face_result is not None:
+                _, gaze_direction, head_pose, face_landmarks, face_count = face_result
+                frame_count += 1
+
+            # Face authentication logic: kết quả được trả về bất đồng bộ từ worker
+            for result in verification_worker.get_results():
+                if authenticated:
+                    break
+                if started_at is not None:
+                    print(f"⏱ Kết quả xác thực đầu tiên sau {time.perf_counter() - started_at:.2f}s kể từ khi khởi động")
+                    started_at = None
+                verified = result.verified
+                reporter.verification_result(verified)
                 if verified is True:
-                    cv2.putText(frame, "Face: VERIFIED", (50, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-                    update_user_field(examId, studentId, {
-                        "faceVerified": True,
-                        "lastVerifiedTime": firestore.SERVER_TIMESTAMP
-                    })
-
-                    if not authenticated:
-                        print("👤 Khuôn mặt khớp - xác thực hoàn tất!")
-                        authenticated = True
-                        apply_network_restrictions()
-                        audio_monitor.start_monitoring(
-                            speech_callback=handle_speech_detected,
-                            keyword_callback=handle_keyword_detected
-                        )
+                    face_status = ("Face: VERIFIED", (0, 255, 0))
+
+                    print(f"👤 Khuôn mặt khớp - xác thực hoàn tất! ({result.latency:.2f}s)")
+                    authenticated = True
+                    verification_worker.stop(timeout=0)
+                    apply_network_restrictions()
+                    audio_monitor.start_monitoring(
+                        speech_callback=handle_speech_detected,
+                        keyword_callback=handle_keyword_detected,
+                        backend=warmup.take_recognizer() if warmup else None,
+                        audio_event_callback=handle_audio_event
+                    )
 
                 elif verified is False:
-                    cv2.putText(frame, "Face: NOT VERIFIED", (50, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 255), 2)
-                    update_user_field(examId, studentId, {
-                        "faceVerified": False,
-                        "lastFailedTime": firestore.SERVER_TIMESTAMP
-                    })
+                    face_status = ("Face: NOT VERIFIED", (0, 0, 255))
                 else:
-                    cv2.putText(frame, "Face: ERROR", (50, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 100, 255), 2)
-            elif authenticated:
-                cv2.putText(frame, "Face: VERIFIED (Authenticated)", (50, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
-            else:
-                cv2.putText(frame, "Face: NO REFERENCE", (50, 50),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (128, 128, 128), 2)
-
-            # --- UPDATED: Object Detection Block ---
-            if authenticated and object_detector.detector:
-                detections = object_detector.detect(frame)
-                
-                for detection in detections:
-                    label = detection['label']
-                    score = detection['score']
-                    x, y, w, h = detection['bbox']
-
-                    # MediaPipe might detect 'mobile phone' instead of 'cell phone'
-                    # so we check if 'phone' is in the label.
-                    is_phone = 'phone' in label.lower()
-
-                    color = (0, 0, 255) if is_phone else (128, 0, 128)
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-                    cv2.putText(frame, f"{label} {score:.2f}", (x, y - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
-
-                    if is_phone:
-                        phone_detection_count += 1
-                        print(f"📱 Phát hiện điện thoại lần {phone_detection_count}")
-
-                        if phone_detection_count == 3:
-                            update_user_field(examId, studentId, {
-                                "cheatSuspicion": "true",
-                                "suspicionTime": firestore.SERVER_TIMESTAMP
-                            })
-                        if phone_detection_count == 7:
-                            update_user_field(examId, studentId, {
-                                "cheatDetected": "true",
-                                "detectionTime": firestore.SERVER_TIMESTAMP
-                            })
-            # --- END OF UPDATED BLOCK ---
-
-            cv2.putText(frame, f"Student: {studentId}", (50, 100),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(frame, f"Phone detections: {phone_detection_count}", (50, 130),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(frame, f"Gaze: {gaze_direction}", (50, 160),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-            cv2.putText(frame, f"Head Pose: {head_pose}", (50, 190),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
-
-            if time.time() - last_check_time >= check_interval:
-                doc = get_user_doc(examId, studentId)
-                if doc.exists and not doc.to_dict().get("monitoringEnabled", True):
-                    print("🛑 Tắt giám sát do yêu cầu từ xa.")
+                    face_status = ("Face: ERROR", (0, 100, 255))
+
+            if authenticated:
+                face_status = ("Face: VERIFIED (Authenticated)", (0, 255, 0))
+            elif not has_reference:
+                face_status = ("Face: NO REFERENCE", (128, 128, 128))
+
+            # --- Object Detection: điện thoại được đếm theo từng đối tượng được theo dõi (episode),
+            # không phải theo từng frame nhìn thấy nó ---
+            while True:
+                result = detection_results.get_nowait()
+                if result is None:
                     break
-                last_check_time = time.time()
+                _, detections, new_episodes = result
+                for track in new_episodes:
+                    if not is_phone(track.label):
+                        continue
+                    phone_detection_count = reporter.phone_detected()
+                    if evidence is not None:
+                        evidence.trigger("phone")
+                    print(f"📱 Phát hiện điện thoại lần {phone_detection_count} (track #{track.track_id})")
+
+            if remote_control.stop_event.is_set():
+                print("🛑 Tắt giám sát do yêu cầu từ xa.")
+                break
 
-            cv2.imshow("Exam Monitoring System", frame)
-            if cv2.waitKey(1) == 27:
+            if overlay is None:
+                continue
+
+            frame = render_queue.get_nowait()
+            if frame is not None:
+                latest_frame = frame
+            if latest_frame is not None and overlay.due():
+                stage_fps = " ".join(f"{name}:{s['fps']:.0f}" for name, s in pipeline.stats().items())
+                with render_histogram.time():
+                    overlay.render(latest_frame, face_landmarks, detections, face_status, [
+                        f"Student: {studentId}   Faces: {face_count}",
+                        f"Phone detections: {reporter.phone_detection_count}",
+                        f"Gaze: {gaze_direction}",
+                        f"Head Pose: {head_pose}",
+                        f"FPS {stage_fps}",
+                    ])
+            if overlay.poll_key() == 27:
                 print("👋 Người dùng thoát.")
                 break
+
+        if pipeline.stop_reason:
+            print(f"✗ Pipeline dừng: {pipeline.stop_reason}")
     finally:
         print("Clean up after monitoring loop...")
+        remote_control.stop()
+        pipeline.stop()
+        verification_worker.stop()
+        if evidence is not None:
+            evidence.stop()
         remove_network_restrictions()
         if audio_monitor.running:
             audio_monitor.stop_monitoring()
+        if inference_client is not None:
+            inference_client.close()
+        for worker in process_workers:
+            worker.stop()
+        if metrics_reporter is not None:
+            metrics_reporter.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
 
     cap.release()
-    cv2.destroyAllWindows()
+    if overlay is not None:
+        overlay.close()
     print("✓ Hoàn tất giám sát!")
 
-def run_app():
+def create_warmup():
+    """Warm-up matching the inference mode monitoring_loop will use."""
+    local = not INFERENCE_SERVER and not PROCESS_WORKERS
+    return ModelWarmup(
+        firebase=TELEMETRY_SINK == "firestore",
+        arcface=local,
+        face_mesh=not PROCESS_WORKERS,
+        detector_backend=DETECTOR_BACKEND if local else None,
+        detector_config=DETECTOR_CONFIG,
+        # Không chỉ định backend: benchmark và chọn detector ngay trong lúc warm-up
+        select_detector=local and not DETECTOR_BACKEND,
+        recognizer_backend=RECOGNIZER_BACKEND,
+        recognizer_config=RECOGNIZER_CONFIG,
+    )
+
+def run_app(headless=HEADLESS, started_at=None):
     global examId, studentId, registered_face_path
+    warmup = create_warmup()
 
     def start_exam_action():
         global examId, studentId, registered_face_path
@@ -241,8 +435,16 @@ def run_app():
             messagebox.showwarning("Thiếu thông tin", "Vui lòng nhập đầy đủ Exam ID và Student ID")
             return
         registered_face_path = os.path.join(REGISTERED_FACES_DIR, f"{studentId}.jpg")
+        if os.path.exists(registered_face_path) and not INFERENCE_SERVER and not PROCESS_WORKERS:
+            warmup.warm_reference(registered_face_path)
         root.destroy()
 
+    def on_window_shown():
+        if started_at is not None:
+            print(f"⏱ Cửa sổ đăng nhập hiển thị sau {time.perf_counter() - started_at:.2f}s")
+        # Mô hình được tải trong nền trong lúc người dùng nhập thông tin
+        warmup.start()
+
     root = tk.Tk()
     root.title("Exam Login")
     root.geometry("300x200")
@@ -257,20 +459,25 @@ def run_app():
 
     tk.Button(root, text="Bắt đầu", command=start_exam_action).pack(pady=10)
 
+    root.after(0, on_window_shown)
     root.mainloop()
 
     if not examId or not studentId:
         print("✗ Người dùng đã hủy hoặc không nhập thông tin. Thoát ứng dụng.")
+        warmup.close()
         return
 
     if not os.path.exists(registered_face_path):
         print(f"⚠ Không tìm thấy ảnh gốc cho Student ID {studentId} tại: {registered_face_path}")
         messagebox.showerror("Lỗi", f"Không tìm thấy ảnh gốc cho Student ID {studentId}. Vui lòng đảm bảo ảnh đã được đăng ký.")
+        warmup.close()
         return
     
     try:
-        monitoring_loop()
+        monitoring_loop(headless=headless, warmup=warmup, started_at=started_at)
     finally:
+        warmup.close()
+        flush_writes()
         if proxy_active or dns_server_active or dns_blocked_interfaces:
             print("Chạy clean up cuối cùng từ run_app...")
             remove_network_restrictions()
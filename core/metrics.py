@@ -0,0 +1,293 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9464
+DUMP_INTERVAL = 60  # Giây giữa hai lần in bản tóm tắt metrics
+
+# Biên trên (giây) của các bucket histogram độ trễ: 1 ms .. 10 s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Counter:
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return {"value": self.value}
+
+class Gauge:
+    """Value that can go up and down (queue depth, active tracks...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def snapshot(self):
+        return {"value": self.value}
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. Memory stays constant however many
+    observations are made; quantiles are estimated from the bucket counts.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, labels, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+            if value > self.max:
+                self.max = value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def state(self):
+        """Consistent (counts, count, sum, max) copy taken under the lock."""
+        with self._lock:
+            return list(self.counts), self.count, self.sum, self.max
+
+    def _quantile(self, q, counts, total, max_value):
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[i], max_value) if i < len(self.buckets) else max_value
+        return max_value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (max for the overflow bucket)."""
+        counts, total, _, max_value = self.state()
+        return self._quantile(q, counts, total, max_value)
+
+    def snapshot(self):
+        counts, total, value_sum, max_value = self.state()
+        return {
+            "count": total,
+            "sum": value_sum,
+            "mean": value_sum / total if total else None,
+            "p50": self._quantile(0.5, counts, total, max_value),
+            "p99": self._quantile(0.99, counts, total, max_value),
+            "max": max_value,
+        }
+
+class MetricsRegistry:
+    """
+    Process-wide collection of metrics, keyed by name and labels.
+
+    counter()/gauge()/histogram() return the existing metric when called
+    again with the same name and labels, so call sites can look metrics up
+    lazily without keeping references around.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = cls(name, dict(labels))
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric '{name}' đã được đăng ký với kiểu {metric.kind}")
+            return metric
+
+    def counter(self, name, **labels):
+        return self._get(Counter, name, labels)
+
+    def gauge(self, name, **labels):
+        return self._get(Gauge, name, labels)
+
+    def histogram(self, name, **labels):
+        return self._get(Histogram, name, labels)
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self):
+        """Plain dict of every metric, suitable for JSON."""
+        return [{"name": m.name, "type": m.kind, "labels": m.labels, **m.snapshot()} for m in self.metrics()]
+
+    def render_text(self):
+        """Prometheus text exposition format."""
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: m.name):
+            labels = _format_labels(metric.labels)
+            if metric.kind != "histogram":
+                lines.append(f"{metric.name}{labels} {metric.value}")
+                continue
+            # Chụp một lần dưới khóa: bucket, _sum và _count phải khớp nhau dù observe() chạy song song
+            counts, total, value_sum, _ = metric.state()
+            cumulative = 0
+            for bound, count in zip(metric.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f"{metric.name}_bucket{_format_labels({**metric.labels, 'le': bound})} {cumulative}")
+            lines.append(f"{metric.name}_sum{labels} {value_sum}")
+            lines.append(f"{metric.name}_count{labels} {total}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Short human-readable summary: counters/gauges and histogram p50/p99 in ms."""
+        lines = []
+        for metric in sorted(self.metrics(), key=lambda m: (m.name, sorted(m.labels.items()))):
+            name = metric.name + _format_labels(metric.labels)
+            if metric.kind == "histogram":
+                snap = metric.snapshot()
+                if not snap["count"]:
+                    continue
+                lines.append(f"  {name}: n={snap['count']} p50={snap['p50'] * 1000:.1f}ms "
+                             f"p99={snap['p99'] * 1000:.1f}ms max={snap['max'] * 1000:.1f}ms")
+            else:
+                lines.append(f"  {name}: {metric.value}")
+        return "\n".join(lines)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+REGISTRY = MetricsRegistry()
+
+def counter(name, **labels):
+    return REGISTRY.counter(name, **labels)
+
+def gauge(name, **labels):
+    return REGISTRY.gauge(name, **labels)
+
+def histogram(name, **labels):
+    return REGISTRY.histogram(name, **labels)
+
+class MetricsServer:
+    """
+    Serves the registry over HTTP on a background thread:
+    /metrics (Prometheus text) and /metrics.json.
+    """
+
+    def __init__(self, registry=REGISTRY, host=METRICS_HOST, port=METRICS_PORT):
+        self.registry = registry
+        self.address = (host, port)
+        self._server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, content_type = json.dumps(registry.snapshot()).encode("utf-8"), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, content_type = registry.render_text().encode("utf-8"), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(self.address, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+        self.address = self._server.server_address
+        print(f"✓ Metrics tại http://{self.address[0]}:{self.address[1]}/metrics")
+        return self.address
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+class MetricsReporter:
+    """Prints (or appends to `path`) a registry summary every `interval` seconds."""
+
+    def __init__(self, registry=REGISTRY, interval=DUMP_INTERVAL, path=None):
+        self.registry = registry
+        self.interval = interval
+        self.path = path
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="metrics-dump", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        self.dump()
+
+    def dump(self):
+        summary = self.registry.summary()
+        if not summary:
+            return
+        if self.path:
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"time": time.time(), "metrics": self.registry.snapshot()}) + "\n")
+            except Exception as e:
+                print(f"✗ Không thể ghi metrics vào {self.path}: {e}")
+        else:
+            print(f"📊 Metrics:\n{summary}")
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.dump()
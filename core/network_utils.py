@@ -2,8 +2,11 @@ import subprocess
 import re
 import socket
 import threading
+import time
 from dnslib import DNSRecord, RR, A, QTYPE
 
+from core.metrics import counter, histogram
+
 DNS_WHITELIST_PATH = "config/dns_whitelist.txt"
 WHITELISTED_DOMAINS = []
 
@@ -27,6 +30,8 @@ dns_server_thread = None
 dns_server_running = False
 
 def handle_dns_request(data, addr, sock):
+    started = time.perf_counter()
+    path = "error"
     try:
         request = DNSRecord.parse(data)
         qtype = request.q.qtype
@@ -35,6 +40,7 @@ def handle_dns_request(data, addr, sock):
         response.add_question(request.q)
 
         if qtype == QTYPE.PTR:
+            path = "upstream"
             try:
                 upstream_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
                 upstream_sock.settimeout(2)
@@ -42,6 +48,7 @@ def handle_dns_request(data, addr, sock):
                 upstream_response, _ = upstream_sock.recvfrom(512)
                 sock.sendto(upstream_response, addr)
             except Exception as e:
+                path = "upstream_error"
                 print(f"✗ Lỗi khi chuyển tiếp PTR request từ {addr}: {e}")
                 response.header.ra = 1
                 response.header.rcode = QTYPE.NXDOMAIN
@@ -69,6 +76,7 @@ def handle_dns_request(data, addr, sock):
                     break
 
         if is_whitelisted:
+            path = "upstream"
             try:
                 upstream_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
                 upstream_sock.settimeout(2)
@@ -76,6 +84,7 @@ def handle_dns_request(data, addr, sock):
                 upstream_response, _ = upstream_sock.recvfrom(512)
                 sock.sendto(upstream_response, addr)
             except Exception as e:
+                path = "upstream_error"
                 print(f"✗ Lỗi khi chuyển tiếp DNS cho {qname}: {e}")
                 response.header.ra = 1
                 response.header.rcode = QTYPE.NXDOMAIN
@@ -84,6 +93,7 @@ def handle_dns_request(data, addr, sock):
                 if upstream_sock:
                     upstream_sock.close()
         else:
+            path = "local_block"
             print(f"🚫 Chặn truy vấn DNS cho: {qname} (không có trong whitelist)")
             response.header.ra = 1
             response.header.rcode = QTYPE.NXDOMAIN
@@ -91,6 +101,10 @@ def handle_dns_request(data, addr, sock):
 
     except Exception as e:
         print(f"✗ Lỗi xử lý DNS request từ {addr}: {e}")
+    finally:
+        # Độ trễ được tách theo đường đi: chuyển tiếp lên 8.8.8.8 hay chặn tại chỗ
+        counter("dns_queries_total", path=path).inc()
+        histogram("dns_query_seconds", path=path).observe(time.perf_counter() - started)
 
 def dns_server_loop():
     global dns_server_socket, dns_server_running
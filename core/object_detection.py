@@ -28,12 +28,14 @@ class ObjectDetector:
             print(f"✗ MediaPipe load error: {e}")
             self.detector = None
 
-    def detect(self, frame):
+    def detect(self, frame, context=None):
         """
         Performs object detection on a single frame.
         
         Args:
             frame: The input image frame from OpenCV (in BGR format).
+            context: Optional FrameContext for the same frame; its memoized
+                RGB view and mp.Image are reused instead of converting again.
             
         Returns:
             A list of detections. Each detection is a dictionary containing 'label', 'score', and 'bbox'.
@@ -42,11 +44,14 @@ class ObjectDetector:
         if not self.detector:
             return []
 
-        # Convert the frame from BGR to RGB
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        # Create a MediaPipe Image object
-        mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
+        if context is not None:
+            mp_image = context.mp_image
+        else:
+            # Convert the frame from BGR to RGB
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+            # Create a MediaPipe Image object
+            mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_frame)
         
         # Perform detection
         detection_result = self.detector.detect(mp_image)
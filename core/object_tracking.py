@@ -0,0 +1,178 @@
+import itertools
+
+def iou(box_a, box_b):
+    """Intersection over union of two (x, y, w, h) boxes."""
+    ax, ay, aw, ah = box_a
+    bx, by, bw, bh = box_b
+    ix = max(0, min(ax + aw, bx + bw) - max(ax, bx))
+    iy = max(0, min(ay + ah, by + bh) - max(ay, by))
+    intersection = ix * iy
+    union = aw * ah + bw * bh - intersection
+    return intersection / union if union > 0 else 0.0
+
+def is_phone(label):
+    # MediaPipe might detect 'mobile phone' instead of 'cell phone'
+    return 'phone' in label.lower()
+
+class Track:
+    def __init__(self, track_id, detection, frame_id):
+        self.track_id = track_id
+        self.label = detection['label']
+        self.score = detection['score']
+        self.bbox = tuple(float(v) for v in detection['bbox'])
+        self.observed_bbox = self.bbox  # Hộp detector thấy lần cuối (bbox có thể là hộp dự đoán)
+        self.velocity = (0.0, 0.0)
+        self.hits = 1
+        self.misses = 0
+        self.last_detected_frame = frame_id
+        self.last_frame = frame_id
+        self.episode_counted = False
+
+    def predict(self, frame_id):
+        """Moves the box along its last observed centroid velocity."""
+        steps = frame_id - self.last_frame
+        if steps <= 0:
+            return
+        x, y, w, h = self.bbox
+        vx, vy = self.velocity
+        self.bbox = (x + vx * steps, y + vy * steps, w, h)
+        self.last_frame = frame_id
+
+    def update(self, detection, frame_id):
+        x, y, w, h = (float(v) for v in detection['bbox'])
+        steps = max(1, frame_id - self.last_detected_frame)
+        old_x, old_y, old_w, old_h = self.observed_bbox
+        # Vận tốc tâm hộp (pixel/frame) giữa hai lần chạy detector, tính từ hộp quan sát chứ không phải hộp dự đoán
+        self.velocity = (((x + w / 2) - (old_x + old_w / 2)) / steps,
+                         ((y + h / 2) - (old_y + old_h / 2)) / steps)
+        self.bbox = (x, y, w, h)
+        self.observed_bbox = self.bbox
+        self.score = detection['score']
+        self.hits += 1
+        self.misses = 0
+        self.last_detected_frame = frame_id
+        self.last_frame = frame_id
+
+    def confidence(self, frame_id, decay):
+        return self.score * (decay ** (frame_id - self.last_detected_frame))
+
+    def as_detection(self):
+        x, y, w, h = self.bbox
+        return {'label': self.label, 'score': self.score,
+                'bbox': (int(x), int(y), int(w), int(h)), 'track_id': self.track_id}
+
+class IoUTracker:
+    """
+    Greedy IoU tracker for detector output.
+
+    Detections are matched to existing tracks of the same label by IoU; a
+    track that misses `max_misses` consecutive detector runs is dropped. A
+    track becomes an "episode" once it has been seen `min_hits` times, which
+    is what callers should count instead of raw per-frame detections.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2, min_hits=2, decay=0.93):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.min_hits = min_hits
+        self.decay = decay
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def predict(self, frame_id):
+        for track in self.tracks:
+            track.predict(frame_id)
+
+    def update(self, detections, frame_id):
+        """
+        Matches a new set of detections. Returns the tracks that became
+        confirmed episodes on this update.
+        """
+        self.predict(frame_id)
+        candidates = []
+        for t_idx, track in enumerate(self.tracks):
+            for d_idx, detection in enumerate(detections):
+                if detection['label'] != track.label:
+                    continue
+                overlap = iou(track.bbox, detection['bbox'])
+                if overlap >= self.iou_threshold:
+                    candidates.append((overlap, t_idx, d_idx))
+        candidates.sort(reverse=True)
+
+        matched_tracks, matched_detections = set(), set()
+        for _, t_idx, d_idx in candidates:
+            if t_idx in matched_tracks or d_idx in matched_detections:
+                continue
+            self.tracks[t_idx].update(detections[d_idx], frame_id)
+            matched_tracks.add(t_idx)
+            matched_detections.add(d_idx)
+
+        survivors = []
+        for t_idx, track in enumerate(self.tracks):
+            if t_idx not in matched_tracks:
+                track.misses += 1
+                if track.misses > self.max_misses:
+                    continue
+            survivors.append(track)
+        for d_idx, detection in enumerate(detections):
+            if d_idx not in matched_detections:
+                survivors.append(Track(next(self._ids), detection, frame_id))
+        self.tracks = survivors
+
+        new_episodes = []
+        for track in self.tracks:
+            if not track.episode_counted and track.hits >= self.min_hits:
+                track.episode_counted = True
+                new_episodes.append(track)
+        return new_episodes
+
+    def min_confidence(self, frame_id):
+        if not self.tracks:
+            return None
+        return min(track.confidence(frame_id, self.decay) for track in self.tracks)
+
+    def detections(self):
+        return [track.as_detection() for track in self.tracks]
+
+class DetectionScheduler:
+    """
+    Decides when to run the full object detector.
+
+    The detector runs every `interval` frames, or earlier when the weakest
+    tracked object's decayed confidence drops below `min_confidence`. In
+    between, boxes are propagated by the tracker.
+    """
+
+    def __init__(self, detect_fn, interval=10, min_confidence=0.35, tracker=None):
+        self.detect_fn = detect_fn
+        self.interval = interval
+        self.min_confidence = min_confidence
+        self.tracker = tracker or IoUTracker()
+        self.last_run_frame = None
+        self.detector_runs = 0
+        self.frames_seen = 0
+
+    def should_detect(self, frame_id):
+        if self.last_run_frame is None or frame_id - self.last_run_frame >= self.interval:
+            return True
+        confidence = self.tracker.min_confidence(frame_id)
+        return confidence is not None and confidence < self.min_confidence
+
+    def process(self, frame_id, *args, **kwargs):
+        """
+        Returns (detections, new_episodes, ran_detector) for one frame; the
+        positional/keyword arguments are forwarded to detect_fn.
+        """
+        self.frames_seen += 1
+        if self.should_detect(frame_id):
+            detections = self.detect_fn(*args, **kwargs)
+            self.detector_runs += 1
+            self.last_run_frame = frame_id
+            new_episodes = self.tracker.update(detections, frame_id)
+            return self.tracker.detections(), new_episodes, True
+        self.tracker.predict(frame_id)
+        return self.tracker.detections(), [], False
+
+    def duty_cycle(self):
+        """Fraction of frames on which the full detector actually ran."""
+        return self.detector_runs / self.frames_seen if self.frames_seen else 0.0
@@ -0,0 +1,62 @@
+import time
+
+import cv2
+
+from core.object_tracking import is_phone
+
+WINDOW_NAME = "Exam Monitoring System"
+
+class OverlayRenderer:
+    """
+    Draws the monitoring preview off the detection hot path.
+
+    Inference stages only publish results (landmarks, boxes, status); this
+    renderer draws them on a copy of the latest frame at most `max_fps` times
+    per second. OpenCV HighGUI has to be driven from the main thread, so the
+    caller invokes render()/poll_key() from its loop instead of a pipeline
+    stage thread.
+    """
+
+    def __init__(self, face_tracker=None, window_name=WINDOW_NAME, max_fps=15, draw_face_mesh=True):
+        self.face_tracker = face_tracker
+        self.window_name = window_name
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.draw_face_mesh = draw_face_mesh
+        self.last_render_time = 0.0
+        self.rendered_count = 0
+
+    def due(self):
+        return time.time() - self.last_render_time >= self.min_interval
+
+    def render(self, frame, face_landmarks=None, detections=(), face_status=None, lines=()):
+        canvas = frame.copy()
+
+        if self.draw_face_mesh and self.face_tracker and face_landmarks is not None:
+            self.face_tracker.draw_landmarks(canvas, face_landmarks)
+
+        for detection in detections:
+            label = detection['label']
+            score = detection['score']
+            x, y, w, h = detection['bbox']
+            color = (0, 0, 255) if is_phone(label) else (128, 0, 128)
+            cv2.rectangle(canvas, (x, y), (x + w, y + h), color, 2)
+            cv2.putText(canvas, f"{label} {score:.2f}", (x, y - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
+
+        if face_status:
+            cv2.putText(canvas, face_status[0], (50, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, face_status[1], 2)
+        for i, line in enumerate(lines):
+            cv2.putText(canvas, line, (50, 100 + 30 * i),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+
+        cv2.imshow(self.window_name, canvas)
+        self.last_render_time = time.time()
+        self.rendered_count += 1
+        return canvas
+
+    def poll_key(self):
+        return cv2.waitKey(1)
+
+    def close(self):
+        cv2.destroyAllWindows()
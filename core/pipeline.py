@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import deque
+
+from core.metrics import counter, histogram
+
+DROP_OLDEST = "drop_oldest"  # Bỏ phần tử cũ nhất để nhận phần tử mới (giữ giá trị mới nhất)
+DROP_NEWEST = "drop_newest"  # Từ chối phần tử mới khi hàng đợi đầy
+
+class StopPipeline(Exception):
+    """Raised by a stage function to shut the whole pipeline down."""
+
+class LatestValueQueue:
+    """
+    Bounded queue between pipeline stages.
+
+    With the default DROP_OLDEST policy and maxsize=1 a consumer always sees
+    the most recent value and a slow stage never makes the producer wait.
+    """
+
+    def __init__(self, maxsize=1, drop_policy=DROP_OLDEST, on_drop=None):
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = maxsize
+        self.drop_policy = drop_policy
+        self.on_drop = on_drop
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.closed = False
+        self.put_count = 0
+        self.dropped_count = 0
+
+    def put(self, item):
+        """Adds an item, applying the drop policy. Returns False if the item was rejected."""
+        dropped = None
+        with self._cond:
+            if self.closed:
+                dropped, accepted = item, False
+            elif len(self._items) >= self.maxsize:
+                self.dropped_count += 1
+                if self.drop_policy == DROP_NEWEST:
+                    dropped, accepted = item, False
+                else:
+                    dropped, accepted = self._items.popleft(), True
+            else:
+                accepted = True
+            if accepted:
+                self._items.append(item)
+                self.put_count += 1
+                self._cond.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+        return accepted
+
+    def get(self, timeout=None):
+        """Returns the next item, or None on timeout or when the queue is closed and empty."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items or self.closed, timeout):
+                return None
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def get_nowait(self):
+        return self.get(timeout=0)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            remaining = list(self._items)
+            self._items.clear()
+            self._cond.notify_all()
+        if self.on_drop:
+            for item in remaining:
+                self.on_drop(item)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._items)
+
+class PipelineStage:
+    """
+    A single pipeline stage running `fn` on its own thread.
+
+    Source stages (input_queue=None) call fn() repeatedly; other stages call
+    fn(item) for every item taken from input_queue. A non-None return value is
+    pushed to every output queue.
+    """
+
+    def __init__(self, pipeline, name, fn, input_queue=None, output_queues=(),
+                 poll_timeout=0.1, window=2.0):
+        self.pipeline = pipeline
+        self.name = name
+        self.fn = fn
+        self.input_queue = input_queue
+        self.output_queues = list(output_queues)
+        self.poll_timeout = poll_timeout
+        self.window = window
+        self.thread = None
+        self.processed_count = 0
+        self.error_count = 0
+        self.last_latency = None
+        self._completions = deque()
+        self._lock = threading.Lock()
+        self.latency_histogram = histogram("frame_stage_seconds", stage=name)
+        self.error_counter = counter("frame_stage_errors_total", stage=name)
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.pipeline.running:
+            if self.input_queue is not None:
+                item = self.input_queue.get(timeout=self.poll_timeout)
+                if item is None:
+                    continue
+                args = (item,)
+            else:
+                args = ()
+
+            started = time.perf_counter()
+            try:
+                output = self.fn(*args)
+            except StopPipeline as e:
+                self.pipeline.stop_requested(f"{self.name}: {e}")
+                return
+            except Exception as e:
+                self.error_count += 1
+                self.error_counter.inc()
+                print(f"✗ Lỗi trong stage '{self.name}': {e}")
+                continue
+            finished = time.perf_counter()
+            self._record(finished, finished - started)
+
+            if output is not None:
+                for queue in self.output_queues:
+                    queue.put(output)
+
+    def _record(self, finished, latency):
+        self.latency_histogram.observe(latency)
+        with self._lock:
+            self.processed_count += 1
+            self.last_latency = latency
+            self._completions.append(finished)
+            while self._completions and finished - self._completions[0] > self.window:
+                self._completions.popleft()
+
+    def throughput(self):
+        """Items per second over the last `window` seconds."""
+        with self._lock:
+            if len(self._completions) < 2:
+                return 0.0
+            span = self._completions[-1] - self._completions[0]
+            return (len(self._completions) - 1) / span if span > 0 else 0.0
+
+    def stats(self):
+        return {
+            "fps": self.throughput(),
+            "processed": self.processed_count,
+            "errors": self.error_count,
+            "last_latency": self.last_latency,
+            "input_dropped": self.input_queue.dropped_count if self.input_queue else 0,
+        }
+
+class Pipeline:
+    """Owns a set of stages and the queues between them."""
+
+    def __init__(self):
+        self.stages = []
+        self.queues = []
+        self._stop_event = threading.Event()
+        self.stop_reason = None
+
+    @property
+    def running(self):
+        return not self._stop_event.is_set()
+
+    def add_queue(self, maxsize=1, drop_policy=DROP_OLDEST, on_drop=None):
+        queue = LatestValueQueue(maxsize, drop_policy, on_drop)
+        self.queues.append(queue)
+        return queue
+
+    def add_stage(self, name, fn, input_queue=None, output_queues=(), **kwargs):
+        stage = PipelineStage(self, name, fn, input_queue, output_queues, **kwargs)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        self._stop_event.clear()
+        for stage in self.stages:
+            stage.start()
+
+    def stop_requested(self, reason):
+        if self.stop_reason is None:
+            self.stop_reason = reason
+        self._stop_event.set()
+        for queue in self.queues:
+            queue.close()
+
+    def stop(self, timeout=2):
+        self.stop_requested("stopped")
+        for stage in self.stages:
+            if stage.thread and stage.thread.is_alive() and stage.thread is not threading.current_thread():
+                stage.thread.join(timeout=timeout)
+
+    def stats(self):
+        return {stage.name: stage.stats() for stage in self.stages}
@@ -0,0 +1,343 @@
+import itertools
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from core.face_tracking import FaceTracker
+
+MAX_FRAME_BYTES = 1920 * 1080 * 3
+RING_SLOTS = 4
+CALL_TIMEOUT = 10
+RESTART_BACKOFF = 1.0  # Giây chờ trước khi khởi động lại worker bị crash (tăng dần)
+MAX_RESTART_BACKOFF = 30.0
+# Số lần liên tiếp worker chết trước khi báo "ready" (không tải được mô hình) thì bỏ cuộc
+MAX_STARTUP_FAILURES = 3
+
+# --- Phía tiến trình worker ---
+
+def _make_verify_handler(options):
+    from core.face_auth import verify_face
+    def handle(frame, kwargs):
+        return verify_face(frame, kwargs.pop("reference_path"), **kwargs)
+    return handle
+
+def _make_detect_handler(options):
+    from core.detector_backends import create_detector
+    detector = create_detector(options.get("backend", "mediapipe"), **options.get("config", {}))
+    if detector is None or not detector.available:
+        raise RuntimeError("Không thể tải detector trong worker")
+    def handle(frame, kwargs):
+        return detector.detect(frame)
+    return handle
+
+def _make_face_handler(options):
+    tracker = FaceTracker()
+    def handle(frame, kwargs):
+        _, gaze, pose = tracker.process_frame(frame, draw=False)
+        return {
+            "gaze": gaze, "head_pose": pose,
+            "landmarks": tracker.last_face_landmarks,
+            "bbox": tracker.last_face_bbox, "count": tracker.last_face_count,
+        }
+    return handle
+
+WORKER_TASKS = {
+    "verify": _make_verify_handler,
+    "detect": _make_detect_handler,
+    "face": _make_face_handler,
+}
+
+def _worker_main(make_handler, options, shm_name, slot_size, requests, results):
+    # Worker (spawn) dùng chung resource_tracker với tiến trình cha, nên chỉ cha unlink vùng nhớ
+    shm = shared_memory.SharedMemory(name=shm_name)
+    handle = make_handler(options)
+    results.put(("ready", None, None, None))
+    try:
+        while True:
+            request = requests.get()
+            if request is None:
+                break
+            request_id, slot, shape, dtype, kwargs = request
+            frame = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_size)
+            try:
+                result = handle(frame, kwargs)
+                results.put((request_id, slot, True, result))
+            except Exception as e:
+                results.put((request_id, slot, False, str(e)))
+            finally:
+                del frame
+    finally:
+        shm.close()
+
+# --- Phía tiến trình chính ---
+
+class SharedFrameRing:
+    """
+    Fixed set of frame slots in one shared-memory block.
+
+    The producer copies a frame into a free slot and sends only the slot
+    index and shape to the worker, so no image is ever pickled. A slot
+    stays owned by the worker until its result comes back.
+    """
+
+    def __init__(self, slots=RING_SLOTS, slot_size=MAX_FRAME_BYTES):
+        self.slots = slots
+        self.slot_size = slot_size
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_size)
+        self._free = list(range(slots))
+        self._lock = threading.Lock()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """Copies `frame` into a free slot and returns the slot index, or None if all are busy."""
+        if frame.nbytes > self.slot_size:
+            raise ValueError(f"Frame {frame.shape} lớn hơn slot ({self.slot_size} bytes)")
+        with self._lock:
+            if not self._free:
+                return None
+            slot = self._free.pop()
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.shm.buf, offset=slot * self.slot_size)
+        view[...] = frame
+        del view
+        return slot
+
+    def free(self, slot):
+        with self._lock:
+            if slot not in self._free:
+                self._free.append(slot)
+
+    def reset(self):
+        with self._lock:
+            self._free = list(range(self.slots))
+
+    def close(self):
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class InferenceProcess:
+    """
+    Runs one heavy model (WORKER_TASKS) in a dedicated process.
+
+    Frames travel through a SharedFrameRing; requests and results are small
+    tuples over multiprocessing queues. A supervisor thread restarts the
+    process with exponential backoff if it dies, failing only the requests
+    that were in flight, so a TensorFlow segfault no longer takes down the
+    monitoring session. A worker that dies MAX_STARTUP_FAILURES times in a
+    row before becoming ready (e.g. its model cannot be loaded) is not
+    restarted again and reports available = False.
+    """
+
+    def __init__(self, task, options=None, slots=RING_SLOTS, slot_size=MAX_FRAME_BYTES):
+        if task not in WORKER_TASKS:
+            raise ValueError(f"Unknown worker task: {task}")
+        self.task = task
+        self.options = options or {}
+        self.ring = SharedFrameRing(slots, slot_size)
+        self._ctx = mp.get_context("spawn")
+        self.process = None
+        self.requests = None
+        self.results = None
+        self.ready = threading.Event()
+        self.running = False
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._supervisor = None
+        self.restart_count = 0
+        self.startup_failures = 0
+        self.failed = False
+        self.dropped_count = 0
+        self.completed_count = 0
+
+    @property
+    def available(self):
+        return not self.failed
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self._spawn()
+        self._supervisor = threading.Thread(target=self._supervise, name=f"worker-{self.task}", daemon=True)
+        self._supervisor.start()
+
+    def _spawn(self):
+        self.ready.clear()
+        self.requests = self._ctx.Queue()
+        self.results = self._ctx.Queue()
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(WORKER_TASKS[self.task], self.options, self.ring.name, self.ring.slot_size, self.requests, self.results),
+            daemon=True)
+        self.process.start()
+
+    def stop(self, timeout=2):
+        self.running = False
+        if self.requests is not None:
+            try:
+                self.requests.put(None)
+            except Exception:
+                pass
+        if self.process is not None:
+            self.process.join(timeout=timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+        if self._supervisor and self._supervisor.is_alive():
+            self._supervisor.join(timeout=timeout)
+        self._fail_pending("worker stopped")
+        self.ring.close()
+
+    def submit(self, frame, **kwargs):
+        """
+        Returns a Future for the result, or None if the frame was dropped
+        because the worker is still loading its model or every slot is busy.
+        """
+        if not self.running or not self.ready.is_set():
+            self.dropped_count += 1
+            return None
+        slot = self.ring.write(np.ascontiguousarray(frame))
+        if slot is None:
+            self.dropped_count += 1
+            return None
+        future = Future()
+        request_id = next(self._ids)
+        with self._lock:
+            self._pending[request_id] = (slot, future)
+        self.requests.put((request_id, slot, frame.shape, frame.dtype.str, kwargs))
+        return future
+
+    def call(self, frame, timeout=CALL_TIMEOUT, default=None, **kwargs):
+        """Synchronous submit(); returns `default` if the frame was dropped, failed or timed out."""
+        future = self.submit(frame, **kwargs)
+        if future is None:
+            return default
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            print(f"✗ Worker '{self.task}' lỗi: {e}")
+            return default
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for slot, future in pending.values():
+            self.ring.free(slot)
+            if not future.done():
+                future.set_exception(RuntimeError(reason))
+
+    def _supervise(self):
+        backoff = RESTART_BACKOFF
+        while self.running:
+            try:
+                request_id, slot, ok, result = self.results.get(timeout=0.5)
+            except queue.Empty:
+                if self.running and not self.process.is_alive():
+                    self._fail_pending("worker crashed")
+                    self.ring.reset()
+                    if not self.ready.is_set():
+                        self.startup_failures += 1
+                        if self.startup_failures >= MAX_STARTUP_FAILURES:
+                            print(f"✗ Worker '{self.task}' không khởi động được sau {self.startup_failures} lần (exit code {self.process.exitcode}), ngừng khởi động lại.")
+                            self.failed = True
+                            return
+                    print(f"✗ Worker '{self.task}' đã dừng bất thường (exit code {self.process.exitcode}), khởi động lại sau {backoff:.0f}s...")
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_RESTART_BACKOFF)
+                    if self.running:
+                        self.restart_count += 1
+                        self._spawn()
+                continue
+            except (EOFError, OSError):
+                continue
+
+            if request_id == "ready":
+                self.ready.set()
+                self.startup_failures = 0
+                backoff = RESTART_BACKOFF
+                continue
+            with self._lock:
+                entry = self._pending.pop(request_id, None)
+            self.ring.free(slot)
+            if entry is None:
+                continue
+            self.completed_count += 1
+            future = entry[1]
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(RuntimeError(result))
+
+    def stats(self):
+        with self._lock:
+            in_flight = len(self._pending)
+        return {
+            "alive": bool(self.process and self.process.is_alive()),
+            "failed": self.failed,
+            "restarts": self.restart_count,
+            "completed": self.completed_count,
+            "dropped": self.dropped_count,
+            "in_flight": in_flight,
+        }
+
+class ProcessVerifier:
+    """verify_face-compatible callable backed by an InferenceProcess("verify")."""
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    def __call__(self, frame, reference_path, **kwargs):
+        return self.worker.call(frame, reference_path=reference_path, **kwargs)
+
+class ProcessDetector:
+    """DetectorBackend-compatible wrapper around an InferenceProcess("detect")."""
+
+    name = "process_worker"
+
+    def __init__(self, worker):
+        self.worker = worker
+
+    @property
+    def available(self):
+        return self.worker.available
+
+    def detect(self, frame, context=None):
+        return self.worker.call(frame, default=[])
+
+    def close(self):
+        self.worker.stop()
+
+class ProcessFaceTracker(FaceTracker):
+    """
+    FaceTracker whose face mesh runs in an InferenceProcess("face").
+    Drawing and aligned cropping still happen locally from the returned
+    landmarks, so it is a drop-in replacement in monitoring_loop.
+    """
+
+    def __init__(self, worker):
+        self.worker = worker
+        super().__init__()
+
+    def _create_face_mesh(self, max_num_faces):
+        return None
+
+    def process_frame(self, frame, context=None, draw=True):
+        result = self.worker.call(frame)
+        if result is None:
+            result = {"gaze": "UNKNOWN", "head_pose": "UNKNOWN", "landmarks": None, "bbox": None, "count": 0}
+        self.last_face_landmarks = result["landmarks"]
+        self.last_face_bbox = result["bbox"]
+        self.last_face_count = result["count"]
+        if draw and self.last_face_landmarks is not None:
+            self.draw_landmarks(frame, self.last_face_landmarks)
+        return frame, result["gaze"], result["head_pose"]
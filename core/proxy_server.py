@@ -1,14 +1,24 @@
-from proxy.http.proxy import HttpProxyPlugin
+from proxy.http.proxy import HttpProxyBasePlugin
+from proxy.http.exception import HttpRequestRejected
 from proxy.http.parser import HttpParser
 from proxy import main as proxy_main
 import sys
 import os
+import socket
 import threading
 
+from core.metrics import counter
+
 WHITELIST_PATH = "config/whitelist.txt"
 WHITELIST = []
 proxy_thread = None
 proxy_running_flag = threading.Event()
+# proxy.py chạy plugin trong các tiến trình acceptor riêng, nên quyết định allow/deny được gửi
+# về tiến trình chính qua UDP loopback; cổng được truyền cho tiến trình con qua biến môi trường
+METRICS_PORT_ENV = "ALT_PROXY_METRICS_PORT"
+_metrics_socket = None
+_metrics_pid = None
+_report_socket = None
 
 def load_proxy_whitelist():
     global WHITELIST
@@ -23,7 +33,7 @@ def load_proxy_whitelist():
         print(f"✗ Lỗi khi tải Proxy Whitelist: {e}. Tất cả HTTP/HTTPS sẽ bị chặn.")
         WHITELIST = []
 
-class WhitelistPlugin(HttpProxyPlugin):
+class WhitelistPlugin(HttpProxyBasePlugin):
     def before_upstream_connection(self, request: HttpParser):
         host = request.host.decode("utf-8").lower() if request.host else ""
         
@@ -33,11 +43,52 @@ class WhitelistPlugin(HttpProxyPlugin):
                 is_whitelisted = True
                 break
 
+        _report_decision("allow" if is_whitelisted else "deny")
         if not is_whitelisted:
             print(f"🚫 Chặn truy cập HTTP/HTTPS tới: {host} (không có trong whitelist)")
-            raise Exception(f"Blocked by whitelist: {host}")
+            raise HttpRequestRejected(status_code=403, reason=b"Blocked by whitelist")
         return request
 
+def _report_decision(decision):
+    """Counts one request decision in the main process' metrics registry."""
+    global _report_socket
+    port = os.environ.get(METRICS_PORT_ENV)
+    if not port or os.getpid() == _metrics_pid:
+        # Đang ở chính tiến trình chính (hoặc không có listener): đếm trực tiếp
+        counter("proxy_requests_total", decision=decision).inc()
+        return
+    try:
+        if _report_socket is None:
+            _report_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _report_socket.sendto(decision.encode("ascii"), ("127.0.0.1", int(port)))
+    except OSError:
+        pass
+
+def _metrics_listener(sock):
+    while True:
+        try:
+            data, _ = sock.recvfrom(64)
+        except OSError:
+            return
+        decision = data.decode("ascii", "replace")
+        if decision in ("allow", "deny"):
+            counter("proxy_requests_total", decision=decision).inc()
+
+def _start_metrics_listener():
+    global _metrics_socket, _metrics_pid
+    if _metrics_socket is not None:
+        return
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+    except OSError as e:
+        print(f"✗ Không thể mở cổng nhận số liệu proxy: {e}")
+        return
+    _metrics_socket, _metrics_pid = sock, os.getpid()
+    # Phải đặt trước khi proxy.py tạo tiến trình acceptor để chúng thừa hưởng biến này
+    os.environ[METRICS_PORT_ENV] = str(sock.getsockname()[1])
+    threading.Thread(target=_metrics_listener, args=(sock,), name="proxy-metrics", daemon=True).start()
+
 def _run_proxy_main():
     original_argv = sys.argv
     try:
@@ -62,6 +113,7 @@ def start_proxy():
     global proxy_thread
     if not proxy_running_flag.is_set():
         load_proxy_whitelist()
+        _start_metrics_listener()
         proxy_thread = threading.Thread(target=_run_proxy_main, daemon=True)
         proxy_thread.start()
         proxy_running_flag.wait(timeout=5)
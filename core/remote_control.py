@@ -0,0 +1,87 @@
+import threading
+
+from core.firebase_utils import watch_user_doc, get_user_fields
+
+POLL_INTERVAL = 5  # Chỉ dùng khi không đăng ký được snapshot listener
+
+class RemoteControl:
+    """
+    Remote commands for one monitoring session, pushed through a Firestore
+    snapshot listener on the student's document.
+
+    Commands are document fields: on(field, handler) calls handler(value)
+    from the listener thread whenever the field's value changes (including
+    the first snapshot). `monitoringEnabled: false` is built in and sets
+    stop_event, which the monitoring loop can check at no cost. If the
+    listener cannot be registered, the document is polled every
+    POLL_INTERVAL seconds on a background thread instead.
+    """
+
+    def __init__(self, examId, studentId):
+        self.examId = examId
+        self.studentId = studentId
+        self.stop_event = threading.Event()
+        self.stop_reason = None
+        self.handlers = {}
+        self._values = {}
+        self._lock = threading.Lock()
+        self._watch = None
+        self._poll_stop = threading.Event()
+        self._poll_thread = None
+        self.on("monitoringEnabled", self._on_monitoring_enabled)
+
+    def on(self, field, handler):
+        """Registers handler(value) for changes of `field` (e.g. "pause", "reverify")."""
+        self.handlers.setdefault(field, []).append(handler)
+
+    def start(self):
+        try:
+            self._watch = watch_user_doc(self.examId, self.studentId, self._on_snapshot)
+            print("✓ Đã đăng ký nhận lệnh điều khiển từ xa.")
+        except Exception as e:
+            print(f"✗ Không thể đăng ký snapshot listener ({e}), chuyển sang hỏi định kỳ {POLL_INTERVAL}s.")
+            self._poll_thread = threading.Thread(target=self._poll_loop, name="remote-control-poll", daemon=True)
+            self._poll_thread.start()
+
+    def stop(self):
+        self._poll_stop.set()
+        if self._watch is not None:
+            try:
+                self._watch.unsubscribe()
+            except Exception as e:
+                print(f"✗ Lỗi khi hủy snapshot listener: {e}")
+            self._watch = None
+
+    def _on_snapshot(self, doc_snapshots, changes, read_time):
+        for doc in doc_snapshots:
+            if doc.exists:
+                self._apply(doc.to_dict() or {})
+
+    def _poll_loop(self):
+        while not self._poll_stop.wait(POLL_INTERVAL):
+            try:
+                fields = get_user_fields(self.examId, self.studentId)
+                if fields is not None:
+                    self._apply(fields)
+            except Exception as e:
+                print(f"✗ Lỗi khi đọc lệnh điều khiển từ xa: {e}")
+
+    def _apply(self, data):
+        for field, handlers in self.handlers.items():
+            if field not in data:
+                continue
+            value = data[field]
+            with self._lock:
+                if field in self._values and self._values[field] == value:
+                    continue
+                self._values[field] = value
+            for handler in handlers:
+                try:
+                    handler(value)
+                except Exception as e:
+                    print(f"✗ Lỗi khi xử lý lệnh từ xa '{field}': {e}")
+
+    def _on_monitoring_enabled(self, enabled):
+        if not enabled:
+            self.stop_reason = "monitoringEnabled=false"
+            self.stop_event.set()
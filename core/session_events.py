@@ -0,0 +1,58 @@
+from core.firebase_utils import update_user_field, server_timestamp
+
+# Số lần phát hiện điện thoại (theo episode) để đánh dấu nghi ngờ / gian lận
+SUSPICION_THRESHOLD = 3
+DETECTION_THRESHOLD = 7
+
+class SessionReporter:
+    """
+    Turns the monitoring events of one student into document updates.
+
+    monitoring_loop and the load simulator both report through this class,
+    so the simulated write pattern is exactly the one the app produces.
+    update_fn(examId, studentId, fields) and timestamp_fn() default to the
+    shared background writer and the configured sink's server timestamp.
+    """
+
+    def __init__(self, examId, studentId, update_fn=update_user_field, timestamp_fn=server_timestamp):
+        self.examId = examId
+        self.studentId = studentId
+        self.update_fn = update_fn
+        self.timestamp_fn = timestamp_fn
+        self.phone_detection_count = 0
+
+    def _update(self, fields):
+        self.update_fn(self.examId, self.studentId, fields)
+
+    def verification_result(self, verified):
+        if verified is True:
+            self._update({"faceVerified": True, "lastVerifiedTime": self.timestamp_fn()})
+        elif verified is False:
+            self._update({"faceVerified": False, "lastFailedTime": self.timestamp_fn()})
+
+    def phone_detected(self):
+        """Counts a new phone episode; returns the running count."""
+        self.phone_detection_count += 1
+        if self.phone_detection_count == SUSPICION_THRESHOLD:
+            self._update({"cheatSuspicion": "true", "suspicionTime": self.timestamp_fn()})
+        if self.phone_detection_count == DETECTION_THRESHOLD:
+            self._update({"cheatDetected": "true", "detectionTime": self.timestamp_fn()})
+        return self.phone_detection_count
+
+    def speech_detected(self, text):
+        self._update({"speechDetected": True, "lastSpeechTime": self.timestamp_fn(), "lastSpeechText": text})
+
+    def keyword_detected(self, keyword, text):
+        self._update({
+            "forbiddenKeywordDetected": True,
+            "lastKeywordTime": self.timestamp_fn(),
+            "lastKeyword": keyword,
+            "fullSpeechWithKeyword": text,
+        })
+
+    def audio_event(self, kind):
+        """Whispering / second voice reported by AudioAnalytics."""
+        self._update({"audioEventDetected": True, "lastAudioEvent": kind, "lastAudioEventTime": self.timestamp_fn()})
+
+    def evidence_saved(self, event, path):
+        self._update({"lastEvidenceClip": path, "lastEvidenceEvent": event, "lastEvidenceTime": self.timestamp_fn()})
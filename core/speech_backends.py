@@ -0,0 +1,215 @@
+import json
+import os
+
+import numpy as np
+
+RECOGNIZER_BACKENDS = {}
+
+# Thứ tự thử khi chọn "auto": ưu tiên nhận dạng trên máy, không phụ thuộc mạng (bị whitelist DNS/proxy chặn)
+AUTO_ORDER = ("vosk", "google")
+VOSK_MODEL_PATH = "config/vosk-model-small-vn-0.4"
+
+class RecognizerError(Exception):
+    """Recognition failed for a reason worth retrying (network, engine error)."""
+
+def register_backend(name):
+    def decorator(cls):
+        cls.name = name
+        RECOGNIZER_BACKENDS[name] = cls
+        return cls
+    return decorator
+
+class RecognitionStream:
+    """
+    One utterance being recognized.
+
+    accept(samples) feeds int16 audio and returns the current hypothesis when
+    it changed (None otherwise); finish() returns the final text ("" when
+    nothing was recognized). The default implementation buffers the audio
+    and calls backend.recognize() once in finish().
+    """
+
+    def __init__(self, backend, rate):
+        self.backend = backend
+        self.rate = rate
+        self._chunks = []
+
+    def accept(self, samples):
+        self._chunks.append(samples)
+        return None
+
+    def finish(self):
+        samples = np.concatenate(self._chunks) if self._chunks else np.zeros(0, dtype=np.int16)
+        return self.backend.recognize(samples, self.rate)
+
+class RecognizerBackend:
+    """
+    Common interface of speech recognizer backends.
+
+    recognize(samples, rate) transcribes a complete int16 utterance and
+    open_stream(rate) starts incremental recognition. `streaming` backends
+    produce partial hypotheses while audio arrives; `network` ones need
+    internet access. `available` is False when the engine or model could
+    not be loaded.
+    """
+
+    name = None
+    streaming = False
+    network = False
+
+    def __init__(self, language="vi-VN", **options):
+        self.language = language
+        self.options = options
+        self.available = False
+
+    def recognize(self, samples, rate):
+        stream = self.open_stream(rate)
+        stream.accept(samples)
+        return stream.finish()
+
+    def open_stream(self, rate):
+        return RecognitionStream(self, rate)
+
+    def close(self):
+        pass
+
+@register_backend("google")
+class GoogleBackend(RecognizerBackend):
+    """Google Web Speech API through SpeechRecognition (one HTTP request per utterance)."""
+
+    network = True
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        import speech_recognition as sr
+        self._sr = sr
+        self.recognizer = sr.Recognizer()
+        self.available = True
+
+    def recognize(self, samples, rate):
+        audio_data = self._sr.AudioData(samples.tobytes(), rate, 2) # 2 bytes per sample (paInt16)
+        try:
+            return self.recognizer.recognize_google(audio_data, language=self.language)
+        except self._sr.UnknownValueError:
+            return ""
+        except self._sr.RequestError as e:
+            # Lỗi API của Google Speech Recognition (ví dụ: không có mạng)
+            raise RecognizerError(e) from e
+
+class VoskStream(RecognitionStream):
+    def __init__(self, backend, rate):
+        super().__init__(backend, rate)
+        self.recognizer = backend._vosk.KaldiRecognizer(backend.model, rate)
+        self._final_parts = []
+        self._hypothesis = ""
+
+    def accept(self, samples):
+        try:
+            if self.recognizer.AcceptWaveform(samples.tobytes()):
+                # Vosk tự chốt một đoạn khi gặp khoảng lặng ngắn bên trong câu
+                self._final_parts.append(json.loads(self.recognizer.Result()).get("text", ""))
+                partial = ""
+            else:
+                partial = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        except Exception as e:
+            raise RecognizerError(e) from e
+        hypothesis = " ".join(part for part in self._final_parts + [partial] if part)
+        if hypothesis == self._hypothesis:
+            return None
+        self._hypothesis = hypothesis
+        return hypothesis
+
+    def finish(self):
+        try:
+            self._final_parts.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        except Exception as e:
+            raise RecognizerError(e) from e
+        return " ".join(part for part in self._final_parts if part)
+
+@register_backend("vosk")
+class VoskBackend(RecognizerBackend):
+    """Offline Kaldi recognizer (Vosk) on CPU with partial hypotheses; the model is loaded once."""
+
+    streaming = True
+
+    def __init__(self, model_path=VOSK_MODEL_PATH, **kwargs):
+        super().__init__(**kwargs)
+        if not os.path.isdir(model_path):
+            print(f"✗ Vosk: không tìm thấy mô hình tại {model_path}")
+            return
+        import vosk
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        self.model = vosk.Model(model_path)
+        self.available = True
+
+    def open_stream(self, rate):
+        return VoskStream(self, rate)
+
+class MockStream(RecognitionStream):
+    def __init__(self, backend, rate, transcript):
+        super().__init__(backend, rate)
+        self.words = transcript.split()
+        self.samples = 0
+        self._emitted = 0
+
+    def accept(self, samples):
+        self.samples += len(samples)
+        if not self.backend.streaming:
+            return None
+        count = min(len(self.words), int(self.samples / self.rate / self.backend.word_seconds))
+        if count <= self._emitted:
+            return None
+        self._emitted = count
+        return " ".join(self.words[:count])
+
+    def finish(self):
+        return " ".join(self.words)
+
+@register_backend("mock")
+class MockBackend(RecognizerBackend):
+    """
+    Deterministic recognizer for tests and simulations: returns `transcripts`
+    in order (cycling), revealing one word per `word_seconds` of audio as
+    partial hypotheses. `fail_every` makes every n-th utterance raise
+    RecognizerError.
+    """
+
+    def __init__(self, transcripts=("xin chào",), word_seconds=0.3, streaming=True, fail_every=0, **kwargs):
+        super().__init__(**kwargs)
+        self.transcripts = list(transcripts)
+        self.word_seconds = word_seconds
+        self.streaming = streaming
+        self.fail_every = fail_every
+        self.utterance_count = 0
+        self.available = True
+
+    def open_stream(self, rate):
+        self.utterance_count += 1
+        if self.fail_every and self.utterance_count % self.fail_every == 0:
+            raise RecognizerError("Simulated recognizer failure")
+        transcript = self.transcripts[(self.utterance_count - 1) % len(self.transcripts)]
+        return MockStream(self, rate, transcript)
+
+def create_recognizer(name, **config):
+    """
+    Instantiates a registered backend ("auto" tries AUTO_ORDER). `config`
+    holds a "common" dict (language) plus optional per-backend dicts keyed
+    by name. Returns None when nothing could be loaded.
+    """
+    if name == "auto":
+        for candidate in AUTO_ORDER:
+            backend = create_recognizer(candidate, **config)
+            if backend is not None and backend.available:
+                print(f"✓ Chọn backend nhận dạng giọng nói: {candidate}")
+                return backend
+        return None
+    if name not in RECOGNIZER_BACKENDS:
+        raise ValueError(f"Unknown recognizer backend: {name} (có: {', '.join(RECOGNIZER_BACKENDS)})")
+    backend_cls = RECOGNIZER_BACKENDS[name]
+    options = {**config.get("common", {}), **config.get(name, {})}
+    try:
+        return backend_cls(**options)
+    except Exception as e:
+        print(f"✗ Không thể khởi tạo backend nhận dạng '{name}': {e}")
+        return None
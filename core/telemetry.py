@@ -0,0 +1,148 @@
+import json
+import os
+import random
+import threading
+import time
+
+from core.metrics import counter, histogram
+
+class _ServerTimestamp:
+    """Stand-in for firestore.SERVER_TIMESTAMP in sinks that do not talk to Firestore."""
+
+    def __repr__(self):
+        return "SERVER_TIMESTAMP"
+
+SERVER_TIMESTAMP = _ServerTimestamp()
+
+class TelemetrySink:
+    """
+    Destination of per-student document updates.
+
+    commit(updates) applies {(examId, studentId): fields} as one batch,
+    read(key) returns the current fields of a document (or None) and
+    watch(key, callback) registers a Firestore-style snapshot listener.
+    server_timestamp() is the sentinel callers put in fields to have the
+    sink fill in its own time; timestamp(epoch) is the concrete value the
+    sink stores for a given time, used when replaying journaled events.
+    """
+
+    name = None
+
+    def server_timestamp(self):
+        return SERVER_TIMESTAMP
+
+    def is_transform(self, value):
+        return value is self.server_timestamp()
+
+    def timestamp(self, epoch):
+        return epoch
+
+    def commit(self, updates):
+        raise NotImplementedError
+
+    def read(self, key):
+        raise NotImplementedError
+
+    def watch(self, key, callback):
+        raise NotImplementedError(f"Sink '{self.name}' không hỗ trợ snapshot listener")
+
+    def close(self):
+        pass
+
+    def _observe_commit(self, updates, started):
+        histogram("telemetry_commit_seconds", sink=self.name).observe(time.perf_counter() - started)
+        counter("telemetry_commits_total", sink=self.name).inc()
+        counter("telemetry_doc_writes_total", sink=self.name).inc(len(updates))
+
+class InMemorySink(TelemetrySink):
+    """
+    Keeps documents in a dict. `latency` (seconds, with +/- `jitter`) and
+    `failure_rate` simulate a remote backend for load tests.
+    """
+
+    name = "memory"
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.docs = {}
+        self.doc_writes = {}
+        self.commit_count = 0
+        self.failure_count = 0
+        self._lock = threading.Lock()
+
+    def commit(self, updates):
+        started = time.perf_counter()
+        delay = self.latency + random.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if self.failure_rate and random.random() < self.failure_rate:
+            with self._lock:
+                self.failure_count += 1
+            raise ConnectionError("Simulated backend failure")
+        now = time.time()
+        with self._lock:
+            for key, fields in updates.items():
+                doc = self.docs.setdefault(key, {})
+                for name, value in fields.items():
+                    _set_field(doc, name, now if self.is_transform(value) else value)
+                self.doc_writes[key] = self.doc_writes.get(key, 0) + 1
+            self.commit_count += 1
+        self._observe_commit(updates, started)
+
+    def read(self, key):
+        with self._lock:
+            doc = self.docs.get(key)
+            return None if doc is None else dict(doc)
+
+class FileSink(TelemetrySink):
+    """
+    Appends every committed batch as a JSON line to `path` (one object per
+    document update) and keeps the merged documents in memory for read().
+    """
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self.docs = {}
+        self.doc_writes = {}
+        self.commit_count = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def commit(self, updates):
+        started = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            for (examId, studentId), fields in updates.items():
+                resolved = {name: now if self.is_transform(value) else value for name, value in fields.items()}
+                doc = self.docs.setdefault((examId, studentId), {})
+                for name, value in resolved.items():
+                    _set_field(doc, name, value)
+                self.doc_writes[(examId, studentId)] = self.doc_writes.get((examId, studentId), 0) + 1
+                self._file.write(json.dumps({"time": now, "exam": examId, "student": studentId,
+                                             "fields": resolved}, ensure_ascii=False, default=str) + "\n")
+            self._file.flush()
+            self.commit_count += 1
+        self._observe_commit(updates, started)
+
+    def read(self, key):
+        with self._lock:
+            doc = self.docs.get(key)
+            return None if doc is None else dict(doc)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+def _set_field(doc, name, value):
+    # Hỗ trợ đường dẫn có dấu chấm như Firestore update() ("journalSeq.<id>")
+    *parents, leaf = name.split(".")
+    for part in parents:
+        doc = doc.setdefault(part, {})
+    doc[leaf] = value
@@ -0,0 +1,199 @@
+from collections import deque
+
+import numpy as np
+
+FRAME_MS = 20
+# Ngưỡng năng lượng: cao hơn nền nhiễu ít nhất SPEECH_MARGIN_DB và trên mức tuyệt đối MIN_SPEECH_DB (dBFS)
+SPEECH_MARGIN_DB = 9.0
+MIN_SPEECH_DB = -50.0
+# Tỉ lệ đổi dấu cao + năng lượng không lớn thường là tiếng xì/quạt, không phải giọng nói
+MAX_SPEECH_ZCR = 0.35
+LOUD_MARGIN_DB = 20.0
+NOISE_ADAPT = 0.05  # Tốc độ cập nhật nền nhiễu trên các frame không có tiếng nói
+NOISE_PERCENTILE = 10  # Nền nhiễu ban đầu: phân vị thấp của năng lượng các frame đầu tiên
+# Nền nhiễu tăng dần cả khi đang "có tiếng" (minimum statistics): tiếng ù đều bắt đầu giữa chừng
+# sẽ trở thành nền nhiễu sau vài giây thay vì bị coi là giọng nói mãi mãi
+NOISE_RISE_DB_PER_S = 2.0
+DIGITAL_SILENCE_DB = -90.0  # Frame toàn số 0 (đệm, mic bị tắt) không phải nhiễu phòng, bỏ qua
+
+PRE_ROLL_MS = 300
+HANGOVER_MS = 600
+START_MS = 60  # Cần bấy nhiêu ms có tiếng liên tiếp để bắt đầu một câu
+MIN_UTTERANCE_MS = 300
+MAX_UTTERANCE_MS = 15000
+
+class VoiceActivityDetector:
+    """
+    Energy + zero-crossing-rate VAD on int16 mono audio.
+
+    classify(samples) splits the samples into FRAME_MS frames and returns a
+    boolean array (one entry per complete frame). Energy and zero-crossing
+    rate are computed for all frames at once with NumPy; the decision and
+    noise-floor update then run as a short per-frame loop over plain
+    floats, since each frame's threshold depends on the floor left by the
+    previous one. The noise floor starts at a low percentile of the first
+    frames, drops immediately to any quieter frame, adapts on unvoiced
+    frames and rises by NOISE_RISE_DB_PER_S even through voiced runs
+    (minimum statistics), so the detector follows the room - including a
+    hum that starts mid-session - instead of needing a fixed threshold.
+    Digital silence is ignored for the floor.
+    """
+
+    def __init__(self, rate, frame_ms=FRAME_MS, margin_db=SPEECH_MARGIN_DB, min_db=MIN_SPEECH_DB,
+                 max_zcr=MAX_SPEECH_ZCR):
+        self.rate = rate
+        self.frame_size = int(rate * frame_ms / 1000)
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.max_zcr = max_zcr
+        self.noise_rise_db = NOISE_RISE_DB_PER_S * frame_ms / 1000
+        self.noise_db = None
+        self.last_energy_db = None
+        self.last_zcr = None
+
+    def frame_features(self, frames):
+        """(energy dBFS, zero-crossing rate) per row of an (n, frame_size) int16 array."""
+        samples = frames.astype(np.float32) / 32768.0
+        rms = np.sqrt(np.mean(samples * samples, axis=1))
+        energy_db = 20.0 * np.log10(np.maximum(rms, 1e-6))
+        signs = np.signbit(frames)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frames.shape[1] - 1)
+        return energy_db, zcr
+
+    def classify(self, samples):
+        count = len(samples) // self.frame_size
+        if not count:
+            return np.zeros(0, dtype=bool)
+        frames = samples[:count * self.frame_size].reshape(count, self.frame_size)
+        energy_db, zcr = self.frame_features(frames)
+        self.last_energy_db, self.last_zcr = energy_db, zcr
+        audible = energy_db > DIGITAL_SILENCE_DB
+        if self.noise_db is None:
+            if not audible.any():
+                return np.zeros(count, dtype=bool)
+            self.noise_db = float(np.percentile(energy_db[audible], NOISE_PERCENTILE))
+
+        # Nền nhiễu là bộ lọc đệ quy (frame sau phụ thuộc frame trước) nên không vectơ hóa được;
+        # lặp trên float Python thay vì phần tử NumPy để mỗi frame chỉ tốn vài phép so sánh
+        voiced = [False] * count
+        noise_db = self.noise_db
+        for i, (energy, rate, is_audible) in enumerate(zip(energy_db.tolist(), zcr.tolist(), audible.tolist())):
+            if not is_audible:
+                continue
+            threshold = max(noise_db + self.margin_db, self.min_db)
+            loud = energy > noise_db + LOUD_MARGIN_DB
+            voiced[i] = energy > threshold and (rate < self.max_zcr or loud)
+            if energy < noise_db:
+                noise_db = energy
+            elif voiced[i]:
+                noise_db += self.noise_rise_db
+            else:
+                noise_db += NOISE_ADAPT * (energy - noise_db)
+        self.noise_db = noise_db
+        return np.array(voiced, dtype=bool)
+
+class UtteranceSegmenter:
+    """
+    Groups voiced frames into utterances.
+
+    process(samples) accepts int16 chunks of any size and returns the list of
+    utterances completed by this chunk, each an int16 array that starts
+    PRE_ROLL_MS before the first voiced frame and ends after HANGOVER_MS of
+    silence. Utterances with less than MIN_UTTERANCE_MS of voiced audio are
+    discarded; long ones are cut at MAX_UTTERANCE_MS.
+    """
+
+    def __init__(self, rate, vad=None, pre_roll_ms=PRE_ROLL_MS, hangover_ms=HANGOVER_MS, start_ms=START_MS,
+                 min_utterance_ms=MIN_UTTERANCE_MS, max_utterance_ms=MAX_UTTERANCE_MS):
+        self.rate = rate
+        self.vad = vad or VoiceActivityDetector(rate)
+        frame_ms = 1000 * self.vad.frame_size / rate
+        self.pre_roll_frames = int(pre_roll_ms / frame_ms)
+        self.hangover_frames = int(hangover_ms / frame_ms)
+        self.start_frames = max(1, int(start_ms / frame_ms))
+        self.min_voiced_frames = int(min_utterance_ms / frame_ms)
+        self.max_frames = int(max_utterance_ms / frame_ms)
+        self._remainder = np.zeros(0, dtype=np.int16)
+        self._pre_roll = deque(maxlen=self.pre_roll_frames + self.start_frames)
+        self._frames = None
+        self._voiced_run = 0
+        self._voiced_total = 0
+        self._silence_run = 0
+        self._emitted = 0
+        self.frame_count = 0
+        self.voiced_count = 0
+        self.utterance_count = 0
+        self.discarded_count = 0
+
+    @property
+    def in_utterance(self):
+        return self._frames is not None
+
+    def process(self, samples):
+        return [utterance for kind, utterance in self.segment(samples) if kind == "end" and utterance is not None]
+
+    def segment(self, samples):
+        """
+        Streaming form of process(): returns [(kind, samples)] events in order.
+        "start" carries the pre-roll and first voiced frames, "audio" the
+        frames appended to the open utterance since the previous event and
+        "end" the whole utterance (None when it was too short and discarded).
+        """
+        samples = np.concatenate((self._remainder, np.asarray(samples, dtype=np.int16)))
+        size = self.vad.frame_size
+        count = len(samples) // size
+        self._remainder = samples[count * size:]
+        voiced = self.vad.classify(samples[:count * size])
+        self.frame_count += count
+        self.voiced_count += int(voiced.sum())
+
+        events = []
+        for i in range(count):
+            self._push(samples[i * size:(i + 1) * size], bool(voiced[i]), events)
+        self._flush_audio(events)
+        return events
+
+    def flush(self):
+        """Ends the current utterance (e.g. on shutdown); returns it or None."""
+        return self._finish() if self._frames is not None else None
+
+    def _push(self, frame, voiced, events):
+        if self._frames is None:
+            self._pre_roll.append(frame)
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self._frames = list(self._pre_roll)
+                self._pre_roll.clear()
+                self._voiced_total = self._voiced_run
+                self._silence_run = 0
+                self._emitted = len(self._frames)
+                events.append(("start", np.concatenate(self._frames)))
+            return
+
+        self._frames.append(frame)
+        if voiced:
+            self._voiced_total += 1
+            self._silence_run = 0
+        else:
+            self._silence_run += 1
+        if self._silence_run >= self.hangover_frames or len(self._frames) >= self.max_frames:
+            self._flush_audio(events)
+            events.append(("end", self._finish()))
+
+    def _flush_audio(self, events):
+        # Gom các frame mới của câu đang mở thành một sự kiện "audio"
+        if self._frames is not None and len(self._frames) > self._emitted:
+            events.append(("audio", np.concatenate(self._frames[self._emitted:])))
+            self._emitted = len(self._frames)
+
+    def _finish(self):
+        frames, voiced_total = self._frames, self._voiced_total
+        self._frames = None
+        self._voiced_run = 0
+        self._voiced_total = 0
+        self._silence_run = 0
+        if voiced_total < self.min_voiced_frames:
+            self.discarded_count += 1
+            return None
+        self.utterance_count += 1
+        return np.concatenate(frames)
@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import deque
+
+from core.face_auth import verify_face
+from core.metrics import counter, histogram
+
+class VerificationResult:
+    def __init__(self, verified, latency, submitted_at):
+        self.verified = verified
+        self.latency = latency
+        self.submitted_at = submitted_at
+
+class FaceVerificationWorker:
+    """
+    Runs verify_face on a background thread so the camera loop never blocks.
+
+    Only the most recent submitted frame is kept: submitting while a
+    verification is in flight replaces any pending frame, so stale frames are
+    dropped instead of queuing up behind a slow DeepFace call.
+    """
+
+    def __init__(self, reference_path, verify_fn=verify_face, max_results=16):
+        self.reference_path = reference_path
+        self.verify_fn = verify_fn
+        self.thread = None
+        self.running = False
+        self._cond = threading.Condition()
+        self._pending = None
+        self._in_flight = False
+        self._results = deque(maxlen=max_results)
+        self.submitted_count = 0
+        self.dropped_count = 0
+        self.completed_count = 0
+        self.last_latency = None
+        self._total_latency = 0.0
+        self.latency_histogram = histogram("frame_stage_seconds", stage="verification")
+        self.dropped_counter = counter("verification_dropped_total")
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._worker_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout=2):
+        with self._cond:
+            self.running = False
+            self._pending = None
+            self._cond.notify_all()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+
+    def submit(self, frame, **verify_kwargs):
+        """
+        Queues a frame for verification, replacing any frame still waiting.
+        Keyword arguments are passed on to verify_fn (e.g. aligned=True).
+        """
+        with self._cond:
+            if self._pending is not None:
+                self.dropped_count += 1
+                self.dropped_counter.inc()
+            self._pending = (frame, verify_kwargs, time.time())
+            self.submitted_count += 1
+            self._cond.notify()
+
+    def is_busy(self):
+        with self._cond:
+            return self._in_flight or self._pending is not None
+
+    def queue_depth(self):
+        """Number of frames waiting or being verified (0, 1 or 2)."""
+        with self._cond:
+            return int(self._pending is not None) + int(self._in_flight)
+
+    def get_results(self):
+        """Returns and clears the results finished since the previous call."""
+        with self._cond:
+            results = list(self._results)
+            self._results.clear()
+            return results
+
+    def average_latency(self):
+        with self._cond:
+            if not self.completed_count:
+                return None
+            return self._total_latency / self.completed_count
+
+    def stats(self):
+        with self._cond:
+            return {
+                "submitted": self.submitted_count,
+                "dropped": self.dropped_count,
+                "completed": self.completed_count,
+                "queue_depth": int(self._pending is not None) + int(self._in_flight),
+                "last_latency": self.last_latency,
+                "avg_latency": self._total_latency / self.completed_count if self.completed_count else None,
+            }
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                while self.running and self._pending is None:
+                    self._cond.wait()
+                if not self.running:
+                    return
+                frame, verify_kwargs, submitted_at = self._pending
+                self._pending = None
+                self._in_flight = True
+
+            try:
+                verified = self.verify_fn(frame, self.reference_path, **verify_kwargs)
+            except Exception as e:
+                print(f"✗ Lỗi worker xác thực khuôn mặt: {e}")
+                verified = None
+
+            latency = time.time() - submitted_at
+            self.latency_histogram.observe(latency)
+            with self._cond:
+                self._in_flight = False
+                self.completed_count += 1
+                self.last_latency = latency
+                self._total_latency += latency
+                self._results.append(VerificationResult(verified, latency, submitted_at))
@@ -0,0 +1,138 @@
+import threading
+import time
+
+import numpy as np
+
+class ModelWarmup:
+    """
+    Loads the heavy models on a background thread while the login window is
+    open, so monitoring_loop starts with everything already initialized.
+
+    Each step records its duration in `timings`. The warmed FaceTracker,
+    detector and speech recognizer are handed over with take_face_tracker()
+    / take_detector() / take_recognizer(); anything not taken is closed by
+    close().
+    """
+
+    def __init__(self, firebase=True, arcface=True, face_mesh=True, detector_backend=None,
+                 detector_config=None, select_detector=False, recognizer_backend=None, recognizer_config=None):
+        self.firebase = firebase
+        self.arcface = arcface
+        self.face_mesh = face_mesh
+        self.detector_backend = detector_backend
+        self.detector_config = detector_config or {}
+        self.select_detector = select_detector
+        self.recognizer_backend = recognizer_backend
+        self.recognizer_config = recognizer_config or {}
+        self.timings = {}
+        self.thread = None
+        self._done = threading.Event()
+        self._face_tracker_ready = threading.Event()
+        self._detector_ready = threading.Event()
+        self._recognizer_ready = threading.Event()
+        self._face_tracker = None
+        self._detector = None
+        self._recognizer = None
+        self._reference_thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+        self.thread.start()
+
+    def _step(self, name, fn):
+        started = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            print(f"✗ Warm-up '{name}' lỗi: {e}")
+            return None
+        self.timings[name] = time.perf_counter() - started
+        print(f"  ⏱ Warm-up {name}: {self.timings[name]:.2f}s")
+        return result
+
+    def _run(self):
+        try:
+            dummy = np.zeros((480, 640, 3), dtype=np.uint8)
+            if self.firebase:
+                from core.firebase_utils import get_db
+                self._step("firebase", get_db)
+            if self.face_mesh:
+                self._face_tracker = self._step("face_mesh", lambda: self._warm_face_tracker(dummy))
+            self._face_tracker_ready.set()
+            if self.detector_backend or self.select_detector:
+                self._detector = self._step("detector", lambda: self._warm_detector(dummy))
+            self._detector_ready.set()
+            if self.arcface:
+                from core.face_auth import preload_model
+                self._step("arcface", preload_model)
+            if self.recognizer_backend:
+                from core.speech_backends import create_recognizer
+                self._recognizer = self._step(
+                    "recognizer", lambda: create_recognizer(self.recognizer_backend, **self.recognizer_config))
+            self._recognizer_ready.set()
+        finally:
+            self._face_tracker_ready.set()
+            self._detector_ready.set()
+            self._recognizer_ready.set()
+            self._done.set()
+
+    def _warm_face_tracker(self, frame):
+        from core.face_tracking import FaceTracker
+        tracker = FaceTracker()
+        tracker.process_frame(frame, draw=False)
+        return tracker
+
+    def _warm_detector(self, frame):
+        from core import detector_backends
+        if self.detector_backend:
+            detector = detector_backends.create_detector(self.detector_backend, **self.detector_config)
+            if detector is not None and detector.available:
+                detector.detect(frame)
+            return detector
+        # Chưa có camera nên benchmark trên frame tổng hợp; chỉ độ trễ là quan trọng ở đây
+        detector, _ = detector_backends.select_detector([frame], self.detector_config)
+        return detector
+
+    def warm_reference(self, reference_path):
+        """Computes (or loads from cache) the reference embedding in the background."""
+        def run():
+            self.wait()
+            from core.face_auth import get_reference_embedding
+            self._step("reference_embedding", lambda: get_reference_embedding(reference_path))
+        self._reference_thread = threading.Thread(target=run, name="warmup-reference", daemon=True)
+        self._reference_thread.start()
+
+    def wait(self, timeout=None):
+        return self.thread is not None and self._done.wait(timeout)
+
+    def take_face_tracker(self, timeout=None):
+        """Waits for the face mesh step and returns the warmed FaceTracker (or None)."""
+        if self.thread is not None:
+            self._face_tracker_ready.wait(timeout)
+        tracker, self._face_tracker = self._face_tracker, None
+        return tracker
+
+    def take_detector(self, timeout=None):
+        """Waits for the detector step and returns the warmed backend (or None)."""
+        if self.thread is not None:
+            self._detector_ready.wait(timeout)
+        detector, self._detector = self._detector, None
+        return detector
+
+    def take_recognizer(self, timeout=None):
+        """Waits for the recognizer step and returns the loaded speech backend (or None)."""
+        if self.thread is not None:
+            self._recognizer_ready.wait(timeout)
+        recognizer, self._recognizer = self._recognizer, None
+        return recognizer
+
+    def close(self):
+        if self._detector is not None:
+            self._detector.close()
+            self._detector = None
+        if self._recognizer is not None:
+            self._recognizer.close()
+            self._recognizer = None
+        self._face_tracker = None
@@ -17,24 +17,40 @@ def init_yolo(weights_path, cfg_path, names_path):
         print(f"✗ YOLO load error: {e}")
         return None, [], []
 
-def detect_objects(frame, net, output_layers, classes):
-    blob = cv2.dnn.blobFromImage(frame, 1/255, (INPUT_SIZE, INPUT_SIZE), (0, 0, 0), True, crop=False)
+def class_ids_for(classes, names):
+    """Maps class names from coco.names (e.g. "cell phone") to their class IDs."""
+    wanted = {name.lower() for name in names}
+    return [i for i, name in enumerate(classes) if name.lower() in wanted]
+
+def detect_objects(frame, net, output_layers, classes, context=None, keep_class_ids=None, input_size=INPUT_SIZE):
+    if context is not None:
+        blob = context.blob(input_size, input_size)
+    else:
+        blob = cv2.dnn.blobFromImage(frame, 1/255, (input_size, input_size), (0, 0, 0), True, crop=False)
     net.setInput(blob)
     outputs = net.forward(output_layers)
 
-    boxes, confidences, class_ids = [], [], []
-    for output in outputs:
-        for detection in output:
-            scores = detection[5:]
-            class_id = np.argmax(scores)
-            confidence = scores[class_id]
-            if confidence > CONF_THRESHOLD:
-                w, h = int(detection[2] * frame.shape[1]), int(detection[3] * frame.shape[0])
-                x, y = int(detection[0] * frame.shape[1] - w / 2), int(detection[1] * frame.shape[0] - h / 2)
-                boxes.append([x, y, w, h])
-                confidences.append(float(confidence))
-                class_ids.append(class_id)
+    # Giải mã toàn bộ output trong một lần thay vì duyệt từng dòng bằng Python
+    detections = np.concatenate([output.reshape(-1, output.shape[-1]) for output in outputs])
+    scores = detections[:, 5:]
+    best_ids = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(scores)), best_ids]
+
+    mask = best_scores > CONF_THRESHOLD
+    if keep_class_ids is not None:
+        # Chỉ giữ các lớp được chọn (ví dụ "cell phone") trước khi chạy NMS
+        mask &= np.isin(best_ids, keep_class_ids)
+    detections = detections[mask]
+
+    frame_h, frame_w = frame.shape[:2]
+    w = (detections[:, 2] * frame_w).astype(np.int64)
+    h = (detections[:, 3] * frame_h).astype(np.int64)
+    x = (detections[:, 0] * frame_w - w / 2).astype(np.int64)
+    y = (detections[:, 1] * frame_h - h / 2).astype(np.int64)
+
+    boxes = np.column_stack((x, y, w, h)).tolist()
+    confidences = best_scores[mask].astype(float).tolist()
+    class_ids = best_ids[mask].tolist()
 
     indices = cv2.dnn.NMSBoxes(boxes, confidences, CONF_THRESHOLD, NMS_THRESHOLD)
     return indices, boxes, confidences, class_ids
-
@@ -1,4 +1,10 @@
-from core.main import run_app
+import sys
+import time
+
+# Mốc thời gian khởi động, đo trước khi import các module nặng
+STARTED_AT = time.perf_counter()
+
+from core.main import run_app, HEADLESS
 
 if __name__ == "__main__":
-    run_app()
+    run_app(headless="--headless" in sys.argv or HEADLESS, started_at=STARTED_AT)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Cho phép chạy `pytest` từ bất kỳ đâu mà vẫn import được package core
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
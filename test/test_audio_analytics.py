@@ -0,0 +1,79 @@
+import numpy as np
+
+from core.audio_analytics import (AudioAnalytics, EVENT_COOLDOWN, NOISE_MAX_DROP_DB, NOISE_MAX_RISE_DB,
+                                  REFERENCE_SECONDS)
+
+RATE = 16000
+
+def level(wave, db):
+    return wave / np.sqrt(np.mean(wave ** 2)) * 10 ** (db / 20)
+
+def noise(seconds, db, seed=0):
+    return level(np.random.default_rng(seed).normal(0, 1, int(seconds * RATE)), db)
+
+def voice(seconds, db, f0=140.0, tilt=1.0):
+    """Harmonic 'voice': amplitudes fall as 1/k**tilt, so tilt sets the spectral shape."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    harmonics = range(1, int(3800 / f0))
+    return level(sum(np.sin(2 * np.pi * f0 * k * t) / k ** tilt for k in harmonics), db)
+
+def whisper(seconds, db, seed=1):
+    # Nhiễu trắng lọc thông cao (vi phân): không tuần hoàn, trọng tâm phổ cao
+    return level(np.diff(np.random.default_rng(seed).normal(0, 1, int(seconds * RATE) + 1)), db)
+
+def pcm(wave):
+    return np.clip(wave * 32768, -32768, 32767).astype(np.int16)
+
+def run(analytics, wave, start=0.0):
+    """Feeds audio one second at a time with explicit timestamps."""
+    samples = pcm(wave)
+    summaries = []
+    for i in range(len(samples) // RATE):
+        summaries += analytics.process(samples[i * RATE:(i + 1) * RATE], timestamp=start + i)
+    return summaries
+
+def test_leading_digital_silence_does_not_pin_the_floor():
+    analytics = AudioAnalytics(RATE)
+    summaries = run(analytics, np.concatenate([np.zeros(2 * RATE), noise(3, -60)]))
+    assert summaries[0]["noise_db"] is None and summaries[0]["voiced_ratio"] == 0.0
+    assert abs(analytics.noise_db - (-60)) < 3
+    # Mic bị tắt giữa chừng cũng không kéo nền nhiễu xuống
+    run(analytics, np.zeros(2 * RATE), start=5)
+    assert abs(analytics.noise_db - (-60)) < 3
+
+def test_floor_moves_at_bounded_rate():
+    analytics = AudioAnalytics(RATE)
+    run(analytics, noise(2, -60))
+    floor = analytics.noise_db
+    run(analytics, noise(1, -20, seed=1), start=2)
+    assert analytics.noise_db - floor <= NOISE_MAX_RISE_DB + 1e-6
+    floor = analytics.noise_db
+    run(analytics, noise(1, -80, seed=2), start=3)
+    assert floor - analytics.noise_db <= NOISE_MAX_DROP_DB + 1e-6
+
+def test_voiced_speech_is_periodic_and_not_whisper():
+    analytics = AudioAnalytics(RATE)
+    summaries = run(analytics, np.concatenate([noise(1, -60), voice(2, -25) + noise(2, -60, seed=1)]))
+    assert summaries[-1]["voiced_ratio"] > 0.9
+    assert summaries[-1]["whisper_ratio"] < 0.1
+
+def test_sustained_whisper_emits_one_event_per_cooldown():
+    events = []
+    analytics = AudioAnalytics(RATE, on_event=lambda kind, details: events.append(kind))
+    run(analytics, noise(2, -60))
+    run(analytics, whisper(5, -45) + noise(5, -60, seed=3), start=2)
+    assert events == ["whisper"]
+    assert analytics.flagged_since(2)
+    quiet = int(EVENT_COOLDOWN) - 5
+    run(analytics, noise(quiet, -60, seed=4), start=7)
+    run(analytics, whisper(4, -45, seed=5) + noise(4, -60, seed=6), start=7 + quiet)
+    assert events == ["whisper", "whisper"]
+
+def test_different_voice_after_reference_emits_second_voice():
+    events = []
+    analytics = AudioAnalytics(RATE, on_event=lambda kind, details: events.append(kind))
+    run(analytics, noise(1, -60))
+    run(analytics, voice(REFERENCE_SECONDS + 2, -25, f0=120, tilt=1.5), start=1)
+    assert events == [] and analytics.profile is not None
+    run(analytics, voice(3, -25, f0=230, tilt=0.2), start=REFERENCE_SECONDS + 3)
+    assert events == ["second_voice"]
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from core import benchmark
+import core.detector_backends
+
+class StubSource:
+    def __init__(self, frames):
+        self.frames = list(frames)
+
+    def read(self):
+        if not self.frames:
+            return False, None
+        return True, self.frames.pop(0)
+
+@pytest.fixture(autouse=True)
+def no_firebase(monkeypatch):
+    monkeypatch.setattr(benchmark, "stub_firebase", lambda: None)
+
+def test_stages_that_cannot_run_are_reported_as_skipped(monkeypatch):
+    monkeypatch.setattr(core.detector_backends, "create_detector", lambda name, **config: None)
+    source = StubSource(np.zeros((48, 64, 3), np.uint8) for _ in range(2))
+    report = benchmark.run_benchmark(source, stages=("mediapipe", "verify"))
+    assert report["frames"] == 2
+    assert report["stages"]["read"]["runs"] == 3
+    assert report["stages"]["mediapipe"] == {"skipped": "detector failed to load"}
+    assert report["stages"]["verify"] == {"skipped": "no reference image (--reference)"}
+    assert report["detections"] == {}
+
+def test_stage_timer_reports_zero_runs_for_a_stage_that_never_fired():
+    assert benchmark.StageTimer().report() == {"runs": 0}
@@ -0,0 +1,70 @@
+import time
+
+from core.event_journal import EventJournal, JOURNAL_SEQ_FIELD
+from core.telemetry import InMemorySink
+
+KEY = ("exam1", "student1")
+
+def make_journal(tmp_path, sink, **kwargs):
+    return EventJournal(sink.commit, sink.read, str(tmp_path / "events.db"), is_transform=sink.is_transform,
+                        make_timestamp=sink.timestamp, ship_interval=60, **kwargs)
+
+def test_events_are_shipped_in_order_with_journal_seq(tmp_path):
+    sink = InMemorySink()
+    journal = make_journal(tmp_path, sink)
+    journal.start()
+    journal.append(KEY, {"gaze": "Left"})
+    journal.append(KEY, {"gaze": "Right", "pose": "Forward"})
+    journal.stop()
+    doc = sink.read(KEY)
+    assert doc["gaze"] == "Right" and doc["pose"] == "Forward"
+    assert doc[JOURNAL_SEQ_FIELD] == {journal.journal_id: 2}
+    assert journal.pending_count() == 0
+
+def test_identical_events_are_not_journaled(tmp_path):
+    journal = make_journal(tmp_path, InMemorySink())
+    journal.start()
+    journal.append(KEY, {"gaze": "Left"})
+    journal.append(KEY, {"gaze": "Left"})
+    journal.stop()
+    assert journal.stats()["dropped_identical"] == 1
+    assert journal.stats()["committed"] == 1
+
+def test_replay_uses_append_time_for_server_timestamps(tmp_path):
+    offline = InMemorySink(failure_rate=1.0)
+    journal = make_journal(tmp_path, offline)
+    journal.start()
+    appended = time.time()
+    journal.append(KEY, {"gaze": "Left", "lastSeen": offline.server_timestamp()})
+    journal.stop()
+    assert journal.pending_count() == 1
+
+    # Phiên sau: mạng đã có lại, sự kiện cũ được gửi với thời điểm ghi ban đầu
+    time.sleep(0.2)
+    sink = InMemorySink()
+    journal = make_journal(tmp_path, sink)
+    journal.start()
+    journal.stop()
+    assert abs(sink.read(KEY)["lastSeen"] - appended) < 0.1
+
+def test_reconcile_skips_events_already_applied(tmp_path):
+    sink = InMemorySink(failure_rate=1.0)
+    journal = make_journal(tmp_path, sink)
+    journal.start()
+    journal.append(KEY, {"n": 1})
+    journal.append(KEY, {"n": 2})
+    journal.stop()
+
+    # Firestore đã nhận seq 1 nhưng journal chưa kịp xóa nó trước khi crash
+    applied = InMemorySink()
+    applied.docs[KEY] = {JOURNAL_SEQ_FIELD: {journal.journal_id: 1}}
+    commits = []
+
+    def commit(updates):
+        commits.append(updates)
+        applied.commit(updates)
+
+    journal = EventJournal(commit, applied.read, str(tmp_path / "events.db"), ship_interval=60)
+    journal.start()
+    journal.stop()
+    assert [fields["n"] for batch in commits for fields in batch.values()] == [2]
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core import evidence
+from core.evidence import EvidenceRecorder
+
+BASE = 1000.0
+
+class FakeWriter:
+    """Thay cv2.VideoWriter: ghi lại giá trị điểm ảnh của từng frame thay vì mã hóa."""
+
+    instances = []
+
+    def __init__(self, path, fourcc, fps, size):
+        self.path = path
+        self.size = size
+        self.values = []
+        FakeWriter.instances.append(self)
+
+    def write(self, frame):
+        self.values.append(int(frame[0, 0, 0]))
+
+    def release(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def fake_writer(monkeypatch):
+    FakeWriter.instances = []
+    monkeypatch.setattr(evidence.cv2, "VideoWriter", FakeWriter)
+    return FakeWriter
+
+def make_recorder(tmp_path, **kwargs):
+    # pre = post = 1 s ở 8 fps: vòng đệm (1 + 1 + ENCODE_MARGIN) * 8 = 40 frame
+    return EvidenceRecorder(output_dir=str(tmp_path), pre_seconds=1.0, post_seconds=1.0, record_fps=8.0, **kwargs)
+
+def add_frames(recorder, indices, base=BASE, shape=(48, 64)):
+    # Giá trị điểm ảnh = chỉ số frame, để biết clip chứa những frame nào; 1/8 s biểu diễn chính xác bằng float
+    for i in indices:
+        recorder.add(np.full((*shape, 3), i, np.uint8), base + i / 8)
+
+def test_clip_covers_pre_and_post_window(tmp_path):
+    recorder = make_recorder(tmp_path)
+    add_frames(recorder, range(40))
+    recorder._write_clip(BASE + 2.5, "phone")
+    assert FakeWriter.instances[0].values == list(range(12, 29))
+    assert recorder.saved_count == 1 and recorder.skipped_frames == 0
+
+def test_frames_older_than_the_ring_are_gone(tmp_path):
+    recorder = make_recorder(tmp_path)
+    assert recorder.capacity == 40
+    add_frames(recorder, range(56))
+    recorder._write_clip(BASE + 2.5, "phone")
+    # Frame 0..15 đã bị ghi đè bởi 40..55: clip chỉ còn phần trước sự kiện chưa bị ghi đè
+    assert FakeWriter.instances[0].values == list(range(16, 29))
+
+def test_frames_overwritten_while_encoding_are_skipped(tmp_path, monkeypatch):
+    recorder = make_recorder(tmp_path)
+    add_frames(recorder, range(40))
+
+    class SlowWriter(FakeWriter):
+        def write(self, frame):
+            super().write(frame)
+            if len(self.values) == 1:
+                # Camera chạy tiếp trong lúc mã hóa: frame 40..59 chiếm slot 0..19, đè lên 17..19 chưa kịp ghi
+                add_frames(recorder, range(40, 60))
+
+    monkeypatch.setattr(evidence.cv2, "VideoWriter", SlowWriter)
+    recorder._write_clip(BASE + 3.0, "phone")
+    assert FakeWriter.instances[0].values == [16] + list(range(20, 33))
+    assert recorder.skipped_frames == 3
+
+def test_frames_are_downscaled_and_throttled(tmp_path):
+    recorder = make_recorder(tmp_path)
+    for i in range(10):
+        # 20 fps đầu vào, chỉ lưu frame cách nhau ít nhất 1 / record_fps
+        recorder.add(np.full((480, 640, 3), i, np.uint8), BASE + i * 0.05)
+    assert recorder.memory_bytes == recorder.capacity * 240 * 320 * 3
+    recorder._write_clip(BASE, "phone")
+    assert FakeWriter.instances[0].size == (320, 240)
+    assert FakeWriter.instances[0].values == [0, 3, 6, 9]
+
+def test_no_clip_without_frames_in_window(tmp_path):
+    recorder = make_recorder(tmp_path)
+    recorder._write_clip(BASE, "phone")
+    add_frames(recorder, range(10))
+    recorder._write_clip(BASE + 100, "phone")
+    assert FakeWriter.instances == [] and recorder.saved_count == 0
+
+def test_encoder_thread_writes_due_events(tmp_path):
+    saved = []
+    done = threading.Event()
+    recorder = make_recorder(tmp_path, on_saved=lambda event, path: (saved.append((event, path)), done.set()))
+    base = float(int(time.time()) - 10)
+    add_frames(recorder, range(40), base=base)
+    recorder.start()
+    try:
+        # Sự kiện đã qua post_seconds nên được ghi ngay
+        recorder.trigger("phone call", base + 2.5)
+        assert done.wait(timeout=5)
+    finally:
+        recorder.stop()
+    event, path = saved[0]
+    assert event == "phone call"
+    assert path.startswith(str(tmp_path)) and path.endswith("_phone_call.avi")
+    assert FakeWriter.instances[0].values == list(range(12, 29))
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from core import face_auth
+
+class StubDeepFace:
+    """Stands in for DeepFace: counts represent() calls and returns a different embedding each time."""
+
+    def __init__(self):
+        self.calls = []
+
+    def represent(self, img_path, model_name, enforce_detection, detector_backend):
+        self.calls.append((img_path, model_name, detector_backend))
+        return [{"embedding": [float(len(self.calls)), 1.0, 0.0]}]
+
+@pytest.fixture
+def deepface(tmp_path, monkeypatch):
+    stub = StubDeepFace()
+    monkeypatch.setattr(face_auth, "_deepface", lambda: stub)
+    monkeypatch.setattr(face_auth, "EMBEDDING_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(face_auth, "_embedding_cache", {})
+    # Ảnh giả không phải ảnh thật: "cắt" bằng cách đọc nội dung tệp
+    monkeypatch.setattr(face_auth, "_aligned_reference_crop", lambda path: open(path, "rb").read())
+    return stub
+
+@pytest.fixture
+def reference(tmp_path):
+    path = tmp_path / "student.jpg"
+    path.write_bytes(b"photo-v1")
+    return path
+
+def test_reference_is_embedded_once(deepface, reference):
+    first = face_auth.get_reference_embedding(str(reference))
+    second = face_auth.get_reference_embedding(str(reference))
+    assert len(deepface.calls) == 1
+    assert second is first
+
+def test_changed_file_is_embedded_again(deepface, reference):
+    first = face_auth.get_reference_embedding(str(reference))
+    reference.write_bytes(b"photo-v2")
+    second = face_auth.get_reference_embedding(str(reference))
+    assert len(deepface.calls) == 2
+    assert not np.array_equal(first, second)
+
+def test_cache_is_keyed_by_model(deepface, reference):
+    face_auth.get_reference_embedding(str(reference), "ArcFace")
+    face_auth.get_reference_embedding(str(reference), "Facenet")
+    assert [model for _, model, _ in deepface.calls] == ["ArcFace", "Facenet"]
+
+def test_embedding_persists_across_processes(deepface, reference, monkeypatch):
+    first = face_auth.get_reference_embedding(str(reference))
+    # Tiến trình mới: bộ nhớ đệm trống nhưng tệp .npy vẫn còn trên đĩa
+    monkeypatch.setattr(face_auth, "_embedding_cache", {})
+    second = face_auth.get_reference_embedding(str(reference))
+    assert len(deepface.calls) == 1
+    assert np.array_equal(first, second)
+
+def test_corrupt_cache_file_is_recomputed(deepface, reference, tmp_path, monkeypatch):
+    face_auth.get_reference_embedding(str(reference))
+    for path in (tmp_path / "cache").iterdir():
+        path.write_bytes(b"garbage")
+    monkeypatch.setattr(face_auth, "_embedding_cache", {})
+    assert face_auth.get_reference_embedding(str(reference)) is not None
+    assert len(deepface.calls) == 2
+
+def test_reference_uses_the_same_crop_as_live_faces(deepface, reference):
+    face_auth.get_reference_embedding(str(reference))
+    assert deepface.calls == [(b"photo-v1", "ArcFace", "skip")]
+
+def test_aligned_and_detector_references_are_cached_separately(deepface, reference):
+    face_auth.get_reference_embedding(str(reference), aligned=True)
+    face_auth.get_reference_embedding(str(reference), aligned=False)
+    assert [backend for _, _, backend in deepface.calls] == ["skip", "opencv"]
+
+def test_reference_falls_back_to_deepface_detection_without_mesh_face(deepface, reference, monkeypatch):
+    monkeypatch.setattr(face_auth, "_aligned_reference_crop", lambda path: None)
+    assert face_auth.get_reference_embedding(str(reference)) is not None
+    assert deepface.calls == [(str(reference), "ArcFace", "opencv")]
+
+def test_verify_face_pairs_live_and_reference_cropping(deepface, reference):
+    face_auth.verify_face("live-crop", str(reference), aligned=True)
+    assert [backend for _, _, backend in deepface.calls] == ["skip", "skip"]
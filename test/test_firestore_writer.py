@@ -0,0 +1,81 @@
+import threading
+
+from core.firestore_writer import FirestoreWriter, is_redundant
+
+SERVER_TIMESTAMP = object()
+
+def is_transform(value):
+    return value is SERVER_TIMESTAMP
+
+def make_writer(fail=0, **kwargs):
+    """Writer whose first `fail` commits raise, as if the network were down."""
+    commits = []
+    failures = [fail]
+
+    def commit(updates):
+        if failures[0]:
+            failures[0] -= 1
+            raise RuntimeError("offline")
+        commits.append(updates)
+
+    return FirestoreWriter(commit, is_transform=is_transform, **kwargs), commits
+
+def test_is_redundant_ignores_transforms():
+    assert is_redundant({"a": 1, "t": SERVER_TIMESTAMP}, {"a": 1}, is_transform)
+    assert not is_redundant({"a": 2}, {"a": 1}, is_transform)
+    assert not is_redundant({"b": 1}, {"a": 1}, is_transform)
+
+def test_updates_coalesce_per_document():
+    writer, commits = make_writer()
+    writer.update("s1", {"gaze": "Left", "t": SERVER_TIMESTAMP})
+    writer.update("s1", {"gaze": "Right"})
+    writer.update("s2", {"gaze": "Forward"})
+    writer._send(writer._pending)
+    assert commits == [{"s1": {"gaze": "Right", "t": SERVER_TIMESTAMP}, "s2": {"gaze": "Forward"}}]
+
+def test_identical_updates_are_dropped_after_send():
+    writer, commits = make_writer()
+    writer.update("s1", {"gaze": "Left"})
+    writer._send(writer._pending)
+    writer._pending = {}
+    writer.update("s1", {"gaze": "Left", "t": SERVER_TIMESTAMP})
+    assert writer.pending_count() == 0
+    assert writer.stats()["dropped_identical"] == 1
+
+def test_batches_respect_max_batch():
+    writer, commits = make_writer(max_batch=2)
+    for i in range(5):
+        writer.update(f"s{i}", {"n": i})
+    writer._send(writer._pending)
+    assert [len(batch) for batch in commits] == [2, 2, 1]
+
+def test_failed_commit_is_requeued_under_newer_values():
+    writer, commits = make_writer(fail=1)
+    writer.update("s1", {"gaze": "Left", "pose": "Forward"})
+    pending, writer._pending = writer._pending, {}
+    writer.update("s1", {"gaze": "Right"})
+    writer._send(pending)
+    assert commits == []
+    assert writer.backoff > 0
+    assert writer._pending == {"s1": {"gaze": "Right", "pose": "Forward"}}
+    writer._send(writer._pending)
+    assert commits == [{"s1": {"gaze": "Right", "pose": "Forward"}}]
+    assert writer.backoff == 0.0
+
+def test_flush_and_stop_send_from_background_thread():
+    sent = threading.Event()
+    commits = []
+
+    def commit(updates):
+        commits.append(updates)
+        sent.set()
+
+    writer = FirestoreWriter(commit, flush_interval=60)
+    writer.start()
+    writer.update("s1", {"a": 1})
+    writer.flush()
+    assert sent.wait(2)
+    writer.update("s1", {"a": 2})
+    writer.stop()
+    assert commits == [{"s1": {"a": 1}}, {"s1": {"a": 2}}]
+    assert not writer.thread.is_alive()
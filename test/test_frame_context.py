@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+
+from core.frame_context import BufferPool, FrameContext
+
+def make_frame():
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 256, (48, 64, 3), dtype=np.uint8)
+
+def test_views_match_opencv_and_are_memoized():
+    frame = make_frame()
+    context = FrameContext(frame)
+    assert np.array_equal(context.rgb, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    assert np.array_equal(context.gray, cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+    assert context.rgb is context.rgb
+    assert context.resized(32, 24) is context.resized(32, 24)
+
+def test_blob_matches_blob_from_image():
+    frame = make_frame()
+    expected = cv2.dnn.blobFromImage(frame, 1 / 255, (40, 30), 0, True, crop=False)
+    blob = FrameContext(frame).blob(40, 30)
+    assert blob.shape == expected.shape
+    assert np.allclose(blob, expected, atol=1e-6)
+
+def test_downscaled_keeps_aspect_ratio_and_skips_small_frames():
+    context = FrameContext(make_frame())
+    assert context.downscaled(32).shape == (24, 32, 3)
+    assert context.downscaled(128) is context.bgr
+
+def test_buffers_return_to_pool_after_last_consumer():
+    pool = BufferPool()
+    frame = make_frame()
+    first = FrameContext(frame, pool=pool, consumers=2)
+    first.rgb
+    first.release()
+    assert pool.allocated_count == 1 and pool.reused_count == 0
+    first.release()
+    second = FrameContext(frame, pool=pool)
+    second.rgb
+    assert pool.reused_count == 1
+    assert np.array_equal(second.rgb, cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+def test_canvas_is_a_private_copy():
+    context = FrameContext(make_frame())
+    canvas = context.canvas()
+    canvas[:] = 0
+    assert context.bgr.any()
@@ -0,0 +1,41 @@
+import cv2
+import numpy as np
+import pytest
+
+from core.frame_sources import ImageDirSource, open_source
+
+@pytest.fixture
+def image_dir(tmp_path):
+    # Ảnh 1 màu để nhận ra thứ tự; b.png là tệp hỏng
+    for name, value in (("a.png", 10), ("c.png", 30), ("d.png", 40)):
+        cv2.imwrite(str(tmp_path / name), np.full((4, 4, 3), value, np.uint8))
+    (tmp_path / "b.png").write_bytes(b"not an image")
+    return tmp_path
+
+def read_values(source, count):
+    values = []
+    for _ in range(count):
+        ret, frame = source.read()
+        values.append(int(frame[0, 0, 0]) if ret else None)
+    return values
+
+def test_unreadable_image_is_skipped_in_place(image_dir):
+    source = ImageDirSource(str(image_dir), repeat=2)
+    assert read_values(source, 7) == [10, 10, 30, 30, 40, 40, None]
+    assert len(source.paths) == 3
+
+def test_unreadable_image_while_looping_keeps_position(image_dir):
+    source = ImageDirSource(str(image_dir), loop=True)
+    assert read_values(source, 7) == [10, 30, 40, 10, 30, 40, 10]
+
+def test_frames_are_copies(image_dir):
+    source = ImageDirSource(str(image_dir), repeat=2)
+    _, first = source.read()
+    first[:] = 0
+    _, second = source.read()
+    assert second[0, 0, 0] == 10
+
+def test_open_source_picks_image_directory(image_dir):
+    assert isinstance(open_source(str(image_dir)), ImageDirSource)
+    with pytest.raises(ValueError):
+        open_source(str(image_dir / "missing.mp4"))
@@ -0,0 +1,163 @@
+import socket
+import struct
+import time
+
+import numpy as np
+import pytest
+
+from core.inference_server import (
+    DynamicBatcher, InferenceServer, RemoteInferenceClient, LocalInferenceClient,
+    send_message, recv_message, MAX_HEADER_BYTES,
+)
+
+class RecordingBatchFn:
+    """Stub batch_fn: nhân payload với 10 và ghi lại từng batch nhận được."""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, payloads):
+        self.batches.append(list(payloads))
+        return [payload * 10 for payload in payloads]
+
+@pytest.fixture
+def batch_fn():
+    return RecordingBatchFn()
+
+def make_batcher(batch_fn, **kwargs):
+    batcher = DynamicBatcher("test", batch_fn, **kwargs)
+    batcher.start()
+    return batcher
+
+def test_batch_dispatched_when_full(batch_fn):
+    batcher = make_batcher(batch_fn, max_batch_size=3, max_wait=5)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit("s", i) for i in range(3)]
+        assert [f.result(timeout=1) for f in futures] == [0, 10, 20]
+        # Đủ max_batch_size thì gửi ngay, không chờ hết max_wait
+        assert time.monotonic() - start < 1
+        assert batch_fn.batches == [[0, 1, 2]]
+    finally:
+        batcher.stop()
+
+def test_partial_batch_dispatched_after_max_wait(batch_fn):
+    batcher = make_batcher(batch_fn, max_batch_size=8, max_wait=0.05)
+    try:
+        start = time.monotonic()
+        futures = [batcher.submit("s", i) for i in range(2)]
+        assert [f.result(timeout=1) for f in futures] == [0, 10]
+        assert time.monotonic() - start >= 0.05
+        assert batch_fn.batches == [[0, 1]]
+        assert batcher.stats()["avg_batch_size"] == 2
+    finally:
+        batcher.stop()
+
+def test_results_routed_back_to_each_session(batch_fn):
+    batcher = make_batcher(batch_fn, max_batch_size=4, max_wait=0.05)
+    try:
+        futures = {(session, i): batcher.submit(session, i + offset)
+                   for session, offset in (("a", 0), ("b", 100)) for i in range(2)}
+        assert {key: f.result(timeout=1) for key, f in futures.items()} == {
+            ("a", 0): 0, ("a", 1): 10, ("b", 0): 1000, ("b", 1): 1010}
+        assert len(batch_fn.batches) == 1
+        assert batcher.session_counts == {"a": 2, "b": 2}
+    finally:
+        batcher.stop()
+
+def test_wrong_result_count_fails_every_future():
+    batcher = make_batcher(lambda payloads: payloads[:1], max_batch_size=2, max_wait=0.05)
+    try:
+        futures = [batcher.submit("s", i) for i in range(2)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result(timeout=1)
+    finally:
+        batcher.stop()
+
+def test_batch_fn_error_reaches_every_future():
+    def failing(payloads):
+        raise RuntimeError("model crashed")
+
+    batcher = make_batcher(failing, max_batch_size=2, max_wait=0.01)
+    try:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            batcher.submit("s", 1).result(timeout=1)
+        # Batcher vẫn chạy sau lỗi
+        assert batcher.running and batcher.thread.is_alive()
+    finally:
+        batcher.stop()
+
+def test_submit_fails_when_batcher_not_running(batch_fn):
+    batcher = DynamicBatcher("test", batch_fn)
+    with pytest.raises(RuntimeError):
+        batcher.submit("s", 1).result(timeout=0)
+
+# --- TCP ---
+
+def detect_batch(payloads):
+    return [[{"label": "person", "bbox": [0, 0, p["frame"].shape[1], p["frame"].shape[0]]}] for p in payloads]
+
+def verify_batch(payloads):
+    return [p["reference"] == "s1.jpg" and p["crop"].shape == (112, 112, 3) for p in payloads]
+
+@pytest.fixture
+def server():
+    server = InferenceServer({"detect": detect_batch, "verify": verify_batch}, max_wait=0.01)
+    server.start()
+    address = server.serve_tcp("127.0.0.1", 0)
+    yield server, address
+    server.stop()
+
+def test_remote_client_round_trip(server):
+    _, (host, port) = server
+    client = RemoteInferenceClient("exam/s1", host, port)
+    try:
+        assert client.tasks() == ["detect", "verify"]
+        assert client.available
+        detections = client.detect(np.zeros((48, 64, 3), np.uint8))
+        assert detections == [{"label": "person", "bbox": (0, 0, 64, 48)}]
+        assert client.verify(np.zeros((112, 112, 3), np.uint8), "data/registered_faces/s1.jpg") is True
+        assert client.verify(np.zeros((112, 112, 3), np.uint8), "other/s2.jpg") is False
+    finally:
+        client.close()
+
+def test_client_reports_missing_detect_task():
+    server = InferenceServer({"verify": verify_batch})
+    server.start()
+    host, port = server.serve_tcp("127.0.0.1", 0)
+    client = RemoteInferenceClient("exam/s1", host, port)
+    try:
+        assert client.supports("verify")
+        assert not client.available
+        assert not LocalInferenceClient(server, "exam/s1").available
+    finally:
+        client.close()
+        server.stop()
+
+def test_unreachable_server_serves_no_tasks():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    client = RemoteInferenceClient("exam/s1", "127.0.0.1", port, timeout=0.5)
+    assert client.tasks() == []
+    assert not client.available
+
+def test_missing_field_gets_error_reply_and_connection_survives(server):
+    _, address = server
+    with socket.create_connection(address, timeout=2) as sock:
+        send_message(sock, {"session": "s"})
+        reply, _ = recv_message(sock)
+        assert not reply["ok"] and "task" in reply["error"]
+        # Ảnh gửi kèm nhưng thiếu image_field
+        send_message(sock, {"task": "detect"}, np.zeros((8, 8, 3), np.uint8))
+        reply, _ = recv_message(sock)
+        assert not reply["ok"] and "image_field" in reply["error"]
+        send_message(sock, {"task": "tasks"})
+        assert recv_message(sock)[0] == {"ok": True, "result": ["detect", "verify"]}
+
+def test_oversized_message_closes_connection(server):
+    _, address = server
+    with socket.create_connection(address, timeout=2) as sock:
+        sock.sendall(struct.pack("!II", MAX_HEADER_BYTES + 1, 0))
+        assert sock.recv(1) == b""
@@ -0,0 +1,61 @@
+import unicodedata
+
+from core.keyword_matcher import KeywordMatcher, load_keywords, normalize
+
+PHRASES = ["đáp án", "gian lận", "tài liệu", "đáp án câu"]
+
+def found(matcher, text):
+    return [(m.keyword, text[m.start:m.end]) for m in matcher.find_all(text)]
+
+def test_normalize_collapses_punctuation_and_keeps_spans():
+    normalized, spans = normalize("Đáp-Án!!  xong")
+    assert normalized == " đáp án xong"
+    assert len(spans) == len(normalized)
+
+def test_find_all_reports_offsets_in_original_text():
+    matcher = KeywordMatcher(PHRASES)
+    text = "Đáp án câu 3 là gì, cho xem tài   liệu"
+    assert found(matcher, text) == [("đáp án", "Đáp án"), ("đáp án câu", "Đáp án câu"),
+                                    ("tài liệu", "tài   liệu")]
+
+def test_only_whole_words_match():
+    matcher = KeywordMatcher(PHRASES)
+    assert found(matcher, "đáp ánh sáng") == []
+    assert found(matcher, "xgian lận") == []
+
+def test_decomposed_input_matches():
+    matcher = KeywordMatcher(PHRASES)
+    text = unicodedata.normalize("NFD", "gian lận")
+    assert [m.keyword for m in matcher.find_all(text)] == ["gian lận"]
+
+def test_fold_diacritics():
+    assert found(KeywordMatcher(PHRASES, fold_diacritics=True), "dap an") == [("đáp án", "dap an")]
+    assert found(KeywordMatcher(PHRASES, fold_diacritics=False), "dap an") == []
+
+def test_stream_matches_phrase_at_start_of_first_partial():
+    stream = KeywordMatcher(PHRASES).stream()
+    assert [m.keyword for m in stream.update("đáp án")] == ["đáp án"]
+
+def test_stream_reports_each_occurrence_once_across_revisions():
+    stream = KeywordMatcher(PHRASES).stream()
+    assert stream.update("cho tôi") == []
+    assert [m.keyword for m in stream.update("cho tôi gian lận")] == ["gian lận"]
+    # Bản sửa đổi làm lệch vị trí nhưng vẫn là cùng một lần xuất hiện
+    assert stream.update("cho tôi xin gian lận") == []
+    assert [m.keyword for m in stream.update("cho tôi xin gian lận rồi gian lận")] == ["gian lận"]
+
+def test_stream_matches_find_all():
+    matcher = KeywordMatcher(PHRASES)
+    text = "đáp án câu này là tài liệu gian lận"
+    stream = matcher.stream()
+    words = text.split()
+    streamed = []
+    for i in range(1, len(words) + 1):
+        streamed += [m.keyword for m in stream.update(" ".join(words[:i]))]
+    assert sorted(streamed) == sorted(m.keyword for m in matcher.find_all(text))
+
+def test_load_keywords_merges_default_and_exam_files(tmp_path):
+    (tmp_path / "default.txt").write_text("# chú thích\nđáp án\n\n", encoding="utf-8")
+    (tmp_path / "exam1.txt").write_text("công thức\n", encoding="utf-8")
+    assert load_keywords("exam1", str(tmp_path)) == ["đáp án", "công thức"]
+    assert load_keywords("other", str(tmp_path)) == ["đáp án"]
@@ -0,0 +1,111 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from core.metrics import Histogram, MetricsRegistry, MetricsServer
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+def make_histogram(values, buckets=(0.1, 0.2, 0.5)):
+    hist = Histogram("latency", {}, buckets)
+    for value in values:
+        hist.observe(value)
+    return hist
+
+def test_quantile_returns_bucket_upper_bound():
+    hist = make_histogram([0.05] * 5 + [0.15] * 4 + [0.3])
+    assert hist.quantile(0.5) == 0.1
+    assert hist.quantile(0.9) == 0.2
+    # Không vượt quá giá trị lớn nhất đã quan sát
+    assert hist.quantile(0.99) == 0.3
+
+def test_quantile_edges():
+    assert make_histogram([]).quantile(0.5) is None
+    # Giá trị bằng biên thuộc bucket đó (le = nhỏ hơn hoặc bằng)
+    assert make_histogram([0.1]).counts == [1, 0, 0, 0]
+    assert make_histogram([0.05, 2.0]).quantile(1.0) == 2.0
+
+def test_snapshot_matches_observations():
+    snap = make_histogram([0.05, 0.15]).snapshot()
+    assert snap["count"] == 2
+    assert snap["sum"] == pytest.approx(0.2)
+    assert snap["mean"] == pytest.approx(0.1)
+    assert (snap["p50"], snap["p99"], snap["max"]) == (0.1, 0.15, 0.15)
+
+def test_render_text_prometheus_format(registry):
+    registry.counter("frames_total", source="camera").inc(3)
+    registry.gauge("queue_depth").set(2)
+    hist = registry.histogram("stage_seconds", stage="face")
+    hist.observe(0.003)
+    hist.observe(0.02)
+    hist.observe(20)
+    lines = registry.render_text().splitlines()
+    assert 'frames_total{source="camera"} 3' in lines
+    assert "queue_depth 2" in lines
+    assert 'stage_seconds_bucket{le="0.001",stage="face"} 0' in lines
+    assert 'stage_seconds_bucket{le="0.005",stage="face"} 1' in lines
+    assert 'stage_seconds_bucket{le="10.0",stage="face"} 2' in lines
+    assert 'stage_seconds_bucket{le="+Inf",stage="face"} 3' in lines
+    assert 'stage_seconds_count{stage="face"} 3' in lines
+    assert any(line.startswith('stage_seconds_sum{stage="face"} 20.02') for line in lines)
+
+def test_render_text_consistent_under_concurrent_observe(registry):
+    hist = registry.histogram("busy_seconds")
+    stop = threading.Event()
+
+    def observe():
+        while not stop.is_set():
+            hist.observe(0.01)
+
+    thread = threading.Thread(target=observe)
+    thread.start()
+    try:
+        for _ in range(200):
+            lines = registry.render_text().splitlines()
+            inf = next(line for line in lines if 'le="+Inf"' in line)
+            count = next(line for line in lines if line.startswith("busy_seconds_count"))
+            assert inf.split()[-1] == count.split()[-1]
+    finally:
+        stop.set()
+        thread.join()
+
+def test_registry_reuses_metrics_and_rejects_kind_clash(registry):
+    assert registry.counter("hits", route="a") is registry.counter("hits", route="a")
+    assert registry.counter("hits", route="a") is not registry.counter("hits", route="b")
+    with pytest.raises(ValueError):
+        registry.gauge("hits", route="a")
+
+@pytest.fixture
+def server(registry):
+    server = MetricsServer(registry, port=0)
+    host, port = server.start()
+    yield registry, f"http://{host}:{port}"
+    server.stop()
+
+def test_metrics_json_endpoint(server):
+    registry, base = server
+    registry.counter("frames_total").inc()
+    registry.histogram("stage_seconds", stage="face").observe(0.02)
+    with urllib.request.urlopen(f"{base}/metrics.json", timeout=2) as response:
+        assert response.headers["Content-Type"] == "application/json"
+        body = json.load(response)
+    by_name = {entry["name"]: entry for entry in body}
+    assert by_name["frames_total"] == {"name": "frames_total", "type": "counter", "labels": {}, "value": 1}
+    stage = by_name["stage_seconds"]
+    assert stage["type"] == "histogram" and stage["labels"] == {"stage": "face"}
+    assert stage["count"] == 1 and stage["p50"] == 0.02
+
+def test_metrics_text_endpoint_and_404(server):
+    registry, base = server
+    registry.counter("frames_total").inc(2)
+    with urllib.request.urlopen(f"{base}/metrics", timeout=2) as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        assert "frames_total 2" in response.read().decode("utf-8").splitlines()
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(f"{base}/other", timeout=2)
+    assert error.value.code == 404
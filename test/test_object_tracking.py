@@ -0,0 +1,61 @@
+import pytest
+
+from core.object_tracking import DetectionScheduler, IoUTracker, iou, is_phone
+
+def phone(x, y=0, w=40, h=80, score=0.9):
+    return {'label': 'cell phone', 'score': score, 'bbox': (x, y, w, h)}
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 10, 10)) == 0.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+
+def test_is_phone_accepts_detector_label_variants():
+    assert is_phone("cell phone") and is_phone("Mobile Phone")
+    assert not is_phone("laptop")
+
+def test_velocity_is_stable_under_constant_motion():
+    tracker = IoUTracker(iou_threshold=0.1)
+    # Hộp di chuyển đều 5 px/frame, detector chạy mỗi 2 frame
+    for frame_id in range(0, 20, 2):
+        tracker.update([phone(5 * frame_id)], frame_id)
+        if frame_id >= 2:
+            assert tracker.tracks[0].velocity == pytest.approx((5.0, 0.0))
+    tracker.predict(21)
+    assert tracker.tracks[0].bbox[0] == pytest.approx(5 * 21)
+
+def test_track_becomes_episode_once_and_expires_after_misses():
+    tracker = IoUTracker(max_misses=1, min_hits=2)
+    assert tracker.update([phone(0)], 0) == []
+    episodes = tracker.update([phone(2)], 1)
+    assert len(episodes) == 1
+    assert tracker.update([phone(4)], 2) == []
+    tracker.update([], 3)
+    assert len(tracker.tracks) == 1
+    tracker.update([], 4)
+    assert tracker.tracks == []
+
+def test_tracks_only_match_same_label():
+    tracker = IoUTracker()
+    tracker.update([phone(0)], 0)
+    tracker.update([{'label': 'book', 'score': 0.8, 'bbox': (0, 0, 40, 80)}], 1)
+    assert sorted(track.label for track in tracker.tracks) == ['book', 'cell phone']
+
+def test_scheduler_runs_detector_on_interval():
+    calls = []
+
+    def detect():
+        calls.append(1)
+        return [phone(0)]
+
+    scheduler = DetectionScheduler(detect, interval=5, min_confidence=0.0)
+    ran = [scheduler.process(frame_id)[2] for frame_id in range(10)]
+    assert ran == [True, False, False, False, False, True, False, False, False, False]
+    assert scheduler.duty_cycle() == pytest.approx(0.2)
+
+def test_scheduler_runs_early_when_confidence_decays():
+    scheduler = DetectionScheduler(lambda: [phone(0, score=0.4)], interval=100, min_confidence=0.35,
+                                   tracker=IoUTracker(decay=0.9))
+    ran = [scheduler.process(frame_id)[2] for frame_id in range(4)]
+    # 0.4 * 0.9^2 < 0.35: detector chạy lại ở frame 2
+    assert ran == [True, False, True, False]
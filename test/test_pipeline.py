@@ -0,0 +1,88 @@
+import threading
+import time
+
+import pytest
+
+from core.pipeline import LatestValueQueue, Pipeline, StopPipeline, DROP_OLDEST, DROP_NEWEST
+
+def test_latest_value_queue_drop_oldest_keeps_newest():
+    dropped = []
+    queue = LatestValueQueue(maxsize=1, drop_policy=DROP_OLDEST, on_drop=dropped.append)
+    assert queue.put(1)
+    assert queue.put(2)
+    assert queue.get(timeout=0) == 2
+    assert dropped == [1]
+    assert queue.dropped_count == 1
+
+def test_latest_value_queue_drop_newest_rejects_item():
+    queue = LatestValueQueue(maxsize=2, drop_policy=DROP_NEWEST)
+    queue.put("a")
+    queue.put("b")
+    assert not queue.put("c")
+    assert [queue.get(timeout=0), queue.get(timeout=0)] == ["a", "b"]
+
+def test_latest_value_queue_rejects_unknown_policy():
+    with pytest.raises(ValueError):
+        LatestValueQueue(drop_policy="bogus")
+
+def test_latest_value_queue_get_times_out_and_close_wakes_consumer():
+    queue = LatestValueQueue()
+    assert queue.get(timeout=0.01) is None
+    result = []
+    consumer = threading.Thread(target=lambda: result.append(queue.get()))
+    consumer.start()
+    queue.close()
+    consumer.join(timeout=1)
+    assert result == [None]
+    assert not queue.put(1)
+
+def test_pipeline_runs_stages_and_stops_on_stop_pipeline():
+    pipeline = Pipeline()
+    queue = pipeline.add_queue(maxsize=8, drop_policy=DROP_NEWEST)
+    items = iter(range(5))
+    seen = []
+    done = threading.Event()
+
+    def source():
+        try:
+            return next(items)
+        except StopIteration:
+            # StopPipeline đóng mọi hàng đợi ngay, nên chờ sink xử lý xong trước
+            done.wait(timeout=2)
+            raise StopPipeline("hết dữ liệu")
+
+    def sink(item):
+        seen.append(item * 10)
+        if len(seen) == 5:
+            done.set()
+
+    pipeline.add_stage("source", source, output_queues=[queue])
+    pipeline.add_stage("sink", sink, input_queue=queue)
+    pipeline.start()
+    assert done.wait(timeout=2)
+    pipeline.stages[0].thread.join(timeout=2)
+    pipeline.stop()
+    assert seen == [0, 10, 20, 30, 40]
+    assert pipeline.stop_reason == "source: hết dữ liệu"
+    assert pipeline.stats()["sink"]["processed"] == 5
+
+def test_pipeline_stage_errors_are_counted_not_fatal():
+    pipeline = Pipeline()
+    queue = pipeline.add_queue(maxsize=8, drop_policy=DROP_NEWEST)
+    for item in (0, 1, 2):
+        queue.put(item)
+    processed = []
+
+    def fragile(item):
+        if item == 1:
+            raise RuntimeError("lỗi giả lập")
+        processed.append(item)
+
+    stage = pipeline.add_stage("fragile", fragile, input_queue=queue)
+    pipeline.start()
+    deadline = time.time() + 2
+    while len(processed) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    pipeline.stop()
+    assert processed == [0, 2]
+    assert stage.error_count == 1
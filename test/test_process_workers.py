@@ -0,0 +1,104 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from core import process_workers
+from core.process_workers import InferenceProcess, ProcessDetector, SharedFrameRing, WORKER_TASKS
+
+# Handler phải ở cấp module để tiến trình worker (spawn) import lại được
+
+def _make_echo_handler(options):
+    def handle(frame, kwargs):
+        if kwargs.get("crash"):
+            os._exit(3)
+        time.sleep(kwargs.get("sleep", 0))
+        return {"shape": frame.shape, "sum": int(frame.sum())}
+    return handle
+
+def _make_broken_handler(options):
+    raise RuntimeError("model missing")
+
+@pytest.fixture
+def worker_tasks(monkeypatch):
+    monkeypatch.setitem(WORKER_TASKS, "echo", _make_echo_handler)
+    monkeypatch.setitem(WORKER_TASKS, "broken", _make_broken_handler)
+    monkeypatch.setattr(process_workers, "RESTART_BACKOFF", 0.01)
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(slots=2, slot_size=64)
+    yield ring
+    ring.close()
+
+def start_worker(task, **kwargs):
+    worker = InferenceProcess(task, slots=2, slot_size=1024, **kwargs)
+    worker.start()
+    return worker
+
+def wait_for(condition, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "hết thời gian chờ"
+        time.sleep(0.05)
+
+def test_ring_slot_stays_owned_until_freed(ring):
+    first = ring.write(np.ones(8, np.uint8))
+    second = ring.write(np.ones(8, np.uint8))
+    assert {first, second} == {0, 1}
+    assert ring.write(np.ones(8, np.uint8)) is None
+    ring.free(first)
+    ring.free(first)  # Giải phóng hai lần không tạo slot trùng
+    assert ring.write(np.full(8, 7, np.uint8)) == first
+    assert ring.write(np.ones(8, np.uint8)) is None
+    ring.reset()
+    assert sorted(ring._free) == [0, 1]
+
+def test_ring_rejects_oversized_frame(ring):
+    with pytest.raises(ValueError):
+        ring.write(np.zeros(65, np.uint8))
+
+def test_worker_reads_frames_from_shared_memory_and_frees_slots(worker_tasks):
+    worker = start_worker("echo")
+    try:
+        assert worker.ready.wait(30)
+        frame = np.arange(12, dtype=np.uint8).reshape(3, 4)
+        assert worker.call(frame) == {"shape": (3, 4), "sum": 66}
+        # Hai slot đang bận thì frame thứ ba bị bỏ, không chờ
+        busy = [worker.submit(frame, sleep=0.3) for _ in range(2)]
+        assert worker.submit(frame) is None
+        assert [f.result(timeout=5)["sum"] for f in busy] == [66, 66]
+        wait_for(lambda: len(worker.ring._free) == 2)
+        assert worker.stats()["dropped"] == 1
+        with pytest.raises(ValueError):
+            worker.submit(np.zeros(1025, np.uint8))
+    finally:
+        worker.stop()
+
+def test_crash_fails_in_flight_requests_and_restarts(worker_tasks):
+    worker = start_worker("echo")
+    try:
+        assert worker.ready.wait(30)
+        future = worker.submit(np.zeros(4, np.uint8), crash=True)
+        with pytest.raises(RuntimeError, match="crashed"):
+            future.result(timeout=10)
+        wait_for(lambda: worker.restart_count == 1 and worker.ready.is_set())
+        assert sorted(worker.ring._free) == [0, 1]
+        assert worker.call(np.ones(4, np.uint8)) == {"shape": (4,), "sum": 4}
+        assert worker.available
+    finally:
+        worker.stop()
+
+def test_worker_that_never_becomes_ready_gives_up(worker_tasks, monkeypatch):
+    monkeypatch.setattr(process_workers, "MAX_STARTUP_FAILURES", 2)
+    worker = start_worker("broken")
+    detector = ProcessDetector(worker)
+    try:
+        assert detector.available
+        wait_for(lambda: worker.failed)
+        assert not detector.available
+        assert worker.restart_count == 1
+        assert detector.detect(np.zeros(4, np.uint8)) == []
+    finally:
+        worker.stop()
@@ -0,0 +1,35 @@
+from core.session_events import DETECTION_THRESHOLD, SUSPICION_THRESHOLD, SessionReporter
+
+def make_reporter():
+    updates = []
+    reporter = SessionReporter("exam1", "student1", update_fn=lambda exam, student, fields: updates.append(
+        (exam, student, fields)), timestamp_fn=lambda: "TS")
+    return reporter, updates
+
+def test_phone_thresholds_each_write_once():
+    reporter, updates = make_reporter()
+    counts = [reporter.phone_detected() for _ in range(DETECTION_THRESHOLD + 2)]
+    assert counts == list(range(1, DETECTION_THRESHOLD + 3))
+    fields = [fields for _, _, fields in updates]
+    assert fields == [{"cheatSuspicion": "true", "suspicionTime": "TS"},
+                      {"cheatDetected": "true", "detectionTime": "TS"}]
+    assert SUSPICION_THRESHOLD < DETECTION_THRESHOLD
+
+def test_verification_result_ignores_errors():
+    reporter, updates = make_reporter()
+    reporter.verification_result(None)
+    reporter.verification_result(True)
+    reporter.verification_result(False)
+    assert [fields for _, _, fields in updates] == [
+        {"faceVerified": True, "lastVerifiedTime": "TS"},
+        {"faceVerified": False, "lastFailedTime": "TS"},
+    ]
+
+def test_audio_and_keyword_events_target_the_student_document():
+    reporter, updates = make_reporter()
+    reporter.keyword_detected("đáp án", "cho mình xin đáp án")
+    reporter.audio_event("whisper")
+    assert {(exam, student) for exam, student, _ in updates} == {("exam1", "student1")}
+    assert updates[0][2] == {"forbiddenKeywordDetected": True, "lastKeywordTime": "TS",
+                             "lastKeyword": "đáp án", "fullSpeechWithKeyword": "cho mình xin đáp án"}
+    assert updates[1][2] == {"audioEventDetected": True, "lastAudioEvent": "whisper", "lastAudioEventTime": "TS"}
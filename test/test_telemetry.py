@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+from core.firebase_utils import create_sink
+from core.telemetry import FileSink, InMemorySink, SERVER_TIMESTAMP
+
+KEY = ("exam1", "student1")
+
+def test_memory_sink_resolves_timestamps_and_dotted_paths():
+    sink = InMemorySink()
+    sink.commit({KEY: {"gaze": "Left", "lastSeen": sink.server_timestamp(), "journalSeq.abc": 3}})
+    doc = sink.read(KEY)
+    assert doc["gaze"] == "Left"
+    assert isinstance(doc["lastSeen"], float)
+    assert doc["journalSeq"] == {"abc": 3}
+    assert sink.doc_writes[KEY] == 1 and sink.commit_count == 1
+
+def test_memory_sink_simulates_failures():
+    sink = InMemorySink(failure_rate=1.0)
+    with pytest.raises(ConnectionError):
+        sink.commit({KEY: {"gaze": "Left"}})
+    assert sink.read(KEY) is None
+    assert sink.failure_count == 1
+
+def test_read_returns_a_copy():
+    sink = InMemorySink()
+    sink.commit({KEY: {"gaze": "Left"}})
+    sink.read(KEY)["gaze"] = "Right"
+    assert sink.read(KEY)["gaze"] == "Left"
+
+def test_file_sink_appends_json_lines(tmp_path):
+    path = tmp_path / "out" / "telemetry.jsonl"
+    sink = FileSink(str(path))
+    sink.commit({KEY: {"gaze": "Left", "lastSeen": SERVER_TIMESTAMP}})
+    sink.commit({KEY: {"pose": "Forward"}})
+    sink.close()
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert lines[1]["fields"] == {"pose": "Forward"}
+    assert lines[0]["fields"]["lastSeen"] == lines[0]["time"]
+    assert sink.read(KEY) == {"gaze": "Left", "lastSeen": lines[0]["time"], "pose": "Forward"}
+
+def test_timestamp_is_epoch_seconds_by_default():
+    assert InMemorySink().timestamp(1700000000.5) == 1700000000.5
+
+def test_create_sink(tmp_path):
+    assert isinstance(create_sink("memory"), InMemorySink)
+    sink = create_sink(f"file:{tmp_path / 'a.jsonl'}")
+    assert isinstance(sink, FileSink)
+    sink.close()
+    with pytest.raises(ValueError):
+        create_sink("bogus")
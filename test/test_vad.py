@@ -0,0 +1,71 @@
+import numpy as np
+
+from core.vad import UtteranceSegmenter, VoiceActivityDetector
+
+RATE = 16000
+
+def tone(seconds, db, freq=150.0, harmonics=4):
+    """Harmonic tone (low zero-crossing rate) with the given RMS level in dBFS."""
+    t = np.arange(int(seconds * RATE)) / RATE
+    wave = sum(np.sin(2 * np.pi * freq * k * t) / k for k in range(1, harmonics + 1))
+    return wave / np.sqrt(np.mean(wave ** 2)) * 10 ** (db / 20)
+
+def noise(seconds, db, seed=0):
+    wave = np.random.default_rng(seed).normal(0, 1, int(seconds * RATE))
+    return wave * 10 ** (db / 20)
+
+def pcm(wave):
+    return np.clip(wave * 32768, -32768, 32767).astype(np.int16)
+
+def test_steady_hum_is_not_speech():
+    vad = VoiceActivityDetector(RATE)
+    hum = pcm(tone(3, -33, freq=100, harmonics=1) + noise(3, -60))
+    assert vad.classify(hum).mean() < 0.05
+    assert -36 < vad.noise_db < -30
+
+def test_speech_over_quiet_room_is_voiced():
+    vad = VoiceActivityDetector(RATE)
+    vad.classify(pcm(noise(1, -60)))
+    voiced = vad.classify(pcm(tone(1, -25) + noise(1, -60, seed=1)))
+    assert voiced.mean() > 0.95
+
+def test_hum_starting_mid_session_becomes_the_floor():
+    vad = VoiceActivityDetector(RATE)
+    vad.classify(pcm(noise(1, -60)))
+    hum = pcm(tone(20, -33, freq=100, harmonics=1) + noise(20, -60, seed=1))
+    voiced = vad.classify(hum)
+    # Ban đầu tiếng ù bị coi là có tiếng, nhưng nền nhiễu tăng dần và bắt kịp trong vài giây
+    assert voiced[:10].all()
+    assert not voiced[-100:].any()
+
+def test_leading_digital_silence_does_not_pin_the_floor():
+    vad = VoiceActivityDetector(RATE)
+    vad.classify(np.zeros(RATE, dtype=np.int16))
+    assert vad.noise_db is None
+    vad.classify(pcm(noise(1, -45)))
+    assert vad.noise_db > -55
+    vad.classify(np.zeros(RATE, dtype=np.int16))
+    assert vad.noise_db > -55
+
+def make_segmenter():
+    return UtteranceSegmenter(RATE, VoiceActivityDetector(RATE))
+
+def test_segmenter_emits_one_utterance_with_pre_roll():
+    segmenter = make_segmenter()
+    audio = np.concatenate([noise(1, -60), tone(1, -25), noise(1.5, -60, seed=1)])
+    chunks = np.array_split(pcm(audio), 35)
+    events = [event for chunk in chunks for event in segmenter.segment(chunk)]
+    kinds = [kind for kind, _ in events]
+    assert kinds[0] == "start" and kinds[-1] == "end" and set(kinds[1:-1]) == {"audio"}
+    utterance = events[-1][1]
+    streamed = np.concatenate([samples for kind, samples in events if kind != "end"])
+    assert np.array_equal(streamed, utterance)
+    # Tiền đệm 300 ms + 1 s tiếng + 600 ms im lặng sau câu
+    assert 1.7 < len(utterance) / RATE < 2.1
+    assert segmenter.utterance_count == 1
+
+def test_segmenter_discards_short_bursts():
+    segmenter = make_segmenter()
+    audio = np.concatenate([noise(1, -60), tone(0.15, -25), noise(1.5, -60, seed=1)])
+    assert segmenter.process(pcm(audio)) == []
+    assert segmenter.discarded_count == 1
@@ -0,0 +1,82 @@
+import threading
+import time
+
+from core.verification_worker import FaceVerificationWorker
+
+class BlockingVerifier:
+    """verify_fn stub that blocks each call until release() is called."""
+
+    def __init__(self):
+        self.seen = []
+        self.started = threading.Semaphore(0)
+        self._release = threading.Semaphore(0)
+
+    def __call__(self, frame, reference_path, **kwargs):
+        self.seen.append((frame, reference_path, kwargs))
+        self.started.release()
+        self._release.acquire(timeout=5)
+        return frame != "bad"
+
+    def release(self):
+        self._release.release()
+
+def wait_for_results(worker, count, timeout=2):
+    results = []
+    deadline = time.time() + timeout
+    while len(results) < count and time.time() < deadline:
+        results += worker.get_results()
+        time.sleep(0.005)
+    return results
+
+def test_superseded_frames_are_skipped():
+    verifier = BlockingVerifier()
+    worker = FaceVerificationWorker("ref.jpg", verify_fn=verifier)
+    worker.start()
+    try:
+        worker.submit("frame-1", aligned=True)
+        assert verifier.started.acquire(timeout=2)
+        # frame-1 đang được xác thực: ba frame tiếp theo thay thế nhau, chỉ frame mới nhất còn lại
+        worker.submit("frame-2")
+        worker.submit("frame-3")
+        worker.submit("frame-4")
+        assert worker.queue_depth() == 2
+        verifier.release()
+        assert verifier.started.acquire(timeout=2)
+        verifier.release()
+        results = wait_for_results(worker, 2)
+    finally:
+        worker.stop()
+    assert [frame for frame, _, _ in verifier.seen] == ["frame-1", "frame-4"]
+    assert verifier.seen[0][1:] == ("ref.jpg", {"aligned": True})
+    assert [result.verified for result in results] == [True, True]
+    assert worker.stats()["dropped"] == 2 and worker.stats()["completed"] == 2
+
+def test_results_are_delivered_once_in_order():
+    verifier = BlockingVerifier()
+    worker = FaceVerificationWorker("ref.jpg", verify_fn=verifier)
+    worker.start()
+    results = []
+    try:
+        for frame in ("good", "bad"):
+            worker.submit(frame)
+            assert verifier.started.acquire(timeout=2)
+            verifier.release()
+            results += wait_for_results(worker, 1)
+    finally:
+        worker.stop()
+    assert [result.verified for result in results] == [True, False]
+    assert worker.get_results() == []
+    assert all(result.latency >= 0 for result in results)
+
+def test_verify_errors_are_reported_as_none():
+    def failing(frame, reference_path):
+        raise RuntimeError("model crashed")
+
+    worker = FaceVerificationWorker("ref.jpg", verify_fn=failing)
+    worker.start()
+    try:
+        worker.submit("frame")
+        results = wait_for_results(worker, 1)
+    finally:
+        worker.stop()
+    assert [result.verified for result in results] == [None]